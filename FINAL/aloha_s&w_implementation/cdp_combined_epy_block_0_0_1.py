@@ -1,7 +1,7 @@
 """
 Embedded Python Block for GNU Radio - Mesh Network Packet Communication
 Implements packetization, Stop-and-Wait ARQ, and ALOHA collision avoidance
-No external CRC module required - implements CRC-16 CCITT manually
+CRC-16 CCITT is provided by the shared link_crc module
 """
 
 import numpy as np
@@ -12,6 +12,8 @@ import queue
 import time
 import random
 import struct
+from link_crc import crc16
+from link_preamble import SyncBurstFilter, sync_burst
 
 class blk(gr.sync_block):
     """
@@ -53,8 +55,8 @@ class blk(gr.sync_block):
         self.PKT_DATA = 0x01
         self.PKT_ACK = 0x02
         
-        # CRC-16 CCITT lookup table
-        self.crc_table = self.generate_crc_table()
+        # Sync bursts are recognized and dropped before packet parsing
+        self.burst_filter = SyncBurstFilter()
         
         # State management
         self.tx_queue = queue.Queue()
@@ -98,27 +100,9 @@ class blk(gr.sync_block):
         
         print(f"[Node {self.node_id}] Initialized - Ready for communication")
     
-    def generate_crc_table(self):
-        """Generate CRC-16 CCITT lookup table"""
-        poly = 0x1021
-        table = []
-        for i in range(256):
-            crc = i << 8
-            for j in range(8):
-                if crc & 0x8000:
-                    crc = ((crc << 1) ^ poly) & 0xFFFF
-                else:
-                    crc = (crc << 1) & 0xFFFF
-            table.append(crc)
-        return table
-    
     def calculate_crc16(self, data):
         """Calculate CRC-16 CCITT for given data"""
-        crc = 0xFFFF
-        for byte in data:
-            tbl_idx = ((crc >> 8) ^ byte) & 0xFF
-            crc = ((crc << 8) ^ self.crc_table[tbl_idx]) & 0xFFFF
-        return crc
+        return crc16(data)
     
     def handle_msg_in(self, msg):
         """Handle incoming messages from GUI/application"""
@@ -173,8 +157,9 @@ class blk(gr.sync_block):
                 # Convert to bytes
                 if pmt.is_u8vector(data):
                     print("loop run")	
-                    rx_bytes = bytes(pmt.u8vector_elements(data))	
-                    self.rx_queue.put(rx_bytes)
+                    rx_bytes = self.burst_filter.strip(bytes(pmt.u8vector_elements(data)))
+                    if rx_bytes:
+                        self.rx_queue.put(rx_bytes)
                 elif pmt.is_uniform_vector(data):
                     # Handle float32 or other vector types
                     elements = pmt.to_python(data)
@@ -262,8 +247,7 @@ class blk(gr.sync_block):
             return None
     
     def send_sync_burst(self):
-        burst = bytes(random.getrandbits(8) for _ in range(1000))
-        self.transmit_packet(burst)
+        self.transmit_packet(sync_burst(1000))
 
     def tx_handler(self):
         """Thread for handling packet transmission with ARQ"""
@@ -0,0 +1,42 @@
+"""
+Aggregated payload format shared by the link-layer embedded blocks.
+
+Several short app messages for the same destination are carried in one
+PKT_AGG frame as a sequence of sub-messages:
+    [len(1)][message bytes] [len(1)][message bytes] ...
+"""
+
+SUBHEADER_SIZE = 1
+
+
+def packed_size(messages):
+    """Payload size of the given messages once aggregated"""
+    return sum(SUBHEADER_SIZE + len(m) for m in messages)
+
+
+def fits(messages, data, max_payload):
+    """True if 'data' can be appended to 'messages' within max_payload"""
+    return len(data) <= 0xFF and packed_size(messages) + SUBHEADER_SIZE + len(data) <= max_payload
+
+
+def pack_messages(messages):
+    """Aggregate a list of byte strings into one payload"""
+    payload = bytearray()
+    for m in messages:
+        payload.append(len(m))
+        payload.extend(m)
+    return bytes(payload)
+
+
+def unpack_messages(payload):
+    """Split an aggregated payload back into messages (truncated tails are dropped)"""
+    messages = []
+    idx = 0
+    while idx < len(payload):
+        length = payload[idx]
+        idx += SUBHEADER_SIZE
+        if idx + length > len(payload):
+            break
+        messages.append(bytes(payload[idx:idx + length]))
+        idx += length
+    return messages
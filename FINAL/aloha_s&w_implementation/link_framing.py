@@ -0,0 +1,288 @@
+"""
+Link-layer frame extractor shared by the User Node / GBN embedded blocks.
+
+Frames on the air look like:
+    [preamble][SYNC_WORD][src][dst][seq][type][len][payload ...][CRC16]
+
+The extractor keeps received bytes in one preallocated bytearray and scans
+it with bytearray.find() so that dropping garbage never copies the buffer.
+
+PHY-delimited framing: protocol_formatter_async already delimits every PDU
+with its access code and length header, so a frame may also be sent bare,
+    [src][dst][seq][type][len][payload ...][CRC16]
+as exactly one PDU. A sender that can receive bare frames says so by ending
+the preamble of its normal frames with PHY_FRAMING_MARK; its peers then
+switch to bare frames towards it. Receivers always accept both forms.
+"""
+
+import struct
+
+PHY_FRAMING_MARK = bytes([0x55, 0x33])
+
+# Packet types (header 'type' byte), one table for the S&W and GBN/SR blocks
+PKT_DATA = 0x01
+PKT_ACK = 0x02
+PKT_SACK = 0x03      # Selective Repeat ACK: seq = cumulative ACK, payload = bitmap
+PKT_AGG = 0x04       # DATA carrying several [len][message] sub-messages
+PKT_FRAG = 0x05      # DATA carrying one fragment of a message longer than MAX_PAYLOAD
+PKT_BEACON = 0x06    # base station slot beacon (dst=0xFF, link_slots payload)
+PKT_POLL_REQ = 0x07  # polled mode: slot request to the base station (frames waiting)
+PKT_SKIP = 0x08      # ARQ give-up: payload = seqs the receiver must stop waiting for
+# Flag on DATA types: payload starts with a piggybacked ACK [ack_seq][bitmap_len][bitmap]
+PKT_FLAG_ACK = 0x80
+
+# Bytes protocol_formatter_async puts in front of every PDU
+# (32-bit access code + 2 x 16-bit length)
+PHY_HEADER_SIZE = 8
+
+
+def marked_preamble(preamble):
+    """Preamble advertising that bare (PHY-delimited) frames are understood"""
+    return bytes(preamble[:-len(PHY_FRAMING_MARK)]) + PHY_FRAMING_MARK
+
+
+class FramingSavings:
+    """Airtime saved by bare frames, reported per on-air frame size"""
+
+    BUCKETS = (32, 64, 128, 256, 512)
+
+    def __init__(self, overhead):
+        """
+        Arguments:
+            overhead: Bytes a bare frame leaves out (preamble + sync word)
+        """
+        self.overhead = int(overhead)
+        # bucket -> {'frames', 'bare', 'saved', 'bytes'}; 'bytes' is the airtime
+        # the frames would have taken with full framing (PHY header included)
+        self.sizes = {}
+
+    def record(self, frame_len, bare):
+        """Count one frame of 'frame_len' bytes with full framing, sent bare or not"""
+        on_air = frame_len + PHY_HEADER_SIZE
+        bucket = next((b for b in self.BUCKETS if on_air <= b), None)
+        counters = self.sizes.setdefault(bucket, {'frames': 0, 'bare': 0, 'saved': 0, 'bytes': 0})
+        counters['frames'] += 1
+        counters['bytes'] += on_air
+        if bare:
+            counters['bare'] += 1
+            counters['saved'] += self.overhead
+
+    def report(self):
+        """One line per frame size bucket"""
+        lines = []
+        for bucket in sorted(self.sizes, key=lambda b: float('inf') if b is None else b):
+            c = self.sizes[bucket]
+            label = f"<={bucket} B" if bucket is not None else f">{self.BUCKETS[-1]} B"
+            lines.append(f"{label}: {c['bare']}/{c['frames']} frames bare, {c['saved']} B saved "
+                         f"({100.0 * c['saved'] / c['bytes']:.1f}% of airtime)")
+        return lines
+
+
+class FrameExtractor:
+    """
+    Incremental frame extractor over a preallocated receive buffer.
+
+    feed() appends a chunk of PHY bytes and returns every complete frame
+    that passes the length/type checks and the CRC, in arrival order.
+    """
+
+    HEADER_SIZE = 5  # src(1) + dst(1) + seq(1) + type(1) + len(1)
+    CRC_SIZE = 2
+
+    def __init__(self, sync_word, crc_func, max_payload=255, valid_types=None, capacity=8192):
+        """
+        Arguments:
+            sync_word:   Byte string marking the start of a header
+            crc_func:    Callable returning the CRC-16 of a bytes-like object
+            max_payload: Largest payload length accepted in the length field
+            valid_types: Optional set of packet types; others are rejected before the CRC
+            capacity:    Size of the receive buffer in bytes
+        """
+        self.sync_word = bytes(sync_word)
+        self.crc_func = crc_func
+        self.max_payload = int(max_payload)
+        self.valid_types = set(valid_types) if valid_types else None
+
+        # A frame must always fit in the buffer together with its sync word
+        min_capacity = 2 * (len(self.sync_word) + self.HEADER_SIZE + self.max_payload + self.CRC_SIZE)
+        self.capacity = max(int(capacity), min_capacity)
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._head = 0  # first byte still of interest
+        self._tail = 0  # one past the last received byte
+
+        self.stats = {
+            'frames': 0,
+            'crc_errors': 0,
+            'bad_headers': 0,
+            'bytes_dropped': 0,
+            'overflows': 0,
+        }
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def reset(self):
+        """Discard all buffered bytes."""
+        self._head = 0
+        self._tail = 0
+
+    def feed(self, chunk):
+        """Append received bytes and return the list of parsed frames."""
+        self._append(chunk)
+        return self._scan()
+
+    # -------------------------------------------------------------------------
+    # Buffer management
+    # -------------------------------------------------------------------------
+    def _append(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return
+
+        if n >= self.capacity:
+            # Only the newest bytes can still hold a frame start we care about
+            self.stats['overflows'] += 1
+            self.stats['bytes_dropped'] += (self._tail - self._head) + (n - self.capacity)
+            self._view[:] = memoryview(chunk)[n - self.capacity:]
+            self._head = 0
+            self._tail = self.capacity
+            return
+
+        if self._tail + n > self.capacity:
+            self._compact()
+        if self._tail + n > self.capacity:
+            # Still no room: drop the oldest pending bytes
+            self.stats['overflows'] += 1
+            drop = self._tail + n - self.capacity
+            self.stats['bytes_dropped'] += drop
+            self._head += drop
+            self._compact()
+
+        self._view[self._tail:self._tail + n] = chunk
+        self._tail += n
+
+    def _compact(self):
+        """Move pending bytes to the front of the buffer (no reallocation)."""
+        pending = self._tail - self._head
+        if self._head and pending:
+            self._view[:pending] = self._view[self._head:self._tail]
+        self._head = 0
+        self._tail = pending
+
+    # -------------------------------------------------------------------------
+    # Frame scanning
+    # -------------------------------------------------------------------------
+    def _scan(self):
+        frames = []
+        buf = self._buf
+        sync_len = len(self.sync_word)
+        pos = self._head
+        keep = None  # earliest candidate still waiting for more bytes
+
+        while True:
+            idx = buf.find(self.sync_word, pos, self._tail)
+            if idx == -1:
+                break
+
+            result = self._try_frame(idx + sync_len)
+            if result is None:
+                # Incomplete: hold on to it, but a later valid frame proves it bogus
+                if keep is None:
+                    keep = idx
+                pos = idx + 1
+                continue
+
+            if result is False:
+                pos = idx + 1
+                continue
+
+            frame, end = result
+            # Preamble, noise and rejected candidates in front of the frame
+            self.stats['bytes_dropped'] += idx - self._head
+            mark_len = len(PHY_FRAMING_MARK)
+            frame['marked'] = idx >= mark_len and buf[idx - mark_len:idx] == PHY_FRAMING_MARK
+            frames.append(frame)
+            self.stats['frames'] += 1
+            keep = None
+            self._head = end
+            pos = end
+
+        if keep is not None:
+            new_head = keep
+        else:
+            # Keep a possible partial sync word at the end of the buffer
+            new_head = max(self._head, self._tail - (sync_len - 1))
+        self.stats['bytes_dropped'] += max(0, new_head - self._head)
+        self._head = new_head
+
+        if self._head == self._tail:
+            self._head = self._tail = 0
+
+        return frames
+
+    def parse_delimited(self, data):
+        """
+        Parse 'data' as exactly one bare frame (no preamble/sync word).
+        Returns the frame dict, or None if 'data' is not a bare frame.
+        """
+        n = len(data)
+        if n < self.HEADER_SIZE + self.CRC_SIZE:
+            return None
+        pkt_type = data[3]
+        payload_len = data[4]
+        if n != self.HEADER_SIZE + payload_len + self.CRC_SIZE or payload_len > self.max_payload:
+            return None
+        if self.valid_types is not None and pkt_type not in self.valid_types:
+            return None
+        payload_end = self.HEADER_SIZE + payload_len
+        if struct.unpack_from('>H', data, payload_end)[0] != self.crc_func(data[:payload_end]):
+            # Length and type fit a bare frame: count it as a damaged one
+            self.stats['crc_errors'] += 1
+            return None
+
+        self.stats['frames'] += 1
+        return {
+            'src': data[0],
+            'dst': data[1],
+            'seq': data[2],
+            'type': pkt_type,
+            'payload': bytes(data[self.HEADER_SIZE:payload_end]),
+            'marked': True,
+        }
+
+    def _try_frame(self, start):
+        """
+        Try to parse a frame whose header starts at 'start'.
+        Returns (frame, end) if valid, None if more bytes are needed,
+        or False if the candidate is invalid.
+        """
+        buf = self._buf
+        if self._tail - start < self.HEADER_SIZE + self.CRC_SIZE:
+            return None
+
+        pkt_type = buf[start + 3]
+        payload_len = buf[start + 4]
+        if payload_len > self.max_payload or (self.valid_types is not None and pkt_type not in self.valid_types):
+            self.stats['bad_headers'] += 1
+            return False
+
+        payload_end = start + self.HEADER_SIZE + payload_len
+        end = payload_end + self.CRC_SIZE
+        if end > self._tail:
+            return None
+
+        rx_crc = struct.unpack_from('>H', buf, payload_end)[0]
+        calc_crc = self.crc_func(self._view[start:payload_end])
+        if rx_crc != calc_crc:
+            self.stats['crc_errors'] += 1
+            return False
+
+        frame = {
+            'src': buf[start],
+            'dst': buf[start + 1],
+            'seq': buf[start + 2],
+            'type': pkt_type,
+            'payload': bytes(self._view[start + self.HEADER_SIZE:payload_end]),
+        }
+        return frame, end
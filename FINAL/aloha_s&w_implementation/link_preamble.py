@@ -0,0 +1,112 @@
+"""
+PN training sequence for the sync bursts shared by the link-layer
+embedded blocks.
+
+A sync burst is the first N bytes of one maximal-length sequence (16-bit
+Galois LFSR, x^16 + x^14 + x^13 + x^11 + 1, period 65535 bits). Bursts of
+every length are prefixes of the same sequence, so the bytes are computed
+once and sliced, and a receiver can recognize a burst of any length
+without knowing what the sender was configured with.
+"""
+
+import functools
+
+import numpy as np
+
+PN_POLY = 0xB400
+PN_PERIOD_BITS = 0xFFFF
+PN_MAX_BYTES = PN_PERIOD_BITS // 8
+
+# Bit errors per byte: popcount lookup for XOR'd byte arrays
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(words):
+    """Set bits of every uint64 in 'words'"""
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int32)
+
+
+@functools.lru_cache(maxsize=1)
+def _pn_sequence():
+    """One period of the PN sequence, packed MSB first (uint8 array)"""
+    bits = np.empty(PN_MAX_BYTES * 8, dtype=np.uint8)
+    lfsr = 1
+    for i in range(len(bits)):
+        bits[i] = lfsr & 1
+        lfsr >>= 1
+        if bits[i]:
+            lfsr ^= PN_POLY
+    seq = np.packbits(bits)
+    seq.flags.writeable = False
+    return seq
+
+
+@functools.lru_cache(maxsize=8)
+def sync_burst(length):
+    """First 'length' bytes of the PN sequence (capped at PN_MAX_BYTES)"""
+    return _pn_sequence()[:min(int(length), PN_MAX_BYTES)].tobytes()
+
+
+class SyncBurstFilter:
+    """
+    Drops sync bursts from received PDUs.
+
+    The first PROBE bytes of a PDU, as one 64-bit word, are compared against
+    every byte offset of the PN sequence in one vectorized XOR/popcount
+    pass (bursts may lose their start while the receiver locks). If one
+    offset is within 'max_ber' and the rest of the PDU still matches the
+    sequence from there on, the matching bytes are discarded and only what
+    follows them is passed on.
+    """
+
+    PROBE = 8
+
+    def __init__(self, max_ber=0.125):
+        """
+        Arguments:
+            max_ber: Highest bit error rate still treated as a burst
+        """
+        self.max_ber = float(max_ber)
+        seq = _pn_sequence()
+        # _windows[k] = seq[k:k + PROBE] as a big-endian 64-bit word
+        windows = np.lib.stride_tricks.sliding_window_view(seq, self.PROBE)
+        self._windows = np.ascontiguousarray(windows).view('>u8').ravel().astype(np.uint64)
+
+        self.stats = {
+            'bursts_discarded': 0,
+            'burst_bytes_discarded': 0,
+        }
+
+    def find(self, data):
+        """Number of leading bytes of 'data' that belong to a sync burst (0 if none)"""
+        if len(data) < self.PROBE:
+            return 0
+        head = np.uint64(int.from_bytes(data[:self.PROBE], 'big'))
+        errors = _popcount64(self._windows ^ head)
+        offset = int(np.argmin(errors))
+        if errors[offset] > self.max_ber * 8 * self.PROBE:
+            return 0
+
+        # Extend the match as far as the PDU keeps following the sequence
+        rx = np.frombuffer(data, dtype=np.uint8)
+        seq = _pn_sequence()
+        n = min(len(rx), len(seq) - offset)
+        byte_errors = POPCOUNT[rx[:n] ^ seq[offset:offset + n]].astype(np.int32)
+        # Matching bytes score +2, unrelated bytes -2 on average: the burst
+        # ends where the running score peaks
+        score = np.cumsum(2 - byte_errors)
+        end = int(np.argmax(score)) + 1
+        if end < self.PROBE or byte_errors[:end].sum() > self.max_ber * 8 * end:
+            return 0
+        return end
+
+    def strip(self, data):
+        """Return 'data' without a leading sync burst"""
+        end = self.find(data)
+        if end:
+            self.stats['bursts_discarded'] += 1
+            self.stats['burst_bytes_discarded'] += end
+            return data[end:]
+        return data
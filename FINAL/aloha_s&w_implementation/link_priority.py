@@ -0,0 +1,506 @@
+"""
+Priority classes for outbound messages, shared by the link-layer embedded
+blocks.
+
+Every message belongs to one class:
+
+    PRIO_EMERGENCY  code-blue pages (by default everything to the Emergency Room)
+    PRIO_URGENT
+    PRIO_ROUTINE    everything else
+
+The TX queue always hands out the oldest message of the most urgent class
+that has one waiting. Within a class the order stays FIFO.
+
+Messages expire. Each class has a TTL in seconds (0: never), and a message
+can bring its own ('ttl' in the message PDU). Expired messages are dropped
+from the queue and handed to 'on_expire', so the block can report them as
+failed. A stale routine page is not worth the airtime any more.
+
+The blocks record the queueing delay of every message per class: from
+msg_in to its first time on the air. ClassDelays keeps the latest samples
+for the percentiles on the stats port.
+
+The queue can be bounded per destination. Messages for one 'dst' are
+counted from put() until they leave the queue:
+
+- 'limit' messages fill a destination. One more triggers the drop policy:
+    'tail'      the new message is refused
+    'head'      the oldest queued message makes room
+    'priority'  the oldest message of the least urgent class makes room
+  None of them drops a message more urgent than the new one, or a
+  fragment of a message that is already on the air. Without a victim the
+  new message is refused.
+- The watermarks give the feedback to the application. A destination
+  turns congested at 'high' queued messages and clears again once it is
+  back at 'low', so the GUI does not flap between the two.
+  on_status(dst, status()) is called on every change of a destination's
+  depth; the blocks publish it on their 'queue_status' port.
+
+SendGate is the GUI side: it holds routine messages back while their
+destination is congested and refuses them when too many are held.
+"""
+
+import collections
+import queue
+import threading
+import time
+
+PRIO_EMERGENCY = 0
+PRIO_URGENT = 1
+PRIO_ROUTINE = 2
+PRIORITY_NAMES = ('emergency', 'urgent', 'routine')
+
+# Default TTL per class (seconds, 0: never expires)
+DEFAULT_TTL = (0.0, 300.0, 120.0)
+
+DROP_POLICIES = ('tail', 'head', 'priority')
+
+
+def priority_level(value, default=PRIO_ROUTINE):
+    """Class of a priority given as a number or a name; 'default' if None or unknown"""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        name = value.strip().lower()
+        if name in PRIORITY_NAMES:
+            return PRIORITY_NAMES.index(name)
+        try:
+            value = int(name)
+        except ValueError:
+            return default
+    return min(max(int(value), PRIO_EMERGENCY), PRIO_ROUTINE)
+
+
+class ClassDelays:
+    """Queueing delay samples and expired messages per priority class"""
+
+    def __init__(self, samples=512):
+        """
+        Arguments:
+            samples: Latest delays kept per class for the percentiles
+        """
+        self.delays = [collections.deque(maxlen=int(samples)) for _ in PRIORITY_NAMES]
+        self.lock = threading.Lock()
+        self.stats = {
+            'sent': [0] * len(PRIORITY_NAMES),     # messages on the air at least once
+            'expired': [0] * len(PRIORITY_NAMES),  # messages dropped by their TTL
+        }
+
+    def record(self, priority, delay):
+        """Queueing delay (seconds) of a message that just went on the air"""
+        with self.lock:
+            self.delays[priority].append(max(float(delay), 0.0))
+            self.stats['sent'][priority] += 1
+
+    def expired(self, priority, count=1):
+        """'count' messages of a class dropped by their TTL"""
+        with self.lock:
+            self.stats['expired'][priority] += count
+
+    def percentiles(self, priority, points=(0.5, 0.9, 0.99)):
+        """Delay percentiles (seconds, nearest rank) of a class, None without samples"""
+        with self.lock:
+            samples = sorted(self.delays[priority])
+        if not samples:
+            return None
+        return [samples[min(int(q * len(samples)), len(samples) - 1)] for q in points]
+
+    def as_dict(self, depths=None):
+        """Current state, for the stats port ('depths': queued messages per class)"""
+        values = {}
+        for level, name in enumerate(PRIORITY_NAMES):
+            values[f'{name}_sent'] = self.stats['sent'][level]
+            values[f'{name}_expired'] = self.stats['expired'][level]
+            if depths is not None:
+                values[f'{name}_queued'] = depths[level]
+            delays = self.percentiles(level)
+            if delays is not None:
+                values[f'{name}_p50'], values[f'{name}_p90'], values[f'{name}_p99'] = delays
+        return values
+
+    def report(self):
+        """One line per class with traffic, for stop()"""
+        lines = []
+        for level, name in enumerate(PRIORITY_NAMES):
+            sent, expired = self.stats['sent'][level], self.stats['expired'][level]
+            if not sent and not expired:
+                continue
+            line = f"{name}: {sent} sent, {expired} expired"
+            delays = self.percentiles(level)
+            if delays is not None:
+                p50, p90, p99 = (1000.0 * d for d in delays)
+                line += f", queueing delay p50 {p50:.0f} ms p90 {p90:.0f} ms p99 {p99:.0f} ms"
+            lines.append(line)
+        return lines
+
+
+class PriorityTxQueue:
+    """
+    Thread-safe TX queue with one FIFO per priority class, TTL expiry and an
+    optional bound per destination.
+    get()/get_nowait()/qsize() work like queue.Queue (queue.Empty when empty).
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, delays=None, on_expire=None, limit=0, watermarks=None,
+                 policy='priority', on_drop=None, on_status=None):
+        """
+        Arguments:
+            ttl:        TTL per class (seconds, 0: never expires)
+            delays:     ClassDelays that counts the expired messages (optional)
+            on_expire:  Called with every expired message (outside the queue lock)
+            limit:      Messages queued per destination before the drop policy
+                        applies (0: unbounded)
+            watermarks: (high, low) queued messages per destination for the
+                        congestion feedback (default: 3/4 and 1/4 of limit;
+                        high 0: no feedback)
+            policy:     Drop policy of a full destination (DROP_POLICIES)
+            on_drop:    Called with every message dropped to make room (outside the queue lock)
+            on_status:  Called with (dst, status) whenever the depth of a destination
+                        changes (with the queue lock held: it must not block)
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"drop policy must be one of {DROP_POLICIES}, not {policy!r}")
+        self.ttl = [float(t) for t in ttl]
+        self.delays = delays
+        self.on_expire = on_expire
+        self.limit = max(int(limit), 0)
+        if watermarks is None:
+            watermarks = (3 * self.limit // 4, self.limit // 4)
+        high, low = (max(int(w), 0) for w in watermarks)
+        self.high = min(high, self.limit) if self.limit else high
+        self.low = min(low, self.high)
+        self.policy = policy
+        self.on_drop = on_drop
+        self.on_status = on_status
+        self.queues = [collections.deque() for _ in PRIORITY_NAMES]
+        # dests[dst] = {'depth', 'congested', 'dropped', 'refused'}
+        self.dests = {}
+        self.next_expiry = float('inf')
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.stats = {
+            'refused': 0,  # new messages turned away (destination full)
+            'dropped': 0,  # queued messages dropped to make room
+            'peak': 0,     # most messages queued for one destination
+        }
+
+    def put(self, msg, front=False):
+        """
+        Queue a message dict. 'priority' defaults to routine, 'enqueued' to now;
+        'expires' comes from its 'ttl' or the class TTL. 'front': back to the
+        head of its class (a message that was taken but not sent, never refused).
+        Returns False if the message was refused: its destination is full
+        and the drop policy found nothing to drop.
+        """
+        level = msg['priority'] = priority_level(msg.get('priority'))
+        msg.setdefault('enqueued', time.monotonic())
+        if 'expires' not in msg:
+            ttl = self.ttl[level] if msg.get('ttl') is None else float(msg['ttl'])
+            msg['expires'] = msg['enqueued'] + ttl if ttl > 0 else None
+        dropped = None
+        with self.cond:
+            state = self._dest(msg.get('dst'))
+            if self.limit and not front and state['depth'] >= self.limit:
+                dropped = self._make_room(msg)
+                if dropped is None:
+                    state['refused'] += 1
+                    self.stats['refused'] += 1
+                    self._changed(msg.get('dst'), state)
+                    return False
+            if front:
+                self.queues[level].appendleft(msg)
+            else:
+                self.queues[level].append(msg)
+            self._count(msg, 1)
+            if msg['expires'] is not None:
+                self.next_expiry = min(self.next_expiry, msg['expires'])
+            self.cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return True
+
+    def _dest(self, dst):
+        """Bookkeeping of one destination (call with the lock held)"""
+        state = self.dests.get(dst)
+        if state is None:
+            state = self.dests[dst] = {'depth': 0, 'congested': False, 'dropped': 0, 'refused': 0}
+        return state
+
+    def _count(self, msg, delta):
+        """msg joined (+1) or left (-1) the queue (call with the lock held)"""
+        dst = msg.get('dst')
+        state = self._dest(dst)
+        state['depth'] += delta
+        self.stats['peak'] = max(self.stats['peak'], state['depth'])
+        if self.high:
+            # Hysteresis: congested from 'high' until back down at 'low'
+            if state['depth'] >= self.high:
+                state['congested'] = True
+            elif state['depth'] <= self.low:
+                state['congested'] = False
+        self._changed(dst, state)
+
+    def _changed(self, dst, state):
+        """Tell on_status about a destination (call with the lock held)"""
+        if self.on_status is not None:
+            self.on_status(dst, self._status(state))
+
+    def _status(self, state):
+        return {
+            'depth': state['depth'],
+            'limit': self.limit,
+            'high': self.high,
+            'low': self.low,
+            'congested': state['congested'],
+            'full': bool(self.limit) and state['depth'] >= self.limit,
+            'dropped': state['dropped'],
+            'refused': state['refused'],
+        }
+
+    def _make_room(self, msg):
+        """
+        Drop a message of msg's destination by the drop policy (call with the
+        lock held). Returns it, None if nothing may be dropped.
+        """
+        if self.policy == 'tail':
+            return None
+        dst = msg.get('dst')
+        # Oldest droppable message of each class that is not more urgent than msg
+        candidates = []
+        for level in range(msg['priority'], len(self.queues)):
+            for index, queued in enumerate(self.queues[level]):
+                if queued.get('dst') == dst and queued.get('group') is None:
+                    candidates.append((level, index, queued))
+                    break
+        if not candidates:
+            return None
+        if self.policy == 'head':
+            level, index, victim = min(candidates, key=lambda c: c[2]['enqueued'])
+        else:
+            level, index, victim = candidates[-1]
+        del self.queues[level][index]
+        self._dest(dst)['dropped'] += 1
+        self.stats['dropped'] += 1
+        self._count(victim, -1)
+        return victim
+
+    def _expire(self, now):
+        """Remove expired messages (call with the lock held). Returns them"""
+        if now < self.next_expiry:
+            return []
+        expired = []
+        self.next_expiry = float('inf')
+        for level, fifo in enumerate(self.queues):
+            keep = collections.deque()
+            for msg in fifo:
+                if msg['expires'] is not None and msg['expires'] <= now:
+                    expired.append(msg)
+                else:
+                    keep.append(msg)
+                    if msg['expires'] is not None:
+                        self.next_expiry = min(self.next_expiry, msg['expires'])
+            self.queues[level] = keep
+        for msg in expired:
+            self._count(msg, -1)
+        return expired
+
+    def _report(self, expired):
+        """Hand expired messages to the counters and to on_expire (lock not held)"""
+        for msg in expired:
+            if self.delays is not None:
+                self.delays.expired(msg['priority'])
+            if self.on_expire is not None:
+                self.on_expire(msg)
+
+    def _pop(self):
+        """Head of the most urgent non-empty class (call with the lock held)"""
+        for fifo in self.queues:
+            if fifo:
+                msg = fifo.popleft()
+                self._count(msg, -1)
+                return msg
+        return None
+
+    def get(self, timeout=None):
+        """Next message, waiting up to 'timeout' seconds; raises queue.Empty"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.cond:
+                expired = self._expire(time.monotonic())
+                msg = self._pop()
+                if msg is None and not expired and not self.closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is None or remaining > 0:
+                        self.cond.wait(remaining)
+                        continue
+            self._report(expired)
+            if msg is not None:
+                return msg
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                raise queue.Empty
+
+    def get_nowait(self):
+        """Next message without waiting; raises queue.Empty"""
+        with self.cond:
+            expired = self._expire(time.monotonic())
+            msg = self._pop()
+        self._report(expired)
+        if msg is None:
+            raise queue.Empty
+        return msg
+
+    def get_if(self, predicate):
+        """Take the next message only if predicate(msg) is true; None otherwise"""
+        with self.cond:
+            expired = self._expire(time.monotonic())
+            msg = self.peek()
+            if msg is not None and predicate(msg):
+                self._pop()
+            else:
+                msg = None
+        self._report(expired)
+        return msg
+
+    def get_first(self, predicate):
+        """
+        Take the first message (most urgent class first, oldest first) for
+        which predicate(msg) is true; None if there is none
+        """
+        with self.cond:
+            expired = self._expire(time.monotonic())
+            msg = None
+            for fifo in self.queues:
+                index = next((i for i, queued in enumerate(fifo) if predicate(queued)), None)
+                if index is not None:
+                    msg = fifo[index]
+                    del fifo[index]
+                    self._count(msg, -1)
+                    break
+        self._report(expired)
+        return msg
+
+    def peek(self):
+        """Next message without taking it (None if empty)"""
+        with self.cond:
+            for fifo in self.queues:
+                if fifo:
+                    return fifo[0]
+        return None
+
+    def head_priority(self, empty=None):
+        """Class of the next message, 'empty' if there is none"""
+        msg = self.peek()
+        return empty if msg is None else msg['priority']
+
+    def discard(self, predicate):
+        """Remove every queued message for which predicate(msg) is true. Returns how many"""
+        with self.cond:
+            removed = []
+            for level, fifo in enumerate(self.queues):
+                keep = collections.deque()
+                for msg in fifo:
+                    (removed if predicate(msg) else keep).append(msg)
+                self.queues[level] = keep
+            for msg in removed:
+                self._count(msg, -1)
+        return len(removed)
+
+    def wait_higher(self, priority, timeout):
+        """
+        Wait up to 'timeout' seconds for a message more urgent than 'priority'.
+        True as soon as one is queued; False on timeout or close().
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while not self.closed:
+                if any(self.queues[level] for level in range(priority)):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+        return False
+
+    def close(self):
+        """Wake every waiting thread (shutdown)"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def depths(self):
+        """Queued messages per class"""
+        with self.cond:
+            return [len(fifo) for fifo in self.queues]
+
+    def status(self, dst):
+        """Depth, bound and congestion of one destination (see _status)"""
+        with self.cond:
+            return self._status(self._dest(dst))
+
+    def as_dict(self):
+        """Bound counters, for the stats port"""
+        with self.cond:
+            congested = sum(1 for state in self.dests.values() if state['congested'])
+        return {
+            'queue_refused': self.stats['refused'],
+            'queue_dropped': self.stats['dropped'],
+            'queue_peak': self.stats['peak'],
+            'queue_congested': congested,
+        }
+
+    def report(self):
+        """Bound counters in one line, for stop() (None if nothing to tell)"""
+        if not self.stats['peak']:
+            return None
+        bound = f"limit {self.limit} per destination, '{self.policy}' policy" if self.limit else "unbounded"
+        return (f"{self.stats['refused']} refused, {self.stats['dropped']} dropped, "
+                f"deepest destination {self.stats['peak']} ({bound})")
+
+    def qsize(self):
+        with self.cond:
+            return sum(len(fifo) for fifo in self.queues)
+
+    def __len__(self):
+        return self.qsize()
+
+
+class SendGate:
+    """
+    GUI side of the backpressure: the last queue_status of each destination
+    and the messages held back for it. Routine messages to a congested
+    destination wait in the GUI until it has drained; urgent and emergency
+    messages always go (the link layer makes room for them).
+    """
+
+    def __init__(self, max_held=16):
+        """
+        Arguments:
+            max_held: Messages held back per destination before new ones are refused
+        """
+        self.max_held = int(max_held)
+        self.status = {}  # status[dst] = last queue_status
+        self.held = collections.defaultdict(collections.deque)
+
+    def busy(self, dst):
+        """True while routine messages to 'dst' are held back"""
+        status = self.status.get(dst)
+        return bool(self.held[dst]) or (status is not None and (status['congested'] or status['full']))
+
+    def admit(self, dst, priority, item):
+        """'send' now, 'hold' (item kept until release) or 'refuse' (too many held)"""
+        if priority_level(priority) < PRIO_ROUTINE or not self.busy(dst):
+            return 'send'
+        if len(self.held[dst]) >= self.max_held:
+            return 'refuse'
+        self.held[dst].append(item)
+        return 'hold'
+
+    def update(self, dst, status):
+        """New queue_status of 'dst'. Returns the held items that may go now, oldest first"""
+        self.status[dst] = status
+        held = self.held[dst]
+        if not held or status['congested'] or status['full']:
+            return []
+        room = status['high'] - status['depth'] if status['high'] else len(held)
+        return [held.popleft() for _ in range(min(max(room, 0), len(held)))]
@@ -0,0 +1,205 @@
+"""
+Slot timing for slotted ALOHA, shared by the link-layer embedded blocks.
+
+The base station (the node with beacon_interval > 0) owns the slot grid. It
+broadcasts a compact beacon (dst=0xFF) at the start of every
+'beacon_slots'-th slot:
+
+    payload = [slot index (u32)][slot length in 10 us units (u16)][beacon_slots (u16)]
+
+The other nodes lock a local copy of the grid to the beacons. Every beacon
+gives one (slot index, local receive time) point, which is compared with
+the slot start predicted for it. The error corrects the phase
+('phase_alpha') and, spread over the slots since the last beacon, the local
+slot period ('period_alpha'). This second-order loop follows the crystal
+offset between the two machines (drift), so between beacons the slot
+boundaries are extrapolated with the right period instead of lagging more
+and more. Beacons that land more than 'max_error' slots away from the
+prediction are treated as outliers. After 'RESYNC_AFTER' outliers in a row
+the grid is re-anchored.
+
+Receive times include the RX chain latency, so the user nodes' grid lags
+the base station's by about that much. The lag is the same for all user
+nodes, so their frames still line up with each other. The slot guard time
+has to cover the difference in latency from node to node.
+
+One slot holds the longest exchange: a full-size DATA frame and the ACK
+the receiver sends back right away (each with its sync burst, if any, and
+the PHY header), plus the guard time for the RX->TX turnaround. ACKs are
+not aligned to slots; they finish the slot of the frame they answer.
+"""
+
+import math
+import struct
+import time
+
+from link_framing import PHY_HEADER_SIZE
+
+BEACON_FORMAT = '>IHH'
+BEACON_SIZE = struct.calcsize(BEACON_FORMAT)
+BEACON_TICK = 10e-6  # slot length unit in the beacon (seconds)
+
+
+def frame_airtime(n_bytes, samp_rate, sps, bits_per_symbol=2):
+    """Seconds on the air for 'n_bytes' after the modulator (QPSK: 2 bits/symbol)"""
+    return float(n_bytes) * 8.0 / bits_per_symbol * sps / float(samp_rate)
+
+
+def slot_length(pdus, samp_rate, sps, bits_per_symbol=2, guard=0.01):
+    """
+    Slot (seconds) that holds the PDUs of 'pdus' (sizes in bytes, without the
+    PHY header that is added to each) back to back, plus the guard time
+    """
+    n_bytes = sum(pdus) + PHY_HEADER_SIZE * len(pdus)
+    return frame_airtime(n_bytes, samp_rate, sps, bits_per_symbol) + float(guard)
+
+
+def build_beacon(slot_index, slot, beacon_slots):
+    """Beacon payload for the slot starting at 'slot_index'"""
+    ticks = min(max(int(round(slot / BEACON_TICK)), 1), 0xFFFF)
+    return struct.pack(BEACON_FORMAT, slot_index & 0xFFFFFFFF, ticks, beacon_slots & 0xFFFF)
+
+
+def parse_beacon(payload):
+    """(slot index, slot length in seconds, beacon_slots) or None if malformed"""
+    if len(payload) < BEACON_SIZE:
+        return None
+    slot_index, ticks, beacon_slots = struct.unpack(BEACON_FORMAT, payload[:BEACON_SIZE])
+    if not ticks:
+        return None
+    return slot_index, ticks * BEACON_TICK, beacon_slots
+
+
+class SlotClock:
+    """Local copy of the base station's slot grid (monotonic seconds)"""
+
+    RESYNC_AFTER = 3  # outliers in a row before the grid is re-anchored
+
+    def __init__(self, slot, phase_alpha=0.25, period_alpha=0.015, max_error=0.5,
+                 holdover=10.0):
+        """
+        Arguments:
+            slot:         Nominal slot length (seconds); replaced by the beacon's
+            phase_alpha:  Weight of a beacon's phase error (0-1)
+            period_alpha: Weight of a beacon's phase error in the period (0-1,
+                          well below phase_alpha; about phase_alpha**2 / 4)
+            max_error:    Largest phase error (slots) still taken as a valid beacon
+            holdover:     Seconds without beacons after which the grid is dropped
+        """
+        self.slot = float(slot)
+        self.phase_alpha = float(phase_alpha)
+        self.period_alpha = float(period_alpha)
+        self.max_error = float(max_error)
+        self.holdover = float(holdover)
+
+        self.master = False
+        self.period = self.slot     # local seconds per base station slot
+        self.beacon_slots = 0       # beacon cadence (slots); 0 = no slot reserved
+        self.anchor_index = None    # slot index of the phase reference
+        self.anchor_time = 0.0      # local time of that slot's start
+        self.last_beacon = 0.0
+        self.outliers = 0
+
+        self.stats = {
+            'beacons': 0,
+            'outliers': 0,
+            'resyncs': 0,
+            'error_sum': 0.0,   # |phase error| of accepted beacons (seconds)
+            'error_max': 0.0,
+        }
+
+    def start_master(self, now, beacon_slots):
+        """Base station: this node's clock defines the grid"""
+        self.master = True
+        # The beacon carries the slot in BEACON_TICK units: use exactly that length
+        self.slot = max(round(self.slot / BEACON_TICK), 1) * BEACON_TICK
+        self.period = self.slot
+        self.beacon_slots = int(beacon_slots)
+        self.anchor_index = 0
+        self.anchor_time = now
+
+    def synced(self, now=None):
+        """True while slot boundaries are known"""
+        if self.master:
+            return True
+        if self.anchor_index is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.last_beacon < self.holdover
+
+    def on_beacon(self, slot_index, slot, beacon_slots, rx_time):
+        """Track the grid from a received beacon (rx_time: local start of its slot)"""
+        if self.master:
+            return
+        self.stats['beacons'] += 1
+        self.beacon_slots = int(beacon_slots)
+        if self.anchor_index is None or abs(slot - self.slot) > 1e-6 \
+                or not self.synced(rx_time):
+            self.anchor(slot_index, slot, rx_time)
+            return
+
+        slots = slot_index - self.anchor_index
+        error = rx_time - (self.anchor_time + slots * self.period)
+        if slots <= 0 or abs(error) > self.max_error * self.period:
+            self.stats['outliers'] += 1
+            self.outliers += 1
+            if self.outliers >= self.RESYNC_AFTER:
+                self.stats['resyncs'] += 1
+                self.anchor(slot_index, slot, rx_time)
+            return
+        self.outliers = 0
+        self.stats['error_sum'] += abs(error)
+        self.stats['error_max'] = max(self.stats['error_max'], abs(error))
+
+        # Phase: move the reference to this beacon, partly towards its time;
+        # drift: the part of the error that built up slot by slot
+        self.anchor_time += slots * self.period + self.phase_alpha * error
+        self.period += self.period_alpha * error / slots
+        self.anchor_index = slot_index
+        self.last_beacon = rx_time
+
+    def anchor(self, slot_index, slot, rx_time):
+        """(Re)start tracking from one beacon"""
+        self.slot = float(slot)
+        self.period = self.slot
+        self.anchor_index = slot_index
+        self.anchor_time = rx_time
+        self.last_beacon = rx_time
+        self.outliers = 0
+
+    def slot_index(self, t):
+        """Index of the first slot starting at or after local time 't'"""
+        return self.anchor_index + int(math.ceil((t - self.anchor_time) / self.period - 1e-9))
+
+    def slot_start(self, index):
+        """Local time at which slot 'index' starts"""
+        return self.anchor_time + (index - self.anchor_index) * self.period
+
+    def is_beacon_slot(self, index):
+        return self.beacon_slots > 0 and index % self.beacon_slots == 0
+
+    def next_slot(self, t):
+        """
+        Start of the first slot at or after local time 't' that is not reserved
+        for a beacon (None while not synced)
+        """
+        if not self.synced(t):
+            return None
+        index = self.slot_index(t)
+        if self.is_beacon_slot(index):
+            index += 1
+        return self.slot_start(index)
+
+    def drift_ppm(self):
+        """Tracked clock offset against the base station (ppm)"""
+        return 1e6 * (self.period / self.slot - 1.0)
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        accepted = self.stats['beacons'] - self.stats['outliers']
+        return dict(
+            self.stats,
+            slot=self.slot,
+            drift_ppm=self.drift_ppm(),
+            error_avg=self.stats['error_sum'] / accepted if accepted > 0 else 0.0,
+        )
@@ -30,12 +30,15 @@ import sip
 import threading
 import user_1_epy_block_0 as epy_block_0  # embedded python block
 import user_1_epy_block_0_0 as epy_block_0_0  # embedded python block
+import user_1_epy_block_2 as epy_block_2  # embedded python block
+import user_1_epy_block_3 as epy_block_3  # embedded python block
+import user_1_epy_block_4 as epy_block_4  # embedded python block
 
 
 
 class user_1(gr.top_block, Qt.QWidget):
 
-    def __init__(self):
+    def __init__(self, burst_rx=0, sync_burst_len=100):
         gr.top_block.__init__(self, "Not titled yet", catch_exceptions=True)
         Qt.QWidget.__init__(self)
         self.setWindowTitle("Not titled yet")
@@ -66,6 +69,12 @@ class user_1(gr.top_block, Qt.QWidget):
             print(f"Qt GUI: Could not restore geometry: {str(exc)}", file=sys.stderr)
         self.flowgraph_started = threading.Event()
 
+        ##################################################
+        # Parameters
+        ##################################################
+        self.burst_rx = burst_rx
+        self.sync_burst_len = sync_burst_len
+
         ##################################################
         # Variables
         ##################################################
@@ -216,8 +225,6 @@ class user_1(gr.top_block, Qt.QWidget):
         for c in range(0, 1):
             self.top_grid_layout.setColumnStretch(c, 1)
         self.pdu_tagged_stream_to_pdu_0_0 = pdu.tagged_stream_to_pdu(gr.types.byte_t, 'packet_len')
-        self.pdu_pdu_to_tagged_stream_0_0 = pdu.pdu_to_tagged_stream(gr.types.byte_t, 'packet_len')
-        self.pdu_pdu_to_tagged_stream_0 = pdu.pdu_to_tagged_stream(gr.types.byte_t, 'packet_len')
         self._eq_gain_range = qtgui.Range(0.0, 0.1, 0.001, 0.01, 200)
         self._eq_gain_win = qtgui.RangeWidget(self._eq_gain_range, self.set_eq_gain, "Equalizer: rate", "counter_slider", float, QtCore.Qt.Horizontal)
         self.top_grid_layout.addWidget(self._eq_gain_win, 0, 1, 1, 1)
@@ -225,7 +232,10 @@ class user_1(gr.top_block, Qt.QWidget):
             self.top_grid_layout.setRowStretch(r, 1)
         for c in range(1, 2):
             self.top_grid_layout.setColumnStretch(c, 1)
-        self.epy_block_0_0 = epy_block_0_0.blk(node_id=2, aloha_prob=0.6, timeout=0.2, max_retries=100)
+        self.epy_block_4 = epy_block_4.blk(threshold_db=3.0, block_len=64, pretrigger=512, hang=1024, noise_alpha=0.05, max_open=200000)
+        self.epy_block_3 = epy_block_3.blk(pad_bytes=4, max_queue=64)
+        self.epy_block_2 = epy_block_2.blk(sps=sps, excess_bw=excess_bw, access_code='11100001010110101110100010010011', threshold=0.7, max_len=1024, samp_rate=samp_rate*2)
+        self.epy_block_0_0 = epy_block_0_0.blk(node_id=2, aloha_prob=0.6, timeout=0.2, max_retries=100, sync_burst_len=0 if burst_rx else sync_burst_len, samp_rate=samp_rate_blade*2, sps=sps)
         self.epy_block_0 = epy_block_0.messenger_gui(bg_image=r"C:\Users\Oshan\Desktop\message.jpg")
         self.digital_symbol_sync_xx_0_0 = digital.symbol_sync_cc(
             digital.TED_SIGNAL_TIMES_SLOPE_ML,
@@ -257,7 +267,8 @@ class user_1(gr.top_block, Qt.QWidget):
             truncate=False)
         self.digital_constellation_decoder_cb_0_0 = digital.constellation_decoder_cb(qpsk)
         self.blocks_unpack_k_bits_bb_0_0 = blocks.unpack_k_bits_bb(2)
-        self.blocks_tagged_stream_mux_0 = blocks.tagged_stream_mux(gr.sizeof_char*1, "packet_len", 0)
+        self.blocks_selector_0 = blocks.selector(gr.sizeof_gr_complex*1,0,burst_rx)
+        self.blocks_selector_0.set_enabled(True)
         self.blocks_repack_bits_bb_1_0 = blocks.repack_bits_bb(1, 8, "packet_len", False, gr.GR_MSB_FIRST)
         self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(0.8)
 
@@ -265,17 +276,21 @@ class user_1(gr.top_block, Qt.QWidget):
         ##################################################
         # Connections
         ##################################################
-        self.msg_connect((self.digital_protocol_formatter_async_0, 'header'), (self.pdu_pdu_to_tagged_stream_0, 'pdus'))
-        self.msg_connect((self.digital_protocol_formatter_async_0, 'payload'), (self.pdu_pdu_to_tagged_stream_0_0, 'pdus'))
+        self.msg_connect((self.digital_protocol_formatter_async_0, 'header'), (self.epy_block_3, 'header'))
+        self.msg_connect((self.digital_protocol_formatter_async_0, 'payload'), (self.epy_block_3, 'payload'))
         self.msg_connect((self.epy_block_0, 'sync_cmd'), (self.epy_block_0_0, 'sync_cmd'))
         self.msg_connect((self.epy_block_0, 'out'), (self.epy_block_0_0, 'msg_in'))
         self.msg_connect((self.epy_block_0_0, 'pdu_out'), (self.digital_protocol_formatter_async_0, 'in'))
         self.msg_connect((self.epy_block_0_0, 'feedback'), (self.epy_block_0, 'feedback'))
         self.msg_connect((self.epy_block_0_0, 'msg_out'), (self.epy_block_0, 'in_msg'))
+        self.msg_connect((self.epy_block_0_0, 'queue_status'), (self.epy_block_0, 'queue_status'))
+        self.msg_connect((self.epy_block_2, 'pdus'), (self.epy_block_0_0, 'pdu_in'))
+        self.msg_connect((self.epy_block_4, 'busy'), (self.epy_block_0_0, 'channel_busy'))
         self.msg_connect((self.pdu_tagged_stream_to_pdu_0_0, 'pdus'), (self.epy_block_0_0, 'pdu_in'))
         self.connect((self.blocks_multiply_const_vxx_0, 0), (self.soapy_bladerf_sink_0, 0))
         self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.pdu_tagged_stream_to_pdu_0_0, 0))
-        self.connect((self.blocks_tagged_stream_mux_0, 0), (self.digital_constellation_modulator_0, 0))
+        self.connect((self.blocks_selector_0, 0), (self.digital_symbol_sync_xx_0_0, 0))
+        self.connect((self.blocks_selector_0, 1), (self.epy_block_2, 0))
         self.connect((self.blocks_unpack_k_bits_bb_0_0, 0), (self.digital_correlate_access_code_xx_ts_0_0, 0))
         self.connect((self.digital_constellation_decoder_cb_0_0, 0), (self.digital_diff_decoder_bb_0_0, 0))
         self.connect((self.digital_constellation_modulator_0, 0), (self.blocks_multiply_const_vxx_0, 0))
@@ -285,10 +300,10 @@ class user_1(gr.top_block, Qt.QWidget):
         self.connect((self.digital_diff_decoder_bb_0_0, 0), (self.digital_map_bb_0_0, 0))
         self.connect((self.digital_linear_equalizer_0_0_0, 0), (self.digital_costas_loop_cc_0_0, 0))
         self.connect((self.digital_map_bb_0_0, 0), (self.blocks_unpack_k_bits_bb_0_0, 0))
+        self.connect((self.epy_block_3, 0), (self.digital_constellation_modulator_0, 0))
         self.connect((self.digital_symbol_sync_xx_0_0, 0), (self.digital_linear_equalizer_0_0_0, 0))
-        self.connect((self.pdu_pdu_to_tagged_stream_0, 0), (self.blocks_tagged_stream_mux_0, 0))
-        self.connect((self.pdu_pdu_to_tagged_stream_0_0, 0), (self.blocks_tagged_stream_mux_0, 1))
-        self.connect((self.soapy_bladerf_source_0_0, 0), (self.digital_symbol_sync_xx_0_0, 0))
+        self.connect((self.epy_block_4, 0), (self.blocks_selector_0, 0))
+        self.connect((self.soapy_bladerf_source_0_0, 0), (self.epy_block_4, 0))
         self.connect((self.soapy_bladerf_source_0_0, 0), (self.qtgui_const_sink_x_0, 0))
 
 
@@ -300,6 +315,21 @@ class user_1(gr.top_block, Qt.QWidget):
 
         event.accept()
 
+    def get_burst_rx(self):
+        return self.burst_rx
+
+    def set_burst_rx(self, burst_rx):
+        self.burst_rx = burst_rx
+        self.blocks_selector_0.set_output_index(self.burst_rx)
+        self.epy_block_0_0.sync_burst_len = 0 if self.burst_rx else self.sync_burst_len
+
+    def get_sync_burst_len(self):
+        return self.sync_burst_len
+
+    def set_sync_burst_len(self, sync_burst_len):
+        self.sync_burst_len = sync_burst_len
+        self.epy_block_0_0.sync_burst_len = 0 if self.burst_rx else self.sync_burst_len
+
     def get_sps(self):
         return self.sps
 
@@ -414,12 +444,24 @@ class user_1(gr.top_block, Qt.QWidget):
 
 
 
+def argument_parser():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--burst-rx", dest="burst_rx", type=intx, default=0,
+        help="Set Burst-mode RX [default=%(default)r]")
+    parser.add_argument(
+        "--sync-burst-len", dest="sync_burst_len", type=intx, default=100,
+        help="Set Sync burst length [default=%(default)r]")
+    return parser
+
 
 def main(top_block_cls=user_1, options=None):
+    if options is None:
+        options = argument_parser().parse_args()
 
     qapp = Qt.QApplication(sys.argv)
 
-    tb = top_block_cls()
+    tb = top_block_cls(burst_rx=options.burst_rx, sync_burst_len=options.sync_burst_len)
 
     tb.start()
     tb.flowgraph_started.set()
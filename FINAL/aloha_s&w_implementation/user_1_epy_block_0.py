@@ -5,8 +5,11 @@ from gnuradio import gr
 from PyQt5 import QtWidgets, QtCore, QtGui
 import sys
 import pmt
+import time
 from datetime import datetime
 import os
+from link_pdu import make_message, parse_message, parse_queue_status
+from link_priority import PRIO_EMERGENCY, PRIO_ROUTINE, PRIO_URGENT, SendGate
 
 # For sound effects
 try:
@@ -267,8 +270,8 @@ class MessageBubble(QtWidgets.QFrame):
 
 
 class _GuiPoster(QtCore.QObject):
-    """Helper QObject to post strings into the Qt thread safely."""
-    sig = QtCore.pyqtSignal(str)  # emits text payload
+    """Helper QObject to post incoming messages into the Qt thread safely."""
+    sig = QtCore.pyqtSignal(object)  # emits a parse_message() dict
 
     def __init__(self):
         super().__init__()
@@ -277,9 +280,14 @@ class _GuiPoster(QtCore.QObject):
 class messenger_gui(gr.basic_block):
     """
     Hospital Paging System GUI (GNU Radio embedded block).
-    - Outgoing messages: published on message port "out" with numeric address prepended as "addr:body"
+    - Outgoing messages: published on message port "out" as message PDUs
+      ({'dst', 'msg_id', 'timestamp'} + UTF-8 body, see link_pdu)
     - Feedback port "feedback": updates delivery status
-    - Incoming messages: received on port "in_msg" (same numeric format "addr:body")
+    - Port "queue_status": TX queue depth per destination (see link_pdu). Routine
+      pages to a congested destination are held back until it drains, and
+      refused once too many are held
+    - Incoming messages: message PDUs received on port "in_msg" (legacy "addr:body"
+      strings are still displayed)
     """
 
     def __init__(self, bg_image=""):
@@ -291,23 +299,31 @@ class messenger_gui(gr.basic_block):
         )
 
         # Message ports
-        self.message_port_register_out(pmt.intern("out"))    # outgoing messages
+        self.port_out = pmt.intern("out")
+        self.message_port_register_out(self.port_out)    # outgoing messages
         self.message_port_register_out(pmt.intern("sync_cmd"))
         self.message_port_register_in(pmt.intern("feedback"))# delivery feedback
         self.message_port_register_in(pmt.intern("in_msg"))  # incoming messages from remote/devices
+        self.message_port_register_in(pmt.intern("queue_status"))  # TX queue depth per destination
 
         # Bind handlers
         self.set_msg_handler(pmt.intern("feedback"), self._process_feedback)
         self.set_msg_handler(pmt.intern("in_msg"), self._receive_message)
+        self.set_msg_handler(pmt.intern("queue_status"), self._process_queue_status)
 
         # Poster used to safely move messages to GUI thread
         self._poster = _GuiPoster()
         self._poster.sig.connect(self._display_incoming)  # connect to GUI-thread handler
+        self._status_poster = _GuiPoster()
+        self._status_poster.sig.connect(self._apply_queue_status)
+
+        # Backpressure from the link layer (held pages wait here)
+        self.send_gate = SendGate()
 
         # Message tracking
         self.message_widgets = {}  # Store message widgets for feedback
         self.message_counter = 0
-        self.MAX_CHARS = 255  # Maximum characters allowed
+        self.MAX_CHARS = 4096  # Maximum characters allowed (long messages are fragmented by the link layer)
 
         # Qt Application
         self.app = QtWidgets.QApplication.instance()
@@ -371,6 +387,10 @@ class messenger_gui(gr.basic_block):
             }
         """)
         title_layout.addWidget(status_label)
+
+        # TX queue of the selected recipient (queue_status port)
+        self.queue_label = QtWidgets.QLabel()
+        title_layout.addWidget(self.queue_label)
         
         main_layout.addLayout(title_layout)
 
@@ -438,6 +458,27 @@ class messenger_gui(gr.basic_block):
             }
         """)
         recipient_layout.addWidget(self.addr_box)
+
+        # Priority class sent in the message PDU (link layer: emergency jumps the queue)
+        self.prio_box = QtWidgets.QComboBox()
+        self.prio_box.addItem("Routine", userData=PRIO_ROUTINE)
+        self.prio_box.addItem("Urgent", userData=PRIO_URGENT)
+        self.prio_box.addItem("🚨 Emergency", userData=PRIO_EMERGENCY)
+        self.prio_box.setFixedWidth(150)
+        self.prio_box.setStyleSheet("""
+            QComboBox {
+                background-color: white;
+                border: 2px solid #E53E3E;
+                border-radius: 6px;
+                padding: 8px;
+                font-size: 14px;
+                font-weight: bold;
+            }
+            QComboBox::drop-down {
+                border: none;
+            }
+        """)
+        recipient_layout.addWidget(self.prio_box)
         control_layout.addWidget(recipient_group)
 
         control_layout.addSpacing(20)
@@ -635,9 +676,12 @@ class messenger_gui(gr.basic_block):
         self.send_button.clicked.connect(self.send_message)
         self.input_box.returnPressed.connect(self.send_message)
         self.sync_button.clicked.connect(self.send_sync_cmd)
+        self.addr_box.currentIndexChanged.connect(self.update_priority_default)
+        self.addr_box.currentIndexChanged.connect(self.update_queue_label)
         
         # Initial button state
         self.update_send_button_state()
+        self.update_queue_label()
 
         # Show window
         self.qt_widget.show()
@@ -655,6 +699,44 @@ class messenger_gui(gr.basic_block):
             self.input_box.setProperty("invalid", False)
         self.input_box.style().polish(self.input_box)
         
+    def update_priority_default(self, index):
+        """Pages to the Emergency Room default to emergency priority"""
+        emergency = self.prio_box.findData(PRIO_EMERGENCY)
+        if self.addr_box.itemData(index) == "11":
+            self.prio_box.setCurrentIndex(emergency)
+        elif self.prio_box.currentIndex() == emergency:
+            self.prio_box.setCurrentIndex(self.prio_box.findData(PRIO_ROUTINE))
+
+    def update_queue_label(self, index=None):
+        """Show the TX queue depth of the selected recipient"""
+        dst = int(self.addr_box.currentData() or 0)
+        status = self.send_gate.status.get(dst)
+        held = len(self.send_gate.held[dst])
+        if status is None:
+            text, color, background = "📦 QUEUE: -", "#38A169", "#C6F6D5"
+        else:
+            text = f"📦 QUEUE: {status['depth']}/{status['limit'] or '∞'}"
+            if status['full']:
+                color, background = "#E53E3E", "#FED7D7"
+            elif status['congested'] or held:
+                color, background = "#D69E2E", "#FEFCBF"
+            else:
+                color, background = "#38A169", "#C6F6D5"
+        if held:
+            text += f" (+{held} held)"
+        self.queue_label.setText(text)
+        self.queue_label.setStyleSheet(f"""
+            QLabel {{
+                color: {color};
+                font-size: 14px;
+                font-weight: bold;
+                background-color: {background};
+                padding: 4px 12px;
+                border-radius: 12px;
+                border: 1px solid {color};
+            }}
+        """)
+
     def update_send_button_state(self):
         """Enable/disable send button based on character count"""
         text = self.input_box.text().strip()
@@ -752,17 +834,33 @@ class messenger_gui(gr.basic_block):
                 # Default to station 1
                 numeric_address = "1"
         
-        # Create the message in "addr:body" format with numeric address
-        full_msg = f"{numeric_address}:{text}"
-        
         # Get display text for GUI
         display_address = self.addr_box.currentText()
 
-        # Publish as PMT symbol/string on 'out' port
+        # Publish as a message PDU on 'out' port (routine pages wait while the
+        # recipient's TX queue is congested)
         try:
-            self.message_port_pub(pmt.intern("out"), pmt.intern(full_msg))
-        except Exception:
-            self.message_port_pub(pmt.intern("out"), pmt.intern(full_msg))
+            msg = make_message(
+                text,
+                dst=int(numeric_address),
+                msg_id=self.message_counter + 1,
+                timestamp=time.time(),
+                priority=self.prio_box.currentData()
+            )
+            held = {'msg': msg, 'widget': None}
+            verdict = self.send_gate.admit(int(numeric_address), self.prio_box.currentData(), held)
+            if verdict == 'refuse':
+                print(f"[Hospital Paging] TX queue to {display_address} is full, page not sent")
+                self.play_sound("error")
+                self.queue_label.setText(f"⛔ {display_address.upper()} BUSY - TRY AGAIN")
+                QtCore.QTimer.singleShot(2000, self.update_queue_label)
+                return
+            if verdict == 'send':
+                self.message_port_pub(self.port_out, msg)
+        except Exception as e:
+            print("[Hospital Paging] failed to send message:", e)
+            self.play_sound("error")
+            return
 
         # Create and display message bubble
         message_widget = MessageBubble(
@@ -772,6 +870,10 @@ class messenger_gui(gr.basic_block):
             numeric_address=numeric_address
         )
         self.chat_layout.addWidget(message_widget, alignment=QtCore.Qt.AlignRight)
+        if verdict == 'hold':
+            held['widget'] = message_widget
+            message_widget.status_label.setText("⏸ Held (queue busy)")
+            self.update_queue_label()
         
         # Store widget reference for feedback
         self.message_counter += 1
@@ -824,60 +926,75 @@ class messenger_gui(gr.basic_block):
                         }
                     """)
 
+    def _process_queue_status(self, msg_pmt):
+        """Handler for 'queue_status' port: posts the status to the GUI thread"""
+        status = parse_queue_status(msg_pmt)
+        if status is not None:
+            self._status_poster.sig.emit(status)
+
+    def _apply_queue_status(self, status):
+        """New TX queue status: send the held pages it makes room for"""
+        for held in self.send_gate.update(status['dst'], status):
+            try:
+                self.message_port_pub(self.port_out, held['msg'])
+            except Exception as e:
+                print("[Hospital Paging] failed to send held message:", e)
+                continue
+            if held['widget'] is not None:
+                held['widget'].status_label.setText("⏳ Sending...")
+        self.update_queue_label()
+
     def _receive_message(self, msg_pmt):
         """
-        Handler for 'in_msg' port. Extracts string and posts it to GUI thread.
+        Handler for 'in_msg' port. Decodes the message PDU and posts it to GUI thread.
         """
         try:
-            if pmt.is_symbol(msg_pmt) or pmt.is_string(msg_pmt):
-                s = pmt.symbol_to_string(msg_pmt)
-            else:
-                py = pmt.to_python(msg_pmt)
-                s = str(py)
+            message = parse_message(msg_pmt)
+            if message is None:
+                # Not a message PDU: show whatever text it holds
+                text = pmt.symbol_to_string(msg_pmt) if pmt.is_symbol(msg_pmt) else str(pmt.to_python(msg_pmt))
+                message = {'src': None, 'dst': None, 'body': text.encode('utf-8')}
         except Exception:
-            s = "<unreadable message>"
+            message = {'src': None, 'dst': None, 'body': b"<unreadable message>"}
 
         # Post to GUI-thread handler
         try:
-            self._poster.sig.emit(s)
+            self._poster.sig.emit(message)
         except Exception:
             try:
-                self._display_incoming(s)
+                self._display_incoming(message)
             except Exception:
-                print("[Hospital Paging] failed to deliver incoming message to GUI:", s)
+                print("[Hospital Paging] failed to deliver incoming message to GUI:", message)
 
-    def _display_incoming(self, full_msg):
+    def _display_incoming(self, message):
         """
         Display incoming message bubble.
-        full_msg expected in "addr:body" format with numeric address.
+        message is a parse_message() dict; legacy "addr:body" strings carry the
+        sender address in 'dst'.
         """
         self.play_sound("receive")
         
-        # Parse numeric address and body
-        if ":" in full_msg:
-            numeric_address, body = full_msg.split(":", 1)
+        body = message['body'].decode('utf-8', errors='replace')
+        addr_num = message['src'] if message['src'] is not None else message['dst']
+        if addr_num is not None:
+            numeric_address = str(addr_num)
             
             # Convert numeric address to display name
-            try:
-                addr_num = int(numeric_address)
-                if 1 <= addr_num <= 10:
-                    display_address = f"Station {addr_num}"
-                elif addr_num == 11:
-                    display_address = "Emergency Room"
-                elif addr_num == 12:
-                    display_address = "Pharmacy"
-                elif addr_num == 13:
-                    display_address = "Lab"
-                elif addr_num == 14:
-                    display_address = "Radiology"
-                else:
-                    display_address = f"Station {addr_num}"
-            except ValueError:
-                display_address = f"Station {numeric_address}"
+            if 1 <= addr_num <= 10:
+                display_address = f"Station {addr_num}"
+            elif addr_num == 11:
+                display_address = "Emergency Room"
+            elif addr_num == 12:
+                display_address = "Pharmacy"
+            elif addr_num == 13:
+                display_address = "Lab"
+            elif addr_num == 14:
+                display_address = "Radiology"
+            else:
+                display_address = f"Station {addr_num}"
         else:
             display_address = "Unknown Station"
             numeric_address = "?"
-            body = full_msg
 
         # Create and display message bubble
         message_widget = MessageBubble(
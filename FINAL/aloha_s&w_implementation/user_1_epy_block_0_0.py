@@ -4,8 +4,23 @@ import pmt
 import threading
 import queue
 import time
-import random
 import struct
+from collections import deque
+from link_aggregate import fits, pack_messages, unpack_messages
+from link_contention import ContentionEstimator
+from link_crc import crc16
+from link_csma import CarrierSense
+from link_fec import FEC_SYNC_WORD, FecFrameExtractor, fec_encode
+from link_fragment import Reassembler, fragment_message
+from link_framing import PHY_HEADER_SIZE, FrameExtractor, FramingSavings, marked_preamble
+from link_framing import PKT_ACK, PKT_AGG, PKT_BEACON, PKT_DATA, PKT_FRAG, PKT_POLL_REQ
+from link_poll import GRANT_SIZE, GrantQueue, PollScheduler, build_grants, request_slots
+from link_pdu import KEY_DST, bytes_to_pdu, make_message, make_queue_status, parse_message, pdu_to_bytes
+from link_preamble import SyncBurstFilter, sync_burst
+from link_priority import (DROP_POLICIES, PRIO_EMERGENCY, PRIO_ROUTINE, PRIORITY_NAMES, ClassDelays,
+                           PriorityTxQueue, priority_level)
+from link_rto import RttEstimator
+from link_slots import SlotClock, build_beacon, frame_airtime, parse_beacon, slot_length
 
 class blk(gr.sync_block):
     """
@@ -16,13 +31,74 @@ class blk(gr.sync_block):
 
     """
     
-    def __init__(self, node_id=1, aloha_prob=0.3, timeout=1.0, max_retries=3):
+    def __init__(self, node_id=1, aloha_prob=0.3, timeout=1.0, max_retries=3, aggregate=False,
+                 fec_dsts=(), fec_nsym=16, fec_depth=2, string_out=False, sync_burst_len=100,
+                 phy_framing='auto', mac_mode='aloha', csma_slot=0.005, csma_cw_min=4,
+                 csma_cw_max=256, samp_rate=600e3, sps=4, slot_guard=0.01, beacon_interval=0.0,
+                 poll_minislots=4, aloha_adapt=True, emergency_dsts=(11,), priority_ttl=(0.0, 300.0, 120.0),
+                 tx_queue_limit=32, tx_queue_watermarks=(24, 8), drop_policy='priority'):
         """
         Arguments:
             node_id: Unique identifier for this node (1-255)
-            aloha_prob: Transmission probability for ALOHA (0.0-1.0)
-            timeout: ARQ timeout in seconds
+            aloha_prob: Transmission probability for ALOHA (0.0-1.0); with aloha_adapt
+                        the upper bound, used while the channel is quiet
+            timeout: Initial ARQ timeout in seconds; the RTO then adapts per
+                     destination from measured RTT (Jacobson/Karels, Karn, backoff)
             max_retries: Maximum retransmission attempts
+            aggregate: If True, messages queued for the same destination are
+                       sent together in one PKT_AGG frame (up to MAX_PAYLOAD)
+            fec_dsts: Destination IDs whose frames are sent with Reed-Solomon FEC
+                      + interleaving (FEC frames are always accepted on receive)
+            fec_nsym: RS parity bytes per codeword (corrects fec_nsym/2 byte errors)
+            fec_depth: Minimum number of interleaved codewords per frame
+            string_out: Compatibility: publish received messages on msg_out as the
+                        old "[From Node X]: body" symbols instead of message PDUs
+            sync_burst_len: Length (in bytes, at most 8191) of the PN sync burst sent
+                            before each new packet (0 disables it)
+            phy_framing: 'auto': advertise bare-frame support in the preamble and leave out
+                         preamble + sync word towards peers that advertise it too;
+                         'on': always send bare frames; 'off': always send full frames.
+                         Bare frames are delimited by the protocol_formatter_async header
+                         and are accepted in every mode.
+            mac_mode: 'aloha' for p-persistent ALOHA, 'csma' for listen-before-talk:
+                      every attempt waits for an idle channel (channel_busy port, from
+                      the RX energy gate) plus a random backoff; 'slotted' for slotted
+                      ALOHA: the ALOHA backoff before every attempt, which then starts
+                      on the next slot boundary of the base station's beacon grid;
+                      'polled' for reservation TDMA: every attempt waits for a slot
+                      the base station granted after a slot request
+            csma_slot: CSMA backoff slot (seconds)
+            csma_cw_min: CSMA contention window (slots) after an ACKed frame
+            csma_cw_max: CSMA contention window limit; the window doubles on every
+                         ACK timeout (binary exponential backoff)
+            samp_rate: Sample rate after the modulator (for the frame airtime)
+            sps: Samples per symbol of the modulator (QPSK, 2 bits per symbol)
+            slot_guard: Slotted ALOHA: guard time (seconds) added to the airtime of a
+                        full-size frame + its ACK (with sync bursts) to get the slot length
+            beacon_interval: > 0 makes this node the base station: it owns the slot grid
+                             and broadcasts a beacon about every beacon_interval seconds
+            poll_minislots: Polled mode (base station): request minislots after each beacon
+            aloha_adapt: Adapt the ALOHA transmit probability and backoff window to the
+                         contention seen (ACK timeouts, CRC-error bursts, stations heard);
+                         current values go out on the stats port
+            emergency_dsts: Destinations whose messages are emergency pages unless the
+                            message PDU brings its own 'priority' (11: Emergency Room).
+                            Emergency messages jump the TX queue, skip the ALOHA backoff
+                            on their first attempt and take over the backoff of a routine
+                            frame that has not been on the air yet
+            priority_ttl: Seconds an emergency / urgent / routine message may wait in the
+                          TX queue before it is dropped as failed (0: never); a 'ttl'
+                          in the message PDU overrides it
+            tx_queue_limit: Messages queued per destination (0: unbounded); one more
+                            triggers the drop policy and is reported as failed if
+                            it cannot get in
+            tx_queue_watermarks: (high, low) queued messages per destination: the
+                                 destination turns congested at 'high' and clears
+                                 at 'low' (on the queue_status port, for the GUI)
+            drop_policy: What a full destination does with one more message:
+                         'tail' refuses it, 'head' drops its oldest message,
+                         'priority' drops its oldest least urgent one (none of
+                         them drops a message more urgent than the new one)
         """
         gr.sync_block.__init__(
             self,
@@ -36,6 +112,24 @@ class blk(gr.sync_block):
         self.aloha_prob = aloha_prob
         self.timeout = timeout
         self.max_retries = max_retries
+        self.aggregate = bool(aggregate)
+        self.fec_dsts = set(int(d) & 0xFF for d in fec_dsts)
+        self.fec_nsym = int(fec_nsym)
+        self.fec_depth = int(fec_depth)
+        self.string_out = bool(string_out)
+        self.sync_burst_len = int(sync_burst_len)
+        self.SYNC_CMD_LEN = 1000  # manual sync from the GUI button
+        self.mac_mode = str(mac_mode).lower()
+        if self.mac_mode not in ('aloha', 'csma', 'slotted', 'polled'):
+            print(f"[Node {node_id}] Unknown mac_mode '{mac_mode}', using 'aloha'")
+            self.mac_mode = 'aloha'
+        if drop_policy not in DROP_POLICIES:
+            print(f"[Node {node_id}] Unknown drop_policy '{drop_policy}', using 'priority'")
+            drop_policy = 'priority'
+        self.csma = CarrierSense(slot=csma_slot, cw_min=csma_cw_min, cw_max=csma_cw_max)
+        self.ALOHA_STEP = (0.1, 0.5)  # ALOHA backoff step range (seconds)
+        self.contention = ContentionEstimator(p_max=aloha_prob, step=sum(self.ALOHA_STEP) / 2.0,
+                                              adaptive=aloha_adapt)
         
         # Packet parameters
         self.PREAMBLE = bytes([0xAA, 0xAA, 0xAA, 0xAA])
@@ -44,21 +138,99 @@ class blk(gr.sync_block):
         self.HEADER_SIZE = 8  # preamble(4) + sync(2) + src(1) + dst(1)
         self.CRC_SIZE = 2
         
-        # Packet types
-        self.PKT_DATA = 0x01
-        self.PKT_ACK = 0x02
+        # PHY-delimited (bare) frames: [src][dst][seq][type][len][payload][CRC16] per PDU
+        self.phy_framing = str(phy_framing).lower()
+        if self.phy_framing not in ('off', 'auto', 'on'):
+            print(f"[Node {node_id}] Unknown phy_framing '{phy_framing}', using 'auto'")
+            self.phy_framing = 'auto'
+        self.bare_peers = set()  # peers that advertised bare-frame support ('auto')
+        self.framing_savings = FramingSavings(len(self.PREAMBLE) + len(self.SYNC_WORD))
+        if self.phy_framing != 'off':
+            self.PREAMBLE = marked_preamble(self.PREAMBLE)
         
-        # CRC-16 CCITT lookup table
-        self.crc_table = self.generate_crc_table()
+        # Slotted ALOHA: one slot holds a full-size frame and its ACK, each
+        # behind a sync burst (polled mode: plus a slot request)
+        self.samp_rate = float(samp_rate)
+        self.sps = int(sps)
+        framing = len(self.PREAMBLE) + len(self.SYNC_WORD) + 5 + self.CRC_SIZE
+        pdus = [framing + self.MAX_PAYLOAD, framing]
+        if self.sync_burst_len > 0:
+            pdus += [len(sync_burst(self.sync_burst_len))] * 2
+        # Airtime around a DATA frame (ACK, sync bursts), for the contention estimate
+        self.exchange_pdus = pdus[1:]
+        if self.mac_mode == 'polled':
+            pdus.append(framing + 1)
+        self.slots = SlotClock(slot_length(pdus, self.samp_rate, self.sps, guard=slot_guard))
+        self.beacon_interval = float(beacon_interval)
+        
+        # Polled mode: request minislots after every beacon, then the slots the
+        # base station granted
+        self.poll = PollScheduler(self.node_id, minislots=poll_minislots)
+        self.poll_minislot = slot_length([framing + 1], self.samp_rate, self.sps, guard=slot_guard)
+        self.poll_grants = GrantQueue()
+        self.poll_base = None        # base station id (source of the beacons)
+        self.poll_waiting = 0        # frames waiting in poll_access() for a grant
+        self.poll_event = threading.Event()  # set when a beacon has been handled
+        
+        if self.beacon_interval > 0:
+            beacon_slots = int(round(self.beacon_interval / self.slots.slot))
+            if self.mac_mode == 'polled':
+                # Beacon + request minislots + at least one granted slot
+                beacon_slots = max(beacon_slots, 2 + request_slots(
+                    self.poll.minislots, self.poll_minislot, self.slots.slot))
+            self.slots.start_master(time.monotonic(), max(2, beacon_slots))
+        
+        # Packet types (shared table in link_framing)
+        self.PKT_DATA = PKT_DATA
+        self.PKT_ACK = PKT_ACK
+        self.PKT_AGG = PKT_AGG
+        self.PKT_FRAG = PKT_FRAG
+        self.PKT_BEACON = PKT_BEACON
+        self.PKT_POLL_REQ = PKT_POLL_REQ
+
+        # Reassembly of fragmented messages
+        self.REASSEMBLY_TIMEOUT = 30.0
+        self.REASSEMBLY_MAX_BYTES = 64 * 1024
+        self.REASSEMBLY_MAX_MESSAGES = 16
         
         # State management
-        self.tx_queue = queue.Queue()
+        # TX queue: one FIFO per priority class (link_priority), stale messages expire,
+        # at most tx_queue_limit messages per destination
+        self.emergency_dsts = set(int(d) & 0xFF for d in emergency_dsts)
+        self.queue_delays = ClassDelays()
+        self.tx_queue = PriorityTxQueue(ttl=priority_ttl, delays=self.queue_delays,
+                                        on_expire=self.expire_tx_message, limit=tx_queue_limit,
+                                        watermarks=tx_queue_watermarks, policy=drop_policy,
+                                        on_drop=self.drop_tx_message, on_status=self.publish_queue_status)
+        self.tx_deferred = deque()  # fragments still to send (and preempted ones)
         self.rx_queue = queue.Queue()
         self.ack_queue = queue.Queue()
         self.pending_ack = {}
         self.seq_num_tx = 0
         self.seq_num_rx = {}
-        self.rx_buffer = bytes()
+        self.rx_msg_counter = 0  # local msg_id of delivered messages
+        self.frag_msg_id = {}  # next msg-id per destination for fragmented messages
+        self.reassembler = Reassembler(
+            timeout=self.REASSEMBLY_TIMEOUT,
+            max_bytes=self.REASSEMBLY_MAX_BYTES,
+            max_messages=self.REASSEMBLY_MAX_MESSAGES
+        )
+        self.rtt_estimators = {}
+        valid_types = {self.PKT_DATA, self.PKT_ACK, self.PKT_AGG, self.PKT_FRAG, self.PKT_BEACON,
+                       self.PKT_POLL_REQ}
+        self.framer = FrameExtractor(
+            self.SYNC_WORD,
+            self.calculate_crc16,
+            max_payload=self.MAX_PAYLOAD,
+            valid_types=valid_types
+        )
+        self.fec_framer = FecFrameExtractor(
+            self.calculate_crc16,
+            max_payload=self.MAX_PAYLOAD,
+            valid_types=valid_types
+        )
+        # Sync bursts from any node are recognized and dropped before framing
+        self.burst_filter = SyncBurstFilter()
         
         # Statistics
         self.stats = {
@@ -67,97 +239,95 @@ class blk(gr.sync_block):
             'acks_sent': 0,
             'acks_received': 0,
             'retransmissions': 0,
-            'crc_errors': 0
+            'messages_sent': 0,
+            'bytes_sent': 0,
+            'beacons_sent': 0,
+            'unslotted_frames': 0  # slotted/polled mode, sent as pure ALOHA (no beacon yet)
+        }
+        # enqueue->air latency per frame class: {'frames', 'sum', 'max'}
+        self.mac_latency = {
+            'ack': {'frames': 0, 'sum': 0.0, 'max': 0.0},
+            'data': {'frames': 0, 'sum': 0.0, 'max': 0.0},
         }
         
         # Threading
         self.running = True
+        self.stop_event = threading.Event()
         self.tx_thread = threading.Thread(target=self.tx_handler)
         self.rx_thread = threading.Thread(target=self.rx_handler)
+        self.beacon_thread = threading.Thread(target=self.beacon_handler)
         self.lock = threading.Lock()
         
-        # Message ports
+        # Message ports (symbols interned once, not on every publish)
+        self.port_pdu_in = pmt.intern('pdu_in')
+        self.port_msg_in = pmt.intern('msg_in')
+        self.port_sync_cmd = pmt.intern('sync_cmd')
+        self.port_channel_busy = pmt.intern('channel_busy')
+        self.port_feedback = pmt.intern('feedback')
+        self.port_msg_out = pmt.intern('msg_out')
+        self.port_pdu_out = pmt.intern('pdu_out')
+        self.port_stats = pmt.intern('stats')
+        self.port_queue_status = pmt.intern('queue_status')
+        self.feedback_true = pmt.intern('TRUE')
+        self.feedback_false = pmt.intern('FALSE')
+        self.stats_keys = {}
         
-        self.message_port_register_in(pmt.intern('pdu_in'))
-        self.message_port_register_in(pmt.intern('msg_in'))
-        self.message_port_register_in(pmt.intern('sync_cmd'))
+        self.message_port_register_in(self.port_pdu_in)
+        self.message_port_register_in(self.port_msg_in)
+        self.message_port_register_in(self.port_sync_cmd)
+        self.message_port_register_in(self.port_channel_busy)
         
-        self.message_port_register_out(pmt.intern('feedback'))
-        self.message_port_register_out(pmt.intern('msg_out'))
-        self.message_port_register_out(pmt.intern('pdu_out'))
+        self.message_port_register_out(self.port_feedback)
+        self.message_port_register_out(self.port_msg_out)
+        self.message_port_register_out(self.port_pdu_out)
+        self.message_port_register_out(self.port_stats)
+        self.message_port_register_out(self.port_queue_status)
         # Set message handlers
-        self.set_msg_handler(pmt.intern('msg_in'), self.handle_msg_in)
-        self.set_msg_handler(pmt.intern('pdu_in'), self.handle_pdu_in)
-        self.set_msg_handler(pmt.intern('sync_cmd'), self.handle_sync_cmd)
+        self.set_msg_handler(self.port_msg_in, self.handle_msg_in)
+        self.set_msg_handler(self.port_pdu_in, self.handle_pdu_in)
+        self.set_msg_handler(self.port_sync_cmd, self.handle_sync_cmd)
+        self.set_msg_handler(self.port_channel_busy, self.handle_channel_busy)
         
         # Start threads
         self.tx_thread.start()
         self.rx_thread.start()
+        if self.beacon_interval > 0:
+            self.beacon_thread.start()
+            print(f"[Node {self.node_id}] Base station: {1000.0 * self.slots.slot:.2f} ms slots, "
+                  f"beacon every {self.slots.beacon_slots} slots")
         
         print(f"[Node {self.node_id}] Initialized - Ready for communication")
     
-    def generate_crc_table(self):
-        """Generate CRC-16 CCITT lookup table"""
-        poly = 0x1021
-        table = []
-        for i in range(256):
-            crc = i << 8
-            for j in range(8):
-                if crc & 0x8000:
-                    crc = ((crc << 1) ^ poly) & 0xFFFF
-                else:
-                    crc = (crc << 1) & 0xFFFF
-            table.append(crc)
-        return table
-    
     def calculate_crc16(self, data):
         """Calculate CRC-16 CCITT for given data"""
-        crc = 0xFFFF
-        for byte in data:
-            tbl_idx = ((crc >> 8) ^ byte) & 0xFF
-            crc = ((crc << 8) ^ self.crc_table[tbl_idx]) & 0xFFFF
-        return crc
+        return crc16(data)
     
     def handle_msg_in(self, msg):
-        """Handle incoming messages from GUI"""
+        """Handle outgoing messages from GUI (message PDUs, or legacy "dst:body" strings)"""
         try:
-            #redundant
-            # Handle string messages directly
-            if pmt.is_symbol(msg):
-                # Simple text message format: "dst_id:message"
-                text = pmt.symbol_to_string(msg)
-                if ':' in text:
-                    parts = text.split(':', 1)
-                    try:
-                        dst_id = int(parts[0])
-                        data = parts[1].encode()
-                        self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                        print(f"[Node {self.node_id}] Queued message to {dst_id}: {parts[1]}")
-                    except ValueError:
-                        print(f"[Node {self.node_id}] Invalid destination ID")
-            
-            #redundant
-            # Handle dictionary messages
-            elif pmt.is_dict(msg):
-                meta = pmt.to_python(msg)
-                if 'dst' in meta and 'data' in meta:
-                    dst_id = meta['dst']
-                    data = meta['data'].encode() if isinstance(meta['data'], str) else meta['data']
-                    self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                    print(f"[Node {self.node_id}] Queued message to {dst_id}")
-            
-            # Handle pair messages (PDU format)
-            elif pmt.is_pair(msg):
-                meta = pmt.to_python(pmt.car(msg))
-                data = pmt.to_python(pmt.cdr(msg))
-                if isinstance(meta, dict) and 'dst' in meta:
-                    dst_id = meta['dst']
-                    if isinstance(data, str):
-                        data = data.encode()
-                    elif isinstance(data, list):
-                        data = bytes(data)
-                    self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                    print(f"[Node {self.node_id}] Queued message to {dst_id}")
+            message = parse_message(msg)
+            if message is None or message['dst'] is None:
+                print(f"[Node {self.node_id}] Ignoring malformed message on msg_in")
+                return
+            dst = message['dst'] & 0xFF
+            default = PRIO_EMERGENCY if dst in self.emergency_dsts else PRIO_ROUTINE
+            priority = priority_level(message['priority'], default)
+            msg = {
+                'dst': dst,
+                'data': message['body'],
+                'type': self.PKT_DATA,
+                'msg_id': message['msg_id'],
+                'priority': priority,
+                'ttl': message['ttl'],
+                'enqueued': time.monotonic()
+            }
+            if not self.tx_queue.put(msg):
+                print(f"[Node {self.node_id}] TX queue for node {dst} is full, refusing "
+                      f"{PRIORITY_NAMES[priority]} message")
+                self.report_delivery(msg, False)
+                return
+            print(f"[Node {self.node_id}] Queued {PRIORITY_NAMES[priority]} message to {message['dst']} "
+                  f"({len(message['body'])} bytes)")
                     
         except Exception as e:
             print(f"[Node {self.node_id}] Error handling msg_in: {e}")
@@ -165,22 +335,13 @@ class blk(gr.sync_block):
     def handle_pdu_in(self, pdu):
         """Handle incoming PDUs from demodulator"""
         try:
-            # Extract PDU data
-            if pmt.is_pair(pdu):
-                meta = pmt.car(pdu)
-                data = pmt.cdr(pdu)
-                
-                # Convert to bytes
-                if pmt.is_u8vector(data):
-                    print(f"User Port {self.node_id} activated")	
-                    rx_bytes = bytes(pmt.u8vector_elements(data))	
-                    self.rx_queue.put(rx_bytes)
-                elif pmt.is_uniform_vector(data):
-                    # Handle float32 or other vector types
-                    elements = pmt.to_python(data)
-                    # Convert to bytes (assuming 8-bit symbols)
-                    rx_bytes = bytes([int(x) & 0xFF for x in elements])
-                    self.rx_queue.put(rx_bytes)
+            # u8vector or any other uniform vector (8-bit symbols)
+            rx_bytes = pdu_to_bytes(pdu)
+            if rx_bytes is not None:
+                print(f"User Port {self.node_id} activated")
+                rx_bytes = self.burst_filter.strip(rx_bytes)
+            if rx_bytes:
+                self.rx_queue.put(rx_bytes)
                     
         except Exception as e:
             print(f"[Node {self.node_id}] Error handling pdu_in: {e}")
@@ -209,67 +370,420 @@ class blk(gr.sync_block):
         crc_val = self.calculate_crc16(crc_data)
         packet.extend(struct.pack('>H', crc_val))
         
+        # FEC: protect header + payload + CRC with Reed-Solomon for this destination
+        if dst_id in self.fec_dsts:
+            coded = fec_encode(crc_data + struct.pack('>H', crc_val), self.fec_nsym, self.fec_depth)
+            return self.PREAMBLE + FEC_SYNC_WORD + coded
+        
+        bare = self.use_bare_framing(dst_id)
+        self.framing_savings.record(len(packet), bare)
+        if bare:
+            return bytes(packet[len(self.PREAMBLE) + len(self.SYNC_WORD):])
         return bytes(packet)
     
-    def parse_packet(self, data):
-        """Parse received packet and validate CRC"""
-        try:
-            # Find sync word
-            sync_idx = data.find(self.SYNC_WORD)
-            if sync_idx == -1:
-                return None
-            
-            # Check minimum packet size
-            start_idx = sync_idx + len(self.SYNC_WORD)
-            if len(data) < start_idx + 5 + self.CRC_SIZE:
-                return None
-            
-            # Extract header fields
-            src_id = data[start_idx]
-            dst_id = data[start_idx + 1]
-            seq_num = data[start_idx + 2]
-            pkt_type = data[start_idx + 3]
-            payload_len = data[start_idx + 4]
-            
-            # Check if we have complete packet
-            total_len = start_idx + 5 + payload_len + self.CRC_SIZE
-            if len(data) < total_len:
-                return None
-            
-            # Extract payload and CRC
-            payload = data[start_idx + 5:start_idx + 5 + payload_len]
-            rx_crc = struct.unpack('>H', data[total_len - self.CRC_SIZE:total_len])[0]
-            
-            # Verify CRC
-            crc_data = data[start_idx:total_len - self.CRC_SIZE]
-            calc_crc = self.calculate_crc16(crc_data)
-            
-            if rx_crc != calc_crc:
-                self.stats['crc_errors'] += 1
-                print(f"[Node {self.node_id}] CRC mismatch (expected: {calc_crc:04X}, got: {rx_crc:04X})")
-                return None
-            
-            return {
-                'src': src_id,
-                'dst': dst_id,
-                'seq': seq_num,
-                'type': pkt_type,
-                'payload': payload,
-                'consumed': total_len
-            }
-        except Exception as e:
-            print(f"[Node {self.node_id}] Error parsing packet: {e}")
-            return None
+    def use_bare_framing(self, dst):
+        """True if frames to dst are sent without preamble + sync word"""
+        if self.phy_framing == 'on':
+            return True
+        return self.phy_framing == 'auto' and dst in self.bare_peers
+    
+    def learn_framing(self, pkt):
+        """RX: a bare frame or a marked preamble means the sender accepts bare frames"""
+        if self.phy_framing == 'auto' and pkt.get('marked') and pkt['src'] not in self.bare_peers:
+            self.bare_peers.add(pkt['src'])
+            print(f"[Node {self.node_id}] Node {pkt['src']} accepts PHY-delimited frames, dropping preamble+sync")
+    
+    def framing_fallback(self, dst):
+        """Delivery to dst failed: go back to full frames until it advertises again"""
+        if dst in self.bare_peers:
+            self.bare_peers.discard(dst)
+            print(f"[Node {self.node_id}] Falling back to full framing towards node {dst}")
+    
+    def set_fec(self, dst, enabled):
+        """Enable or disable FEC for frames sent to one destination"""
+        if enabled:
+            self.fec_dsts.add(int(dst) & 0xFF)
+        else:
+            self.fec_dsts.discard(int(dst) & 0xFF)
     
     def send_sync_burst(self):
         """Sync Bursts are used before packet transmission to help syncing the SDRs"""
-        burst = bytes(random.getrandbits(8) for _ in range(100))
-        self.transmit_packet(burst)
+        if self.sync_burst_len > 0:
+            self.transmit_packet(sync_burst(self.sync_burst_len))
 
     def handle_sync_cmd(self, cmd):
         """Allows for manual syncing if necessary via sync button in GUI"""
-        burst = bytes(random.getrandbits(8) for _ in range(1000))
-        self.transmit_packet(burst)
+        self.transmit_packet(sync_burst(self.SYNC_CMD_LEN))
+
+    def aloha_backoff(self, priority=PRIO_ROUTINE, retry=False):
+        """
+        Total p-persistent ALOHA backoff (seconds) before the next attempt
+        (p and the step window follow the contention estimate). Emergency
+        messages skip it on their first attempt and wait one step on a retry.
+        """
+        if priority == PRIO_EMERGENCY:
+            return self.contention.step(*self.ALOHA_STEP) if retry else 0.0
+        backoff_time = 0.0
+        while not self.contention.transmit_now():
+            backoff_time += self.contention.step(*self.ALOHA_STEP)
+        return backoff_time
+
+    def aloha_access(self, priority=PRIO_ROUTINE, retry=False):
+        """
+        ALOHA: the backoff before every attempt. Retries back off too, so
+        frames that collided do not meet again one RTO later. True to send,
+        False on shutdown, None if a message more urgent than 'priority' came in.
+        """
+        backoff_time = self.aloha_backoff(priority, retry)
+        if backoff_time > 0:
+            print(f"[Node {self.node_id}] ALOHA backoff {backoff_time:.2f}s")
+        return self.backoff_wait(backoff_time, priority)
+
+    def backoff_wait(self, delay, priority=PRIO_ROUTINE):
+        """
+        Sleep 'delay' seconds before an attempt. True when done, False on
+        shutdown, None as soon as a message more urgent than 'priority' is queued.
+        """
+        deadline = time.monotonic() + delay
+        while not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            if self.tx_queue.wait_higher(priority, remaining):
+                return None
+        return False
+
+    def handle_channel_busy(self, msg):
+        """Channel state from the RX energy gate (True = busy)"""
+        try:
+            if pmt.is_pair(msg):
+                msg = pmt.cdr(msg)  # ('busy' . #t) style messages
+            self.csma.set_busy(pmt.to_python(msg))
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error handling channel_busy: {e}")
+    
+    def csma_access(self, priority=PRIO_ROUTINE):
+        """
+        CSMA: wait for an idle channel, then a random backoff from the contention
+        window (emergency messages: one slot, so ACKs still go first); start
+        over if the channel got busy meanwhile. False on shutdown.
+        """
+        deferred = False
+        while self.running:
+            if self.csma.busy:
+                if not deferred:
+                    deferred = True
+                    self.csma.stats['deferrals'] += 1
+                if not self.csma.idle.wait(self.csma.unblock_delay()):
+                    if self.csma.blocked():
+                        continue
+                    # Busy for longer than max_defer: the detector is assumed stuck
+                    self.csma.stats['forced'] += 1
+                    self.csma.set_busy(False)
+            backoff = self.csma.slot if priority == PRIO_EMERGENCY else self.csma.backoff()
+            if self.stop_event.wait(backoff):
+                return False
+            if not self.csma.busy:
+                return True
+        return False
+    
+    def slot_access(self, priority=PRIO_ROUTINE, retry=False):
+        """
+        Slotted ALOHA: sleep until the start of the slot to send in. Every
+        attempt draws the ALOHA backoff (retries too: aligned to slots,
+        colliding retries would meet again) and then waits for the next slot.
+        ACKs are sent right away, in the rest of the slot. Without a slot grid
+        (no beacon heard yet) frames are not aligned. Returns like aloha_access().
+        """
+        now = time.monotonic()
+        ready = now + self.aloha_backoff(priority, retry)
+        start = self.slots.next_slot(ready)
+        if start is None:
+            start = ready
+            self.stats['unslotted_frames'] += 1
+        return self.backoff_wait(max(start - now, 0.0), priority)
+    
+    def poll_access(self):
+        """
+        Polled: sleep until the start of a slot the base station granted.
+        Without a grant, wait for the next beacon (which asks for one if
+        needed). If more messages are queued, a slot request for them goes
+        out at the start of the granted slot, ahead of the DATA. Without a
+        slot grid (no beacon heard yet) the ALOHA backoff is used. False on
+        shutdown.
+        """
+        while self.running:
+            now = time.monotonic()
+            if not self.slots.synced(now):
+                self.poll_waiting = 0
+                self.stats['unslotted_frames'] += 1
+                return not self.stop_event.wait(self.aloha_backoff())
+            with self.lock:
+                self.poll_event.clear()
+                index = self.poll_grants.take(self.slots, now)
+                self.poll_waiting = 0 if index is not None else 1
+            if index is not None:
+                if self.stop_event.wait(max(self.slots.slot_start(index) - now, 0.0)):
+                    return False
+                queued = self.tx_queue.qsize() + len(self.tx_deferred)
+                if queued and not self.slots.master and self.poll_base is not None:
+                    self.transmit_packet(self.create_packet(self.poll_base, index & 0xFF,
+                                                            self.PKT_POLL_REQ, bytes([min(queued, 255)])))
+                    self.poll_grants.on_request(queued, False)
+                return True
+            # Grants come with the next beacon
+            self.poll_event.wait(self.slots.period * max(self.slots.beacon_slots, 1))
+        return False
+    
+    def poll_on_beacon(self, slot_index, payload):
+        """
+        Beacon received (or, at the base station, sent): take this node's grants;
+        if a frame waits and got none, send a slot request in a random minislot
+        """
+        with self.lock:
+            info = self.poll_grants.on_beacon(self.node_id, slot_index, self.slots.slot, payload)
+            if info is None:
+                return
+            minislots, minislot, new_grants = info
+            waiting = max(self.poll_waiting - new_grants, 0)
+            if not self.slots.master and self.poll_base is not None \
+                    and self.poll_grants.plan_request(waiting, new_grants) == 'minislot':
+                start = self.poll_grants.request_time(self.slots, slot_index, minislots, minislot)
+                packet = self.create_packet(self.poll_base, slot_index & 0xFF, self.PKT_POLL_REQ,
+                                            bytes([waiting]))
+                # The RX thread must not sleep: a timer puts the request on the air
+                timer = threading.Timer(max(start - time.monotonic(), 0.0), self.transmit_packet, (packet,))
+                timer.daemon = True
+                timer.start()
+                self.poll_grants.on_request(waiting, True)
+        self.poll_event.set()
+    
+    def beacon_handler(self):
+        """Base station thread: broadcast a slot beacon at the start of every beacon slot"""
+        index = 0
+        while self.running:
+            try:
+                beacon_slots = self.slots.beacon_slots
+                now = time.monotonic()
+                if self.slots.slot_start(index) < now:
+                    # Fell behind: go on with the next beacon slot still ahead
+                    index = -(-self.slots.slot_index(now) // beacon_slots) * beacon_slots
+                if self.stop_event.wait(max(self.slots.slot_start(index) - now, 0.0)):
+                    break
+                payload = build_beacon(index, self.slots.slot, beacon_slots)
+                if self.mac_mode == 'polled':
+                    # Grants for the slots after the request minislots (own frame included)
+                    now = time.monotonic()
+                    n_request = request_slots(self.poll.minislots, self.poll_minislot, self.slots.slot)
+                    with self.lock:
+                        own = self.poll_waiting + self.tx_queue.qsize() + len(self.tx_deferred)
+                        own -= len(self.poll_grants.granted)
+                    self.poll.set_demand(self.node_id, own, now)
+                    room = self.MAX_PAYLOAD - len(payload) - GRANT_SIZE
+                    grants = self.poll.assign(min(beacon_slots - 1 - n_request, room), now)
+                    payload += build_grants(self.poll.minislots, self.poll_minislot, grants, self.poll.poll_cycle)
+                self.transmit_packet(self.create_packet(0xFF, index & 0xFF, self.PKT_BEACON, payload))
+                self.stats['beacons_sent'] += 1
+                if self.mac_mode == 'polled':
+                    self.poll_on_beacon(index, payload)
+                index += beacon_slots
+            except Exception as e:
+                print(f"[Node {self.node_id}] Beacon handler error: {e}")
+    
+    def handle_beacon(self, pkt, rx_time, rx_len):
+        """Align the local slot grid to a base station beacon ('rx_len': bytes of its PDU)"""
+        beacon = parse_beacon(pkt['payload'])
+        if beacon is None or self.slots.master:
+            return
+        slot_index, slot, beacon_slots = beacon
+        was_synced = self.slots.synced(rx_time)
+        # The PDU is complete once its last byte is in: back to the start of its slot
+        start = rx_time - frame_airtime(rx_len + PHY_HEADER_SIZE, self.samp_rate, self.sps)
+        self.slots.on_beacon(slot_index, slot, beacon_slots, start)
+        if not was_synced:
+            print(f"[Node {self.node_id}] Slot grid from node {pkt['src']}: "
+                  f"{1000.0 * slot:.2f} ms slots, beacon every {beacon_slots} slots")
+        if self.mac_mode == 'polled':
+            self.poll_base = pkt['src']
+            self.poll_on_beacon(slot_index, pkt['payload'])
+    
+    def record_mac_latency(self, cls, enqueued):
+        """Accumulate enqueue->air latency for a frame class ('ack' or 'data')"""
+        if enqueued is None:
+            return
+        latency = time.monotonic() - enqueued
+        counters = self.mac_latency[cls]
+        counters['frames'] += 1
+        counters['sum'] += latency
+        counters['max'] = max(counters['max'], latency)
+
+    def rtt_for(self, dst):
+        """RTT estimator for a destination (created on first use)"""
+        est = self.rtt_estimators.get(dst)
+        if est is None:
+            est = RttEstimator(initial_rto=self.timeout)
+            self.rtt_estimators[dst] = est
+        return est
+
+    def publish_rtt_stats(self, dst):
+        """Publish SRTT/RTTVAR/RTO of a destination as a dict on the stats port"""
+        self.publish_stats(self.rtt_for(dst).as_dict(), dst)
+
+    def publish_stats(self, values, dst=None):
+        """Publish 'values' as a dict on the stats port ('dst' for per-destination ones)"""
+        try:
+            meta = pmt.make_dict()
+            if dst is not None:
+                meta = pmt.dict_add(meta, KEY_DST, pmt.from_long(dst))
+            for key, value in values.items():
+                sym = self.stats_keys.get(key)
+                if sym is None:
+                    sym = self.stats_keys[key] = pmt.intern(key)
+                if isinstance(value, int):
+                    meta = pmt.dict_add(meta, sym, pmt.from_long(value))
+                else:
+                    meta = pmt.dict_add(meta, sym, pmt.from_double(value))
+            self.message_port_pub(self.port_stats, meta)
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error publishing stats: {e}")
+
+    def next_tx_message(self, timeout):
+        """
+        Next message to send: deferred ones first (unless a more urgent
+        message is queued), then the TX queue
+        """
+        while self.tx_deferred:
+            head = self.tx_queue.head_priority()
+            if head is not None and head < self.tx_deferred[0].get('priority', PRIO_ROUTINE):
+                break
+            msg = self.tx_deferred.popleft()
+            expires = msg.get('expires')
+            if msg.get('group') is None and expires is not None and expires <= time.monotonic():
+                self.queue_delays.expired(msg['priority'])
+                self.expire_tx_message(msg)
+                continue
+            return msg
+        msg = self.tx_queue.get(timeout=timeout)
+        if msg['type'] == self.PKT_DATA and len(msg.get('data', b'')) > self.MAX_PAYLOAD:
+            # Long message: send its fragments back to back, ahead of newer messages
+            fragments = self.fragment_tx_message(msg)
+            if not fragments:
+                raise queue.Empty
+            msg = fragments[0]
+            self.tx_deferred.extendleft(reversed(fragments[1:]))
+        return msg
+
+    def fragment_tx_message(self, msg):
+        """Split a long app message into PKT_FRAG messages that share one feedback group"""
+        dst = msg['dst']
+        try:
+            payloads = fragment_message(msg['data'], self.frag_msg_id.get(dst, 0), self.MAX_PAYLOAD)
+        except ValueError as e:
+            print(f"[Node {self.node_id}] Cannot send message to {dst}: {e}")
+            self.message_port_pub(self.port_feedback, self.feedback_false)
+            return []
+        self.frag_msg_id[dst] = (self.frag_msg_id.get(dst, 0) + 1) % 256
+
+        group = {'fragments': len(payloads), 'acked': 0, 'feedback_sent': False}
+        print(f"[Node {self.node_id}] TX: Fragmenting {len(msg['data'])} bytes for node {dst} into {len(payloads)} frames")
+        return [
+            {
+                'dst': dst,
+                'data': payload,
+                'type': self.PKT_FRAG,
+                'group': group,
+                'enqueued': msg.get('enqueued'),
+                'priority': msg.get('priority', PRIO_ROUTINE),
+                'expires': msg.get('expires'),
+                # The message is counted once, with its last fragment
+                'msg_count': 1 if index == len(payloads) - 1 else 0,
+            }
+            for index, payload in enumerate(payloads)
+        ]
+
+    def expire_tx_message(self, msg):
+        """A queued message outlived its TTL: drop it and report it as failed"""
+        waited = time.monotonic() - msg.get('enqueued', time.monotonic())
+        print(f"[Node {self.node_id}] TX: Dropping {PRIORITY_NAMES[msg['priority']]} message "
+              f"to node {msg['dst']} after {waited:.1f}s in the queue (TTL)")
+        self.report_delivery(msg, False, msg.get('msg_count', 1))
+
+    def drop_tx_message(self, msg):
+        """A queued message was dropped to make room for a new one: report it as failed"""
+        print(f"[Node {self.node_id}] TX: Dropping {PRIORITY_NAMES[msg['priority']]} message "
+              f"to node {msg['dst']} (queue full, '{self.tx_queue.policy}' policy)")
+        self.report_delivery(msg, False, msg.get('msg_count', 1))
+
+    def publish_queue_status(self, dst, status):
+        """Depth and congestion of the TX queue for one destination, on the queue_status port"""
+        try:
+            self.message_port_pub(self.port_queue_status, make_queue_status(dst, status))
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error publishing queue status: {e}")
+
+    def requeue_tx_message(self, msg):
+        """Put back a message that was taken from the queue but not sent (preempted)"""
+        if msg.get('group') is not None:
+            self.tx_deferred.appendleft(msg)
+        else:
+            self.tx_queue.put(msg, front=True)
+
+    def record_queue_delay(self, msg):
+        """Queueing delay of a message on its first time on the air (fragments: the first one)"""
+        group = msg.get('group')
+        if group is not None:
+            if group.get('on_air'):
+                return
+            group['on_air'] = True
+        if msg.get('enqueued') is not None:
+            self.queue_delays.record(msg.get('priority', PRIO_ROUTINE), time.monotonic() - msg['enqueued'])
+
+    def report_delivery(self, msg, success, msg_count=1):
+        """Publish TRUE/FALSE feedback for a sent frame (once per app message)"""
+        self.publish_stats(dict(self.queue_delays.as_dict(self.tx_queue.depths()), **self.tx_queue.as_dict()))
+        group = msg.get('group')
+        if group is None:
+            for _ in range(msg_count):
+                self.message_port_pub(self.port_feedback, self.feedback_true if success else self.feedback_false)
+            return
+
+        # Fragment: the message succeeds once every fragment is ACKed and
+        # fails as soon as one of them is dropped
+        if group['feedback_sent']:
+            return
+        if success:
+            group['acked'] += 1
+            if group['acked'] < group['fragments']:
+                return
+        else:
+            # Do not send the rest of a message that can no longer be reassembled
+            self.tx_deferred = deque(m for m in self.tx_deferred if m.get('group') is not group)
+        group['feedback_sent'] = True
+        self.message_port_pub(self.port_feedback, self.feedback_true if success else self.feedback_false)
+
+    def aggregate_messages(self, msg):
+        """
+        Collect further queued messages for msg's destination.
+        Returns (pkt_type, payload, msg_count).
+        """
+        data = msg.get('data', b'')
+        if not self.aggregate or msg['dst'] == 0xFF or msg['type'] != self.PKT_DATA \
+                or not fits([], data, self.MAX_PAYLOAD):
+            return msg['type'], data, msg.get('msg_count', 1)
+
+        # Messages for other destinations stay in the queue (and in its per-destination count)
+        messages = [data]
+        while fits(messages, b'', self.MAX_PAYLOAD):
+            nxt = self.tx_queue.get_first(lambda m: m['dst'] == msg['dst'] and m['type'] == self.PKT_DATA
+                                          and fits(messages, m.get('data', b''), self.MAX_PAYLOAD))
+            if nxt is None:
+                break
+            messages.append(nxt.get('data', b''))
+
+        if len(messages) == 1:
+            return msg['type'], data, 1
+        print(f"[Node {self.node_id}] TX: Aggregated {len(messages)} messages for node {msg['dst']}")
+        return self.PKT_AGG, pack_messages(messages), len(messages)
 
     def tx_handler(self):
         """Thread for handling packet transmission with ARQ"""
@@ -277,49 +791,80 @@ class blk(gr.sync_block):
             try:
                 # Get message from queue (with timeout for thread safety)
                 try:
-                    msg = self.tx_queue.get(timeout=0.1)
+                    msg = self.next_tx_message(timeout=0.1)
                 except queue.Empty:
                     continue
                 
-                # ALOHA: Random backoff
-                while random.random() > self.aloha_prob:
-                    backoff_time = random.uniform(0.1, 0.5)
-                    print(f"[Node {self.node_id}] ALOHA backoff {backoff_time:.2f}s")
-                    time.sleep(backoff_time)
-                    
-                
                 # Prepare packet
                 with self.lock:
                     seq_num = self.seq_num_tx
                     self.seq_num_tx = (self.seq_num_tx + 1) % 256
                 
+                pkt_type, payload, msg_count = self.aggregate_messages(msg)
                 packet = self.create_packet(
                     msg['dst'],
                     seq_num,
-                    msg['type'],
-                    msg.get('data', b'')
+                    pkt_type,
+                    payload
                 )
+                self.contention.set_airtime(slot_length([len(packet)] + self.exchange_pdus,
+                                                        self.samp_rate, self.sps, guard=0.0))
                 
                 # Stop-and-Wait ARQ
                 retries = 0
                 ack_received = False
+                preempted = False
+                priority = msg.get('priority', PRIO_ROUTINE)
 
                 #self.send_sync_burst()
                 
                 while retries < self.max_retries and not ack_received:
                     # Transmit packet
                     print(f"[Node {self.node_id}] TX: Sending packet seq={seq_num} to node {msg['dst']} (attempt {retries + 1})")
+                    # Medium access before every attempt. ACKs are sent from the
+                    # RX thread and never wait on it. If a more urgent message
+                    # comes in during the backoff, a frame that has not been on
+                    # the air yet steps aside for it. Retries (the receiver only
+                    # remembers the last seq) and aggregated frames (their messages
+                    # left the queue) cannot: they inherit the priority of what
+                    # waits behind them and go out at once.
+                    can_yield = retries == 0 and pkt_type != self.PKT_AGG
+                    waiting = self.tx_queue.head_priority()
+                    if not can_yield and waiting is not None and waiting < priority:
+                        priority = waiting
+                    if self.mac_mode == 'aloha':
+                        access = self.aloha_access(priority, retries > 0)
+                    elif self.mac_mode == 'csma':
+                        access = self.csma_access(priority)
+                    elif self.mac_mode == 'slotted':
+                        access = self.slot_access(priority, retries > 0)
+                    else:
+                        access = self.poll_access()
+                    if access is None and can_yield:
+                        preempted = True
+                        break
+                    if access is None:
+                        print(f"[Node {self.node_id}] TX: Backoff cut short, a more urgent message is waiting")
+                    elif not access:
+                        break
                     # Attempt to sync before transmission
                     self.send_sync_burst()
                     self.transmit_packet(packet)
+                    sent_at = time.monotonic()
                     self.stats['packets_sent'] += 1
+                    self.stats['bytes_sent'] += len(packet)
+                    if retries == 0:
+                        self.stats['messages_sent'] += msg_count
+                        self.record_mac_latency('data', msg.get('enqueued'))
+                        self.record_queue_delay(msg)
                     
                     if retries > 0:
                         self.stats['retransmissions'] += 1
                     
                     # Wait for ACK
                     ack_key = f"{msg['dst']}_{seq_num}"
-                    timeout_time = time.time() + self.timeout
+                    rtt_est = self.rtt_for(msg['dst'])
+                    timeout_time = time.time() + rtt_est.rto
                     
                     while time.time() < timeout_time:
                         try:
@@ -327,26 +872,42 @@ class blk(gr.sync_block):
                             if ack['key'] == ack_key:
                                 ack_received = True
                                 self.stats['acks_received'] += 1
+                                self.csma.on_success()
+                                self.contention.on_success()
+                                self.publish_stats(self.contention.as_dict())
+                                # Karn: only frames sent once give an RTT sample
+                                if retries == 0:
+                                    rtt_est.sample(ack['rx_time'] - sent_at)
+                                    self.publish_rtt_stats(msg['dst'])
                                 print(f"[Node {self.node_id}] TX: ACK received for seq={seq_num}")
                                 # Informing GUI of message acknowledgment success
-                                output = "TRUE"
-                                msg = pmt.intern(output)
-                                self.message_port_pub(pmt.intern('feedback'), msg)
+                                self.report_delivery(msg, True, msg_count)
                                 break
                         except queue.Empty:
                             pass
                     
                     if not ack_received:
                         retries += 1
+                        rtt_est.on_timeout()
+                        # No ACK in time is taken as a collision: lower p, widen the windows
+                        self.contention.on_collision()
+                        self.publish_stats(self.contention.as_dict())
+                        if self.mac_mode == 'csma':
+                            self.csma.on_collision()
+                        self.publish_rtt_stats(msg['dst'])
                         if retries < self.max_retries:
                             print(f"[Node {self.node_id}] TX: Timeout, retry {retries}/{self.max_retries}")
                 
+                if preempted:
+                    print(f"[Node {self.node_id}] TX: seq={seq_num} preempted by a more urgent message")
+                    self.requeue_tx_message(msg)
+                    continue
+
                 if not ack_received:
                     print(f"[Node {self.node_id}] TX: Failed to deliver packet seq={seq_num} after {self.max_retries} attempts")
+                    self.framing_fallback(msg['dst'])
                     # Informing GUI of message acknowledgment failure
-                    output = "FALSE"
-                    msg = pmt.intern(output)
-                    self.message_port_pub(pmt.intern('feedback'), msg)
+                    self.report_delivery(msg, False, msg_count)
                     
             except Exception as e:
                 print(f"[Node {self.node_id}] TX handler error: {e}")
@@ -360,24 +921,29 @@ class blk(gr.sync_block):
                     rx_data = self.rx_queue.get(timeout=0.1)
                 except queue.Empty:
                     continue
+                rx_time = time.monotonic()
+                crc_errors = self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors']
                 
-                # Add to buffer
-                self.rx_buffer += rx_data
+                # A PDU is either one bare frame (delimited by the PHY header) or
+                # a chunk of full frames for the sync word scanners
+                pkt = self.framer.parse_delimited(rx_data)
+                if pkt is not None:
+                    packets = [pkt]
+                else:
+                    packets = self.framer.feed(rx_data) + self.fec_framer.feed(rx_data)
                 
-                # Try to parse packets from buffer
-                while len(self.rx_buffer) > 0:
-                    pkt = self.parse_packet(self.rx_buffer)
-                    
-                    if pkt is None:
-                        # No valid packet found, remove first byte and try again
-                        if len(self.rx_buffer) > 1:
-                            self.rx_buffer = self.rx_buffer[1:]
-                        else:
-                            self.rx_buffer = bytes()
-                        continue
-                    
-                    # Remove processed packet from buffer
-                    self.rx_buffer = self.rx_buffer[pkt['consumed']:]
+                # Contention evidence: CRC-error bursts and the stations heard
+                crc_errors = self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors'] - crc_errors
+                for _ in range(crc_errors):
+                    if self.contention.on_crc_error(rx_time):
+                        self.publish_stats(self.contention.as_dict())
+                
+                for pkt in packets:
+                    self.learn_framing(pkt)
+                    if pkt['src'] != self.node_id:
+                        self.contention.heard(pkt['src'], rx_time)
+                    if self.mac_mode == 'polled' and self.slots.master:
+                        self.poll.heard(pkt['src'], rx_time)
                     
                     # Check if packet is for this node or broadcast
                     if pkt['dst'] != self.node_id and pkt['dst'] != 0xFF:
@@ -385,7 +951,7 @@ class blk(gr.sync_block):
                         continue
                     
                     # Handle based on packet type
-                    if pkt['type'] == self.PKT_DATA:
+                    if pkt['type'] in (self.PKT_DATA, self.PKT_AGG, self.PKT_FRAG):
                         self.stats['packets_received'] += 1
                         print(f"[Node {self.node_id}] RX: Data packet from node {pkt['src']}, seq={pkt['seq']}")
                         
@@ -405,19 +971,36 @@ class blk(gr.sync_block):
                             self.PKT_ACK
                         )
                         print(f"[Node {self.node_id}] RX: Sending ACK for seq={pkt['seq']}")
+                        ack_enqueued = time.monotonic()
                         self.send_sync_burst()
                         self.transmit_packet(ack_packet)
                         self.stats['acks_sent'] += 1
+                        self.record_mac_latency('ack', ack_enqueued)
                         
                         # Forward to application if not duplicate
                         if not is_duplicate:
-                            self.forward_to_app(pkt['src'], pkt['payload'])
+                            if pkt['type'] == self.PKT_AGG:
+                                for message in unpack_messages(pkt['payload']):
+                                    self.forward_to_app(pkt['src'], message)
+                            elif pkt['type'] == self.PKT_FRAG:
+                                message = self.reassembler.add((pkt['src'], pkt['dst']), pkt['payload'])
+                                if message is not None:
+                                    self.forward_to_app(pkt['src'], message)
+                            else:
+                                self.forward_to_app(pkt['src'], pkt['payload'])
                         
                     elif pkt['type'] == self.PKT_ACK:
                         print(f"[Node {self.node_id}] RX: ACK packet from node {pkt['src']}, seq={pkt['seq']}")
                         # Process ACK
                         ack_key = f"{pkt['src']}_{pkt['seq']}"
-                        self.ack_queue.put({'key': ack_key})
+                        self.ack_queue.put({'key': ack_key, 'rx_time': time.monotonic()})
+                    
+                    elif pkt['type'] == self.PKT_BEACON:
+                        self.handle_beacon(pkt, rx_time, len(rx_data))
+                    
+                    elif pkt['type'] == self.PKT_POLL_REQ:
+                        if self.slots.master and pkt['payload']:
+                            self.poll.on_request(pkt['src'], pkt['payload'][0], rx_time)
                         
             except Exception as e:
                 print(f"[Node {self.node_id}] RX handler error: {e}")
@@ -425,35 +1008,30 @@ class blk(gr.sync_block):
     def transmit_packet(self, packet):
         """Send packet to physical layer"""
         try:
-            # Convert to PDU format
-            vec = pmt.init_u8vector(len(packet), list(packet))
-            pdu = pmt.cons(pmt.PMT_NIL, vec)
-            
             # Send to modulator
-            self.message_port_pub(pmt.intern('pdu_out'), pdu)
+            self.message_port_pub(self.port_pdu_out, bytes_to_pdu(packet))
             
         except Exception as e:
             print(f"[Node {self.node_id}] Error transmitting packet: {e}")
     
     def forward_to_app(self, src_id, data):
-        """Forward received data to application/GUI"""
+        """Forward received data to application/GUI as a message PDU"""
         try:
-            # Decode message
-            message = data.decode('utf-8', errors='ignore')
-            
-            # Create formatted output string
-            output = f"[From Node {src_id}]: {message}"
-            
-            # Send as simple string message
-            msg = pmt.intern(output)
-            self.message_port_pub(pmt.intern('msg_out'), msg)
-            
-            # Also send as dictionary for more complex processing
-            meta = pmt.make_dict()
-            meta = pmt.dict_add(meta, pmt.intern("src"), pmt.from_long(src_id))
-            meta = pmt.dict_add(meta, pmt.intern("data"), pmt.intern(message))
+            if self.string_out:
+                # Compatibility shim: interns every message, only for old flowgraphs
+                msg = pmt.intern(f"[From Node {src_id}]: {data.decode('utf-8', errors='ignore')}")
+            else:
+                self.rx_msg_counter += 1
+                msg = make_message(
+                    data,
+                    dst=self.node_id,
+                    src=src_id,
+                    msg_id=self.rx_msg_counter,
+                    timestamp=time.time()
+                )
+            self.message_port_pub(self.port_msg_out, msg)
             
-            print(f"[Node {self.node_id}] Message delivered: {output}")
+            print(f"[Node {self.node_id}] Message delivered from {src_id}: {data.decode('utf-8', errors='ignore')}")
             
         except Exception as e:
             print(f"[Node {self.node_id}] Error forwarding to app: {e}")
@@ -470,11 +1048,62 @@ class blk(gr.sync_block):
         print(f"  ACKs sent: {self.stats['acks_sent']}")
         print(f"  ACKs received: {self.stats['acks_received']}")
         print(f"  Retransmissions: {self.stats['retransmissions']}")
-        print(f"  CRC errors: {self.stats['crc_errors']}")
+        print(f"  CRC errors: {self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors']}")
+        fec = self.fec_framer.stats
+        if fec['fec_frames'] or fec['fec_failures']:
+            print(f"  FEC frames: {fec['fec_frames']} ({fec['fec_corrected_frames']} corrected, "
+                  f"{fec['fec_corrected_bytes']} bytes fixed, {fec['fec_failures']} uncorrectable)")
+        if self.burst_filter.stats['bursts_discarded']:
+            print(f"  Sync bursts dropped: {self.burst_filter.stats['bursts_discarded']} "
+                  f"({self.burst_filter.stats['burst_bytes_discarded']} bytes)")
+        if any(c['bare'] for c in self.framing_savings.sizes.values()):
+            print("  Bare framing (frames built, PHY header included in the airtime):")
+            for line in self.framing_savings.report():
+                print(f"    {line}")
+        if self.stats['messages_sent']:
+            per_kb = 1000.0 * self.stats['messages_sent'] / self.stats['bytes_sent']
+            print(f"  Messages per kB: {per_kb:.2f} (airtime efficiency)")
+        for cls, counters in self.mac_latency.items():
+            if counters['frames']:
+                avg_ms = 1000.0 * counters['sum'] / counters['frames']
+                print(f"  MAC delay ({cls}): {avg_ms:.1f} ms avg, {1000.0 * counters['max']:.1f} ms max")
+        for line in self.queue_delays.report():
+            print(f"  Priority {line}")
+        if self.tx_queue.report() is not None:
+            print(f"  TX queue: {self.tx_queue.report()}")
+        if self.mac_mode == 'csma':
+            c = self.csma.stats
+            print(f"  CSMA: {c['busy_periods']} busy periods, {c['deferrals']} frames deferred, "
+                  f"{c['collisions']} collisions, {c['forced']} forced, cw={self.csma.cw}")
+        if self.mac_mode in ('aloha', 'slotted'):
+            c = self.contention.as_dict()
+            print(f"  Contention: p={c['p']:.3f}, window={c['window']:.1f}, {c['stations']} stations, "
+                  f"{c['collisions']} collisions, {c['crc_errors']} CRC errors in bursts, loss {100.0 * c['loss']:.0f}%")
+        if self.stats['beacons_sent']:
+            print(f"  Beacons sent: {self.stats['beacons_sent']} ({1000.0 * self.slots.slot:.2f} ms slots)")
+        if self.mac_mode in ('slotted', 'polled') and not self.slots.master:
+            g = self.slots.as_dict()
+            print(f"  Slot grid: {g['beacons']} beacons ({g['outliers']} outliers, {g['resyncs']} resyncs), "
+                  f"drift {g['drift_ppm']:.1f} ppm, phase error {1000.0 * g['error_avg']:.2f} ms avg "
+                  f"{1000.0 * g['error_max']:.2f} ms max, {self.stats['unslotted_frames']} frames before sync")
+        if self.mac_mode == 'polled' and self.slots.master:
+            p = self.poll.as_dict()
+            print(f"  Polling: {p['stations']} stations on the roster, {p['requests']} requests, "
+                  f"{p['grants']} slots granted on request, {p['polls']} polls, "
+                  f"{p['idle_slots']} idle over {p['superframes']} superframes")
+        elif self.mac_mode == 'polled':
+            p = self.poll_grants.as_dict()
+            print(f"  Polling: {p['requests']} requests ({p['contended']} in minislots), "
+                  f"{p['grants']} slots granted, {p['unused']} unused")
         
         self.running = False
+        self.stop_event.set()
+        self.tx_queue.close()
+        self.poll_event.set()
         if self.tx_thread.is_alive():
             self.tx_thread.join()
         if self.rx_thread.is_alive():
             self.rx_thread.join()
+        if self.beacon_thread.is_alive():
+            self.beacon_thread.join()
         return True
@@ -1,7 +1,7 @@
 """
 Embedded Python Block for GNU Radio - Mesh Network Packet Communication
 Implements packetization, Go-Back-N ARQ, and p-persistent ALOHA medium access
-No external CRC module required - implements CRC-16 CCITT manually
+CRC-16 CCITT is provided by the shared link_crc module
 """
 
 import numpy as np
@@ -13,6 +13,24 @@ import time
 import random
 import struct
 import collections
+import heapq
+import itertools
+from link_aggregate import fits, pack_messages, unpack_messages
+from link_contention import ContentionEstimator
+from link_crc import crc16
+from link_csma import CarrierSense
+from link_fec import FEC_SYNC_WORD, FecFrameExtractor, fec_encode
+from link_fragment import Reassembler, fragment_message
+from link_poll import GRANT_SIZE, GrantQueue, PollScheduler, build_grants, request_slots
+from link_pdu import KEY_DST, bytes_to_pdu, make_message, make_queue_status, parse_message, pdu_to_bytes
+from link_preamble import SyncBurstFilter
+from link_priority import (DROP_POLICIES, PRIO_EMERGENCY, PRIO_ROUTINE, PRIORITY_NAMES, ClassDelays,
+                           PriorityTxQueue, priority_level)
+from link_framing import PHY_HEADER_SIZE, FrameExtractor, FramingSavings, marked_preamble
+from link_framing import (PKT_ACK, PKT_AGG, PKT_BEACON, PKT_DATA, PKT_FLAG_ACK, PKT_FRAG, PKT_POLL_REQ, PKT_SACK,
+                          PKT_SKIP)
+from link_rto import RttEstimator
+from link_slots import SlotClock, build_beacon, frame_airtime, parse_beacon, slot_length
 
 
 class blk(gr.sync_block):
@@ -30,16 +48,103 @@ class blk(gr.sync_block):
         window_size = 4,
         aloha_backoff_min = 0.1,
         aloha_backoff_max = 0.5,
+        arq_mode = 'gbn',
+        aggregate = False,
+        ack_every = 1,
+        ack_delay = 0.05,
+        fec_dsts = (),
+        fec_nsym = 16,
+        fec_depth = 2,
+        string_out = False,
+        phy_framing = 'auto',
+        mac_mode = 'aloha',
+        csma_slot = 0.005,
+        csma_cw_min = 4,
+        csma_cw_max = 256,
+        samp_rate = 600e3,
+        sps = 4,
+        slot_guard = 0.01,
+        beacon_interval = 0.0,
+        poll_minislots = 4,
+        aloha_adapt = True,
+        emergency_dsts = (11,),
+        priority_ttl = (0.0, 300.0, 120.0),
+        tx_queue_limit = 32,
+        tx_queue_watermarks = (24, 8),
+        drop_policy = 'priority',
     ):
         """
         Arguments:
             node_id:           Unique identifier for this node (1-255)
-            aloha_prob:        Transmission probability (p) for p-persistent ALOHA (0.0-1.0)
-            timeout:           ARQ timeout in seconds (timer for base of window)
+            aloha_prob:        Transmission probability (p) for p-persistent ALOHA (0.0-1.0);
+                               with aloha_adapt the upper bound, used while the channel is quiet
+            timeout:           Initial ARQ timeout in seconds; the RTO then adapts per destination
+                               from measured RTT (Jacobson/Karels, Karn, exponential backoff)
             max_retries:       Maximum window retransmission attempts before giving up
             window_size:       Go-Back-N window size (number of outstanding frames)
             aloha_backoff_min: Minimum backoff before (re)transmission when ALOHA defers
             aloha_backoff_max: Maximum backoff before (re)transmission when ALOHA defers
+            arq_mode:          'gbn' for Go-Back-N, 'sr' for Selective Repeat (per-frame timers,
+                               receiver reorder buffer, bitmap ACKs). Both ends must use the same mode.
+            aggregate:         If True, queued messages for the same destination are packed into
+                               one PKT_AGG frame (up to MAX_PAYLOAD) to save per-frame overhead
+            ack_every:         Delayed ACK: send one cumulative ACK per this many in-order DATA
+                               frames (1 = ACK every frame immediately)
+            ack_delay:         Delayed ACK: longest time (seconds) an ACK is held back; a pending
+                               ACK also rides on DATA sent to the same node before then
+            fec_dsts:          Destination IDs whose frames (DATA and ACK) are sent with
+                               Reed-Solomon FEC + interleaving; FEC frames are always received
+            fec_nsym:          RS parity bytes per codeword (corrects fec_nsym/2 byte errors)
+            fec_depth:         Minimum number of interleaved codewords per frame
+            string_out:        Compatibility: publish received messages on msg_out as the old
+                               "[From Node X]: body" symbols instead of message PDUs
+            phy_framing:       'auto': advertise bare-frame support in the preamble and leave out
+                               preamble + sync word towards peers that advertise it too;
+                               'on': always send bare frames (every node must support them);
+                               'off': always send full frames. Bare frames rely on the
+                               protocol_formatter_async header for delimiting and are
+                               accepted in every mode.
+            mac_mode:          'aloha' for p-persistent ALOHA, 'csma' for listen-before-talk:
+                               DATA waits for an idle channel (channel_busy port, from the
+                               RX energy gate) plus a random backoff, ACKs only for idle;
+                               'slotted' for slotted ALOHA: the ALOHA backoff, after which
+                               frames start on the next slot boundary of the base station's
+                               beacon grid (one DATA frame per slot);
+                               'polled' for reservation TDMA: DATA only goes out in
+                               slots the base station granted after a slot request
+            csma_slot:         CSMA backoff slot (seconds)
+            csma_cw_min:       CSMA contention window (slots) after an ACKed frame
+            csma_cw_max:       CSMA contention window limit; the window doubles on every
+                               retransmission timeout (binary exponential backoff)
+            samp_rate:         Sample rate after the modulator (for the frame airtime)
+            sps:               Samples per symbol of the modulator (QPSK, 2 bits per symbol)
+            slot_guard:        Slotted ALOHA: guard time (seconds) added to the airtime of a
+                               full-size frame + immediate ACK to get the slot length
+            beacon_interval:   > 0 makes this node the base station: it owns the slot grid and
+                               broadcasts a beacon about every beacon_interval seconds
+            poll_minislots:    Polled mode (base station): request minislots after each beacon
+            aloha_adapt:       Adapt the ALOHA transmit probability and backoff window to the
+                               contention seen (retransmission timeouts, CRC-error bursts,
+                               stations heard); current values go out on the stats port
+            emergency_dsts:    Destinations whose messages are emergency pages unless the message
+                               PDU brings its own 'priority' (11: Emergency Room). Emergency
+                               messages jump the queue of their destination, their destination
+                               is served first, and their frames skip the ALOHA backoff (one
+                               step on a retransmission) and go ahead of the DATA already
+                               waiting in the MAC queue
+            priority_ttl:      Seconds an emergency / urgent / routine message may wait in the
+                               TX queue before it is dropped as failed (0: never); a 'ttl' in
+                               the message PDU overrides it
+            tx_queue_limit:    Messages queued per destination (0: unbounded); one more
+                               triggers the drop policy and is reported as failed if it
+                               cannot get in
+            tx_queue_watermarks: (high, low) queued messages per destination: the destination
+                               turns congested at 'high' and clears at 'low' (on the
+                               queue_status port, for the GUI)
+            drop_policy:       What a full destination does with one more message: 'tail'
+                               refuses it, 'head' drops its oldest message, 'priority' drops
+                               its oldest least urgent one (none of them drops a message
+                               more urgent than the new one)
         """
         gr.sync_block.__init__(
             self,
@@ -56,6 +161,37 @@ class blk(gr.sync_block):
         self.window_size = int(window_size)
         self.aloha_backoff_min = float(aloha_backoff_min)
         self.aloha_backoff_max = float(aloha_backoff_max)
+        self.aggregate = bool(aggregate)
+        self.ack_every = max(1, int(ack_every))
+        self.ack_delay = float(ack_delay)
+        self.fec_dsts = set(int(d) & 0xFF for d in fec_dsts)
+        self.fec_nsym = int(fec_nsym)
+        self.fec_depth = int(fec_depth)
+        self.string_out = bool(string_out)
+        self.arq_mode = str(arq_mode).lower()
+        if self.arq_mode not in ('gbn', 'sr'):
+            print(f"[Node {node_id}] Unknown arq_mode '{arq_mode}', using 'gbn'")
+            self.arq_mode = 'gbn'
+        if self.arq_mode == 'sr' and self.window_size > 128:
+            # Sender and receiver windows must not overlap in the 8-bit sequence space
+            print(f"[Node {node_id}] SR window limited to 128 (was {self.window_size})")
+            self.window_size = 128
+        self.mac_mode = str(mac_mode).lower()
+        if self.mac_mode not in ('aloha', 'csma', 'slotted', 'polled'):
+            print(f"[Node {node_id}] Unknown mac_mode '{mac_mode}', using 'aloha'")
+            self.mac_mode = 'aloha'
+        if drop_policy not in DROP_POLICIES:
+            print(f"[Node {node_id}] Unknown drop_policy '{drop_policy}', using 'priority'")
+            drop_policy = 'priority'
+        self.csma = CarrierSense(slot=csma_slot, cw_min=csma_cw_min, cw_max=csma_cw_max)
+        self.contention = ContentionEstimator(
+            p_max=self.aloha_prob,
+            step=(self.aloha_backoff_min + self.aloha_backoff_max) / 2.0,
+            adaptive=aloha_adapt
+        )
+        # CSMA: DATA may not air before this time (idle channel + backoff)
+        self.csma_ready_at = 0.0
+        self.csma_idle_at = 0.0  # channel idle since (emergency DATA: one slot later)
 
         # Packet parameters
         # Preamble: long, random-ish pattern for sync
@@ -65,34 +201,179 @@ class blk(gr.sync_block):
         self.MAX_PAYLOAD = 255
         self.CRC_SIZE = 2
 
-        # Packet types
-        self.PKT_DATA = 0x01
-        self.PKT_ACK = 0x02
-
-        # CRC-16 CCITT lookup table
-        self.crc_table = self.generate_crc_table()
+        # PHY-delimited (bare) frames: [src][dst][seq][type][len][payload][CRC16] per PDU
+        self.phy_framing = str(phy_framing).lower()
+        if self.phy_framing not in ('off', 'auto', 'on'):
+            print(f"[Node {node_id}] Unknown phy_framing '{phy_framing}', using 'auto'")
+            self.phy_framing = 'auto'
+        self.bare_peers = set()  # peers that advertised bare-frame support ('auto')
+        self.framing_savings = FramingSavings(len(self.PREAMBLE) + len(self.SYNC_WORD))
+        if self.phy_framing != 'off':
+            self.PREAMBLE = marked_preamble(self.PREAMBLE)
+
+        # Slotted ALOHA: one slot holds a full-size frame and the ACK
+        # sent right back (delayed ACKs, ack_every > 1, are not slotted);
+        # polled mode also fits a slot request ahead of the DATA
+        self.samp_rate = float(samp_rate)
+        self.sps = int(sps)
+        framing = len(self.PREAMBLE) + len(self.SYNC_WORD) + 5 + self.CRC_SIZE
+        pdus = [framing + self.MAX_PAYLOAD, framing]
+        self.exchange_pdus = [framing]  # ACK after a DATA frame, for the contention estimate
+        if self.mac_mode == 'polled':
+            pdus.append(framing + 1)
+        self.slots = SlotClock(slot_length(pdus, self.samp_rate, self.sps, guard=slot_guard))
+        self.beacon_interval = float(beacon_interval)
+        self.beacon_index = 0     # base station: slot of the next beacon
+
+        # Polled mode: request minislots after every beacon, then the slots the
+        # base station granted. Frames without a grant wait in poll_backlog
+        # (one list of frames per slot)
+        self.poll = PollScheduler(self.node_id, minislots=poll_minislots)
+        self.poll_minislot = slot_length([framing + 1], self.samp_rate, self.sps, guard=slot_guard)
+        self.poll_grants = GrantQueue()
+        self.poll_backlog = collections.deque()
+        self.poll_base = None     # base station id (source of the beacons)
+
+        if self.beacon_interval > 0:
+            beacon_slots = int(round(self.beacon_interval / self.slots.slot))
+            if self.mac_mode == 'polled':
+                # Beacon + request minislots + at least one granted slot
+                beacon_slots = max(beacon_slots, 2 + request_slots(
+                    self.poll.minislots, self.poll_minislot, self.slots.slot))
+            self.slots.start_master(time.monotonic(), max(2, beacon_slots))
+
+        # Packet types (shared table in link_framing)
+        self.PKT_DATA = PKT_DATA
+        self.PKT_ACK = PKT_ACK
+        self.PKT_SACK = PKT_SACK
+        self.PKT_SKIP = PKT_SKIP
+        self.PKT_AGG = PKT_AGG
+        self.PKT_FRAG = PKT_FRAG
+        self.PKT_BEACON = PKT_BEACON
+        self.PKT_POLL_REQ = PKT_POLL_REQ
+        self.PKT_FLAG_ACK = PKT_FLAG_ACK
+
+        # Reassembly of fragmented messages
+        self.REASSEMBLY_TIMEOUT = 30.0
+        self.REASSEMBLY_MAX_BYTES = 64 * 1024
+        self.REASSEMBLY_MAX_MESSAGES = 16
 
         # Queues
-        self.tx_queue = queue.Queue()   # app -> link layer (messages to send)
+        # Priority classes (link_priority): per-destination queues, stale messages
+        # expire, at most tx_queue_limit messages per destination
+        self.emergency_dsts = set(int(d) & 0xFF for d in emergency_dsts)
+        self.priority_ttl = tuple(float(t) for t in priority_ttl)
+        self.tx_queue_limit = int(tx_queue_limit)
+        self.tx_queue_watermarks = tuple(int(w) for w in tx_queue_watermarks)
+        self.drop_policy = drop_policy
+        self.queue_delays = ClassDelays()
         self.rx_queue = queue.Queue()   # PHY -> link layer (raw received bytes)
         self.ack_queue = queue.Queue()  # RX thread -> TX thread (parsed ACKs)
 
-        # TX state (Go-Back-N)
-        self.seq_num_tx = 0  # next sequence number to use (mod 256)
+        # TX state (Go-Back-N), kept independently per destination so a slow or
+        # unreachable station cannot block traffic to the others (created by the
+        # msg_in handler, the TX thread only looks entries up):
+        # tx_links[dst] = {
+        #   'dst': int,
+        #   'queue': PriorityTxQueue of messages waiting for window space,
+        #   'seq_num_tx': next sequence number to use for dst (mod 256),
+        #   'window': OrderedDict (see below),
+        #   'timer_start': float or None (GBN timer for the window base),
+        #   'rto': float (timeout the running GBN timer was armed with),
+        #   'retries': int (GBN window retransmissions),
+        #   'next_msg_id': int (msg-id of the next fragmented message, mod 256)
+        #   'skipped': list of given-up seqs the receiver has not yet moved past
+        # }
         # window: OrderedDict[seq] = {
         #   'packet': bytes,
-        #   'feedback_sent': bool
+        #   'dst': int,
+        #   'sent_at': float,     (scheduled air time of the latest (re)transmission)
+        #   'retransmitted': bool (Karn: no RTT sample from retransmitted frames)
+        #   'feedback_sent': bool,
+        #   'msg_count': int,     (app messages carried, >1 for aggregated frames)
+        #   'priority': int,      (link_priority class of the (first) message)
+        #   'group': dict or None (fragments of one message share
+        #                          {'fragments', 'acked', 'feedback_sent'})
+        #   'acked': bool,        (SR only: buffered by the receiver (SACK bitmap), not yet delivered)
+        #   'delivered': bool,    (SR only: covered by the cumulative ACK, i.e. delivered)
+        #   'abandoned': bool,    (SR only: given up after max_retries, announced by PKT_SKIP)
+        #   'retries': int,       (SR only: per-frame retransmissions)
+        #   'deadline': float     (SR only: per-frame retransmission deadline)
         # }
-        self.tx_window = collections.OrderedDict()
-        self.window_timer_start = None
-        self.window_retries = 0
+        self.tx_links = {}
+
+        # Adaptive RTO: rtt_estimators[dst] = RttEstimator
+        self.rtt_estimators = {}
+
+        # TX scheduler: the TX thread sleeps on tx_cond until a new app message,
+        # an ACK, or the earliest deadline in timer_heap.
+        # timer_heap entries: (deadline, tie_breaker, key); timer_deadlines[key]
+        # holds the live deadline so cancelled/rearmed entries are skipped lazily.
+        self.tx_cond = threading.Condition()
+        self.tx_wakeup = False
+        self.timer_heap = []
+        self.timer_deadlines = {}
+        self.timer_counter = itertools.count()
+
+        # MAC stage: frames wait for their ALOHA slot in mac_heap instead of
+        # sleeping in the TX thread. Entries: (air_time, priority, tie_breaker, frame)
+        # ACKs use MAC_PRIO_ACK and skip the DATA backoff; DATA frames keep their
+        # relative order via mac_data_ready_at (emergency DATA goes ahead).
+        self.MAC_PRIO_ACK = 0
+        self.MAC_PRIO_DATA = 1
+        self.mac_heap = []
+        self.mac_lock = threading.Lock()
+        self.mac_data_ready_at = 0.0
+        # enqueue->air latency per frame class: {'frames', 'sum', 'max'}
+        # (beacons: slot start -> air, i.e. how late the beacon went out)
+        self.mac_latency = {
+            'ack': {'frames': 0, 'sum': 0.0, 'max': 0.0},
+            'data': {'frames': 0, 'sum': 0.0, 'max': 0.0},
+            'beacon': {'frames': 0, 'sum': 0.0, 'max': 0.0},
+            'request': {'frames': 0, 'sum': 0.0, 'max': 0.0},
+        }
 
         # RX state (per-source expected sequence for GBN)
         # expected_seq_rx[src_id] = next expected seq from that source
         self.expected_seq_rx = {}
+        # SR reorder buffer: rx_reorder[src_id] = {seq: pkt} for frames
+        # received ahead of expected_seq_rx[src_id]; pkt is None for a seq
+        # the sender gave up on (PKT_SKIP)
+        self.rx_reorder = {}
+        self.rx_msg_counter = itertools.count(1)  # local msg_id of delivered messages
+        # Delayed ACKs: rx_acks[src_id] = {'type', 'seq', 'payload', 'count', 'deadline'}
+        # written by the RX thread, sent (or piggybacked) by the TX thread
+        self.rx_acks = {}
+        self.rx_ack_lock = threading.Lock()
+        # Fragment reassembly buffers per (src, dst, msg-id)
+        self.reassembler = Reassembler(
+            timeout=self.REASSEMBLY_TIMEOUT,
+            max_bytes=self.REASSEMBLY_MAX_BYTES,
+            max_messages=self.REASSEMBLY_MAX_MESSAGES
+        )
 
-        # RX byte buffer for packet extraction
-        self.rx_buffer = bytes()
+        # RX frame extractor (preallocated byte buffer + sync word scan)
+        valid_types = {
+            self.PKT_DATA, self.PKT_ACK, self.PKT_SACK, self.PKT_AGG, self.PKT_FRAG,
+            self.PKT_BEACON, self.PKT_POLL_REQ, self.PKT_SKIP,
+            self.PKT_DATA | self.PKT_FLAG_ACK,
+            self.PKT_AGG | self.PKT_FLAG_ACK,
+            self.PKT_FRAG | self.PKT_FLAG_ACK,
+        }
+        self.framer = FrameExtractor(
+            self.SYNC_WORD,
+            self.calculate_crc16,
+            max_payload=self.MAX_PAYLOAD,
+            valid_types=valid_types
+        )
+        # FEC frames use their own sync word and are decoded before the CRC check
+        self.fec_framer = FecFrameExtractor(
+            self.calculate_crc16,
+            max_payload=self.MAX_PAYLOAD,
+            valid_types=valid_types
+        )
+        # Sync bursts from any node are recognized and dropped before framing
+        self.burst_filter = SyncBurstFilter()
 
         # Statistics
         self.stats = {
@@ -101,8 +382,17 @@ class blk(gr.sync_block):
             'acks_sent': 0,
             'acks_received': 0,
             'retransmissions': 0,
-            'crc_errors': 0,
+            'skips_sent': 0,
             'window_timeouts': 0,
+            'acks_coalesced': 0,
+            'acks_piggybacked': 0,
+            'ack_bytes_saved': 0,
+            'bytes_sent': 0,
+            'messages_sent': 0,
+            'ack_latency_sum': 0.0,
+            'ack_latency_max': 0.0,
+            'beacons_sent': 0,
+            'unslotted_frames': 0,  # slotted/polled mode, sent as pure ALOHA (no beacon yet)
         }
 
         # Threading
@@ -115,110 +405,96 @@ class blk(gr.sync_block):
         # Message ports
         self.port_msg_in = pmt.intern('msg_in')
         self.port_pdu_in = pmt.intern('pdu_in')
+        self.port_channel_busy = pmt.intern('channel_busy')
         self.port_msg_out = pmt.intern('msg_out')
         self.port_pdu_out = pmt.intern('pdu_out')
         self.port_feedback = pmt.intern('feedback')
+        self.port_stats = pmt.intern('stats')
+        self.port_queue_status = pmt.intern('queue_status')
+        self.feedback_true = pmt.intern('TRUE')
+        self.feedback_false = pmt.intern('FALSE')
+        self.stats_keys = {}
 
         self.message_port_register_in(self.port_msg_in)
         self.message_port_register_in(self.port_pdu_in)
+        self.message_port_register_in(self.port_channel_busy)
         self.message_port_register_out(self.port_msg_out)
         self.message_port_register_out(self.port_pdu_out)
         self.message_port_register_out(self.port_feedback)
+        self.message_port_register_out(self.port_stats)
+        self.message_port_register_out(self.port_queue_status)
 
         # Set message handlers
         self.set_msg_handler(self.port_msg_in, self.handle_msg_in)
         self.set_msg_handler(self.port_pdu_in, self.handle_pdu_in)
+        self.set_msg_handler(self.port_channel_busy, self.handle_channel_busy)
+
+        # Base station: the first beacon goes into the MAC queue right away
+        if self.beacon_interval > 0:
+            self.set_timer(('beacon',), time.monotonic())
+            print(f"[Node {self.node_id}] Base station: {1000.0 * self.slots.slot:.2f} ms slots, "
+                  f"beacon every {self.slots.beacon_slots} slots")
 
         # Start threads
         self.tx_thread.start()
         self.rx_thread.start()
 
-        print(f"[Node {self.node_id}] Initialized (GBN+ALOHA) - Ready for communication")
+        print(f"[Node {self.node_id}] Initialized ({self.arq_mode.upper()}+{self.mac_mode.upper()}) - Ready for communication")
 
     # -------------------------------------------------------------------------
     # CRC helpers
     # -------------------------------------------------------------------------
-    def generate_crc_table(self):
-        """Generate CRC-16 CCITT lookup table"""
-        poly = 0x1021
-        table = []
-        for i in range(256):
-            crc = i << 8
-            for _ in range(8):
-                if crc & 0x8000:
-                    crc = ((crc << 1) ^ poly) & 0xFFFF
-                else:
-                    crc = (crc << 1) & 0xFFFF
-            table.append(crc)
-        return table
-
     def calculate_crc16(self, data):
         """Calculate CRC-16 CCITT for given data"""
-        crc = 0xFFFF
-        for byte in data:
-            tbl_idx = ((crc >> 8) ^ byte) & 0xFF
-            crc = ((crc << 8) ^ self.crc_table[tbl_idx]) & 0xFFFF
-        return crc
+        return crc16(data)
 
     # -------------------------------------------------------------------------
     # Upper-layer message handling
     # -------------------------------------------------------------------------
     def handle_msg_in(self, msg):
-        """Handle incoming messages from GUI/application"""
+        """Handle outgoing messages from GUI/application (message PDUs, or legacy "dst:body" strings)"""
         try:
-            # Handle string messages directly: "dst_id:message"
-            if pmt.is_symbol(msg):
-                text = pmt.symbol_to_string(msg)
-                if ':' in text:
-                    dst_str, payload_str = text.split(':', 1)
-                    try:
-                        dst_id = int(dst_str)
-                        data = payload_str.encode()
-                        self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                        print(f"[Node {self.node_id}] Queued message to {dst_id}: {payload_str}")
-                    except ValueError:
-                        print(f"[Node {self.node_id}] Invalid destination ID in text message")
-
-            # Handle dictionary messages (Python dict via pmt.to_python)
-            elif pmt.is_dict(msg):
-                meta = pmt.to_python(msg)
-                if 'dst' in meta and 'data' in meta:
-                    dst_id = meta['dst']
-                    data = meta['data'].encode() if isinstance(meta['data'], str) else meta['data']
-                    self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                    print(f"[Node {self.node_id}] Queued dict message to {dst_id}")
-
-            # Handle PDU-style pair: (meta, vec)
-            elif pmt.is_pair(msg):
-                meta = pmt.to_python(pmt.car(msg))
-                data = pmt.to_python(pmt.cdr(msg))
-                if isinstance(meta, dict) and 'dst' in meta:
-                    dst_id = meta['dst']
-                    if isinstance(data, str):
-                        data = data.encode()
-                    elif isinstance(data, list):
-                        data = bytes(data)
-                    self.tx_queue.put({'dst': dst_id, 'data': data, 'type': self.PKT_DATA})
-                    print(f"[Node {self.node_id}] Queued PDU message to {dst_id}")
+            message = parse_message(msg)
+            if message is None or message['dst'] is None:
+                print(f"[Node {self.node_id}] Ignoring malformed message on msg_in")
+                return
+            dst = message['dst'] & 0xFF
+            default = PRIO_EMERGENCY if dst in self.emergency_dsts else PRIO_ROUTINE
+            priority = priority_level(message['priority'], default)
+            queued = self.enqueue_tx({
+                'dst': dst,
+                'data': message['body'],
+                'type': self.PKT_DATA,
+                'msg_id': message['msg_id'],
+                'priority': priority,
+                'ttl': message['ttl'],
+                'enqueued': time.monotonic(),
+            })
+            if not queued:
+                print(f"[Node {self.node_id}] TX queue for dst={dst} is full, refusing "
+                      f"{PRIORITY_NAMES[priority]} message")
+                self.send_feedback(False)
+                return
+            print(f"[Node {self.node_id}] Queued {PRIORITY_NAMES[priority]} message to {message['dst']} "
+                  f"({len(message['body'])} bytes)")
 
         except Exception as e:
             print(f"[Node {self.node_id}] Error handling msg_in: {e}")
 
+    def enqueue_tx(self, msg):
+        """Queue a message for its destination and wake the TX thread. False if the queue refused it."""
+        if not self.tx_link(msg['dst'])['queue'].put(msg):
+            return False
+        self.wake_tx()
+        return True
+
     def handle_pdu_in(self, pdu):
         """Handle incoming PDUs from demodulator/PHY"""
         try:
-            if not pmt.is_pair(pdu):
-                return
-
-            meta = pmt.car(pdu)
-            data = pmt.cdr(pdu)
-
-            if pmt.is_u8vector(data):
-                rx_bytes = bytes(pmt.u8vector_elements(data))
-                self.rx_queue.put(rx_bytes)
-            elif pmt.is_uniform_vector(data):
-                elements = pmt.to_python(data)
-                rx_bytes = bytes([int(x) & 0xFF for x in elements])
+            rx_bytes = pdu_to_bytes(pdu)
+            if rx_bytes is not None:
+                rx_bytes = self.burst_filter.strip(rx_bytes)
+            if rx_bytes:
                 self.rx_queue.put(rx_bytes)
 
         except Exception as e:
@@ -251,131 +527,484 @@ class blk(gr.sync_block):
         crc_val = self.calculate_crc16(crc_data)
         packet.extend(struct.pack('>H', crc_val))
 
-        return bytes(packet)
-
-    def parse_packet(self, data):
-        """Parse received packet and validate CRC. Returns dict or None."""
-        try:
-            # Find sync word
-            sync_idx = data.find(self.SYNC_WORD)
-            if sync_idx == -1:
-                return None
-
-            start_idx = sync_idx + len(self.SYNC_WORD)
+        # FEC: protect header + payload + CRC with Reed-Solomon for this destination
+        if (dst_id & 0xFF) in self.fec_dsts:
+            coded = fec_encode(bytes(crc_data) + struct.pack('>H', crc_val), self.fec_nsym, self.fec_depth)
+            return self.PREAMBLE + FEC_SYNC_WORD + coded
 
-            # Minimum: src(1) + dst(1) + seq(1) + type(1) + len(1) + CRC(2)
-            if len(data) < start_idx + 5 + self.CRC_SIZE:
-                return None
-
-            src_id = data[start_idx]
-            dst_id = data[start_idx + 1]
-            seq_num = data[start_idx + 2]
-            pkt_type = data[start_idx + 3]
-            payload_len = data[start_idx + 4]
-
-            total_len = start_idx + 5 + payload_len + self.CRC_SIZE
-            if len(data) < total_len:
-                return None
+        bare = self.use_bare_framing(dst_id & 0xFF)
+        self.framing_savings.record(len(packet), bare)
+        if bare:
+            return bytes(packet[len(self.PREAMBLE) + len(self.SYNC_WORD):])
+        return bytes(packet)
 
-            payload = data[start_idx + 5:start_idx + 5 + payload_len]
-            rx_crc = struct.unpack('>H', data[total_len - self.CRC_SIZE:total_len])[0]
+    # -------------------------------------------------------------------------
+    # PHY-delimited framing negotiation
+    # -------------------------------------------------------------------------
+    def use_bare_framing(self, dst):
+        """True if frames to dst are sent without preamble + sync word."""
+        if self.phy_framing == 'on':
+            return True
+        return self.phy_framing == 'auto' and dst in self.bare_peers
+
+    def learn_framing(self, pkt):
+        """RX: a bare frame or a marked preamble means the sender accepts bare frames."""
+        if self.phy_framing == 'auto' and pkt.get('marked') and pkt['src'] not in self.bare_peers:
+            self.bare_peers.add(pkt['src'])
+            print(f"[Node {self.node_id}] Node {pkt['src']} accepts PHY-delimited frames, dropping preamble+sync")
+
+    def framing_fallback(self, dst):
+        """Delivery to dst failed: go back to full frames until it advertises again."""
+        if dst in self.bare_peers:
+            self.bare_peers.discard(dst)
+            print(f"[Node {self.node_id}] Falling back to full framing towards node {dst}")
+
+    def set_fec(self, dst, enabled):
+        """Enable or disable FEC for frames sent to one destination."""
+        if enabled:
+            self.fec_dsts.add(int(dst) & 0xFF)
+        else:
+            self.fec_dsts.discard(int(dst) & 0xFF)
 
-            crc_data = data[start_idx:total_len - self.CRC_SIZE]
-            calc_crc = self.calculate_crc16(crc_data)
+    # -------------------------------------------------------------------------
+    # Medium access (ALOHA) + physical transmit
+    # -------------------------------------------------------------------------
+    def send_with_aloha(self, packet, is_ack=False, priority=PRIO_ROUTINE, retry=False,
+                        queued=None):
+        """
+        Apply simple p-persistent ALOHA without blocking the caller:
+        - With probability p, the frame is due immediately.
+        - With probability (1-p), it is due after a random backoff.
+        p (at most aloha_prob) and the backoff window follow the contention
+        estimate (link_contention).
+        ACK frames bypass the backoff and go out ahead of queued DATA.
+        Emergency DATA ('priority') skips the backoff (one step on a 'retry')
+        and goes ahead of the DATA already queued. 'queued': when its message
+        was queued, for the queueing delay per class (first transmission only).
+        In CSMA mode DATA is due immediately; service_mac_queue() holds it
+        back while the channel is busy or the CSMA backoff is running.
+        In slotted mode DATA starts on a slot boundary, one frame per slot
+        (ACKs still go out at once, in the rest of the slot they answer).
+        In polled mode DATA goes into a granted slot, or waits in poll_backlog
+        for the next grant (no backoff: only slot requests contend).
+        'packet' can be a full framed packet or raw bytes (e.g., sync burst).
+        Returns the (monotonic) time at which the frame is scheduled to air
+        (for frames waiting for a grant: an estimate).
+        """
+        try:
+            now = time.monotonic()
+            synced = self.mac_mode in ('slotted', 'polled') and self.slots.synced(now)
+            slotted = synced and self.mac_mode == 'slotted'
+            polled = synced and self.mac_mode == 'polled'
+            urgent = priority == PRIO_EMERGENCY and not is_ack
+            if is_ack:
+                air_time = now
+                prio = self.MAC_PRIO_ACK
+            else:
+                backoff = 0.0
+                if self.mac_mode in ('slotted', 'polled') and not synced:
+                    self.stats['unslotted_frames'] += 1
+                self.contention.set_airtime(slot_length([len(packet)] + self.exchange_pdus,
+                                                        self.samp_rate, self.sps, guard=0.0))
+                if self.mac_mode != 'csma' and not polled:
+                    if urgent:
+                        # Emergency: no backoff on the first transmission, one step on a retry
+                        if retry:
+                            backoff = self.contention.step(self.aloha_backoff_min, self.aloha_backoff_max, now)
+                    elif not self.contention.transmit_now(now):
+                        backoff = self.contention.step(self.aloha_backoff_min, self.aloha_backoff_max, now)
+                        print(f"[Node {self.node_id}] ALOHA backoff {backoff:.2f}s")
+                prio = self.MAC_PRIO_DATA
+
+            with self.mac_lock:
+                frame = {'packet': packet, 'class': 'ack' if is_ack else 'data', 'enqueued': now,
+                         'priority': priority, 'queued': queued, 'emergency': urgent}
+                if not is_ack and polled:
+                    air_time = self.poll_hold(frame, now)
+                    frame = None
+                elif not is_ack and slotted:
+                    if urgent:
+                        # Emergency: the next slot, the DATA queued from there on moves back
+                        air_time = self.slots.next_slot(now + backoff)
+                        self.yield_slot(air_time)
+                    else:
+                        # Backoff counted from the end of the previous DATA frame's slot
+                        air_time = self.slots.next_slot(max(now, self.mac_data_ready_at) + backoff)
+                        self.mac_data_ready_at = air_time + self.slots.period
+                elif not is_ack:
+                    # Backoff is counted from when the previous DATA frame airs
+                    # (emergency: from now, ahead of the DATA already queued)
+                    air_time = (now if urgent else max(now, self.mac_data_ready_at)) + backoff
+                    self.mac_data_ready_at = max(self.mac_data_ready_at, air_time)
+                if frame is not None:
+                    heapq.heappush(self.mac_heap, (air_time, prio, next(self.timer_counter), frame))
+
+            self.wake_tx()
+            return air_time
 
-            if rx_crc != calc_crc:
-                self.stats['crc_errors'] += 1
-                print(f"[Node {self.node_id}] CRC mismatch (expected: {calc_crc:04X}, got: {rx_crc:04X})")
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error in send_with_aloha: {e}")
+            return time.monotonic()
+
+    def service_mac_queue(self):
+        """Transmit every queued frame whose ALOHA slot has arrived."""
+        while True:
+            with self.mac_lock:
+                now = time.monotonic()
+                if not self.mac_heap or self.mac_heap[0][0] > now:
+                    return
+                if self.mac_mode == 'csma' and not self.csma_clear(self.mac_heap[0][3], now):
+                    return
+                _, _, _, frame = heapq.heappop(self.mac_heap)
+
+            self.transmit_packet(frame['packet'])
+            if frame.get('queued') is not None:
+                self.queue_delays.record(frame['priority'], time.monotonic() - frame['queued'])
+
+            latency = time.monotonic() - frame['enqueued']
+            counters = self.mac_latency[frame['class']]
+            counters['frames'] += 1
+            counters['sum'] += latency
+            counters['max'] = max(counters['max'], latency)
+
+    def next_mac_delay(self):
+        """Seconds until the next queued frame is due, or None if the MAC queue is empty."""
+        with self.mac_lock:
+            if not self.mac_heap:
                 return None
+            now = time.monotonic()
+            due = self.mac_heap[0][0]
+            if self.mac_mode == 'csma':
+                if self.csma.blocked(now):
+                    # handle_channel_busy() wakes the TX thread when the channel clears
+                    return self.csma.unblock_delay(now)
+                if self.mac_heap[0][3].get('emergency'):
+                    due = max(due, self.csma_idle_at + self.csma.slot)
+                elif self.mac_heap[0][3]['class'] == 'data':
+                    due = max(due, self.csma_ready_at)
+            return max(0.0, due - now)
+
+    def yield_slot(self, air_time):
+        """
+        Slotted: move the DATA queued for the slot at 'air_time' or later back
+        by one slot, for an emergency frame (call with mac_lock held). Their
+        window timers keep running: one slot is far below the RTO.
+        """
+        moved = False
+        for k, (due, prio, counter, frame) in enumerate(self.mac_heap):
+            if frame['class'] == 'data' and not frame['emergency'] and due >= air_time - 1e-9:
+                self.mac_heap[k] = (due + self.slots.period, prio, counter, frame)
+                moved = True
+        if moved:
+            heapq.heapify(self.mac_heap)
+        if self.mac_data_ready_at > air_time:
+            self.mac_data_ready_at += self.slots.period
+        else:
+            self.mac_data_ready_at = air_time + self.slots.period
 
-            return {
-                'src': src_id,
-                'dst': dst_id,
-                'seq': seq_num,
-                'type': pkt_type,
-                'payload': payload,
-                'consumed': total_len
-            }
-
+    # -------------------------------------------------------------------------
+    # Carrier sense (CSMA mode)
+    # -------------------------------------------------------------------------
+    def handle_channel_busy(self, msg):
+        """Channel state from the RX energy gate (True = busy)."""
+        try:
+            if pmt.is_pair(msg):
+                msg = pmt.cdr(msg)  # ('busy' . #t) style messages
+            if not self.csma.set_busy(pmt.to_python(msg)):
+                return
+            if not self.csma.busy:
+                # Channel idle again: every waiting DATA frame draws a new backoff
+                with self.mac_lock:
+                    self.csma_idle_at = time.monotonic()
+                    self.csma_ready_at = self.csma_idle_at + self.csma.backoff()
+                self.wake_tx()
         except Exception as e:
-            print(f"[Node {self.node_id}] Error parsing packet: {e}")
-            return None
+            print(f"[Node {self.node_id}] Error handling channel_busy: {e}")
+
+    def csma_clear(self, frame, now):
+        """CSMA: True if 'frame' may go on the air now (call with mac_lock held)."""
+        if self.csma.blocked(now):
+            if not frame.get('deferred'):
+                frame['deferred'] = True
+                self.csma.stats['deferrals'] += 1
+            return False
+        if self.csma.busy:
+            # Busy for longer than max_defer: the detector is assumed stuck
+            self.csma.stats['forced'] += 1
+            self.csma.set_busy(False)
+            self.csma_idle_at = now
+            self.csma_ready_at = now + self.csma.backoff()
+        if frame.get('emergency'):
+            # Emergency DATA: one slot after the channel went idle, so ACKs still go first
+            return now >= self.csma_idle_at + self.csma.slot
+        return frame['class'] == 'ack' or now >= self.csma_ready_at
 
     # -------------------------------------------------------------------------
-    # Medium access (ALOHA) + physical transmit
+    # Slot beacons (slotted ALOHA)
+    # -------------------------------------------------------------------------
+    def schedule_beacon(self):
+        """Base station: queue the next beacon one slot before its slot starts."""
+        deadline = self.timer_deadlines.get(('beacon',))
+        now = time.monotonic()
+        if deadline is None or now < deadline:
+            return
+        beacon_slots = self.slots.beacon_slots
+        if self.slots.slot_start(self.beacon_index) < now:
+            # TX thread fell behind: go on with the next beacon slot still ahead
+            index = self.slots.slot_index(now)
+            self.beacon_index = -(-index // beacon_slots) * beacon_slots
+        start = self.slots.slot_start(self.beacon_index)
+
+        payload = build_beacon(self.beacon_index, self.slots.slot, beacon_slots)
+        if self.mac_mode == 'polled':
+            # Grants for the slots after the request minislots (own DATA included)
+            n_request = request_slots(self.poll.minislots, self.poll_minislot, self.slots.slot)
+            with self.mac_lock:
+                own = len(self.poll_backlog)
+            self.poll.set_demand(self.node_id, own, now)
+            room = self.MAX_PAYLOAD - len(payload) - GRANT_SIZE
+            grants = self.poll.assign(min(beacon_slots - 1 - n_request, room), now)
+            payload += build_grants(self.poll.minislots, self.poll_minislot, grants, self.poll.poll_cycle)
+        packet = self.create_packet(0xFF, self.beacon_index & 0xFF, self.PKT_BEACON, payload)
+        with self.mac_lock:
+            # 'enqueued' = slot start, so the MAC delay counts how late it aired
+            frame = {'packet': packet, 'class': 'beacon', 'enqueued': start}
+            heapq.heappush(self.mac_heap, (start, self.MAC_PRIO_ACK, next(self.timer_counter), frame))
+        self.stats['beacons_sent'] += 1
+        if self.mac_mode == 'polled':
+            self.poll_apply_grants(self.beacon_index, payload)
+
+        self.beacon_index += beacon_slots
+        self.set_timer(('beacon',), self.slots.slot_start(self.beacon_index) - self.slots.period)
+
+    def handle_beacon(self, pkt, rx_time, rx_len):
+        """RX: align the local slot grid to a base station beacon ('rx_len': bytes of its PDU)."""
+        beacon = parse_beacon(pkt['payload'])
+        if beacon is None or self.slots.master:
+            return
+        slot_index, slot, beacon_slots = beacon
+        was_synced = self.slots.synced(rx_time)
+        # The PDU is complete once its last byte is in: back to the start of its slot
+        start = rx_time - frame_airtime(rx_len + PHY_HEADER_SIZE, self.samp_rate, self.sps)
+        self.slots.on_beacon(slot_index, slot, beacon_slots, start)
+        if not was_synced:
+            print(f"[Node {self.node_id}] Slot grid from node {pkt['src']}: "
+                  f"{1000.0 * slot:.2f} ms slots, beacon every {beacon_slots} slots")
+        if self.mac_mode == 'polled':
+            self.poll_base = pkt['src']
+            self.poll_apply_grants(slot_index, pkt['payload'])
+
     # -------------------------------------------------------------------------
-    def send_with_aloha(self, packet):
+    # Slot grants (polled mode)
+    # -------------------------------------------------------------------------
+    def poll_hold(self, frame, now):
         """
-        Apply simple p-persistent ALOHA:
-        - With probability p = aloha_prob, transmit immediately.
-        - With probability (1-p), wait a random backoff then transmit.
+        Polled: put a DATA frame into the next granted slot, or into the
+        backlog until one is granted (call with mac_lock held). Returns the
+        slot start, or an estimate for a frame in the backlog.
         """
-        try:
-            if random.random() > self.aloha_prob:
-                backoff = random.uniform(self.aloha_backoff_min, self.aloha_backoff_max)
-                print(f"[Node {self.node_id}] ALOHA backoff {backoff:.2f}s")
-                time.sleep(backoff)
+        index = self.poll_grants.take(self.slots, now) if not self.poll_backlog else None
+        if index is not None:
+            air_time = self.slots.slot_start(index)
+            heapq.heappush(self.mac_heap, (air_time, self.MAC_PRIO_DATA, next(self.timer_counter), frame))
+            return air_time
+
+        group = [frame]
+        position = len(self.poll_backlog)
+        if frame['emergency']:
+            # Emergency: ahead of the routine DATA waiting for a grant
+            position = next((k for k, g in enumerate(self.poll_backlog) if not g[0]['emergency']), position)
+        self.poll_backlog.insert(position, group)
+        return self.poll_eta(now, position + 1)
+
+    def poll_eta(self, now, position):
+        """
+        Expected start of the 'position'-th backlogged slot: requested in the
+        next superframe, granted in the one after
+        """
+        beacon_slots = max(self.slots.beacon_slots, 1)
+        next_beacon = -(-self.slots.slot_index(now) // beacon_slots) * beacon_slots
+        first = next_beacon + beacon_slots + 1 + self.poll_grants.request_slots
+        return self.slots.slot_start(first + position - 1)
 
-            self.transmit_packet(packet)
+    def poll_holding(self):
+        """True while DATA waits for a granted slot (not on the air yet)"""
+        with self.mac_lock:
+            return bool(self.poll_backlog)
 
-        except Exception as e:
-            print(f"[Node {self.node_id}] Error in send_with_aloha: {e}")
+    def poll_apply_grants(self, slot_index, payload):
+        """
+        Beacon received (or, at the base station, built): move backlogged DATA
+        into this node's granted slots. If frames are still waiting, queue a
+        slot request: ahead of the DATA in the first granted slot, else in a
+        random request minislot.
+        """
+        now = time.monotonic()
+        with self.mac_lock:
+            info = self.poll_grants.on_beacon(self.node_id, slot_index, self.slots.slot, payload)
+            if info is None:
+                return
+            minislots, minislot, new_grants = info
+
+            first_slot = None
+            while self.poll_backlog:
+                index = self.poll_grants.take(self.slots, now)
+                if index is None:
+                    break
+                air_time = self.slots.slot_start(index)
+                if first_slot is None:
+                    first_slot = air_time
+                group = self.poll_backlog.popleft()
+                for frame in group:
+                    heapq.heappush(self.mac_heap, (air_time, self.MAC_PRIO_DATA, next(self.timer_counter), frame))
+
+            waiting = len(self.poll_backlog)
+            if self.slots.master or self.poll_base is None:
+                plan = None
+            else:
+                plan = self.poll_grants.plan_request(waiting, new_grants)
+            if plan is not None:
+                contended = plan == 'minislot' or first_slot is None
+                if contended:
+                    start = self.poll_grants.request_time(self.slots, slot_index, minislots, minislot)
+                else:
+                    start = first_slot  # MAC_PRIO_ACK: ahead of the DATA
+                packet = self.create_packet(self.poll_base, slot_index & 0xFF, self.PKT_POLL_REQ,
+                                            bytes([min(waiting, 255)]))
+                frame = {'packet': packet, 'class': 'request', 'enqueued': start}
+                heapq.heappush(self.mac_heap, (start, self.MAC_PRIO_ACK, next(self.timer_counter), frame))
+                self.poll_grants.on_request(waiting, contended)
+        self.wake_tx()
+
+    def expire_poll_backlog(self):
+        """Polled: no slot grid any more (beacons lost), send held DATA as plain ALOHA"""
+        if self.mac_mode != 'polled' or self.slots.synced():
+            return
+        with self.mac_lock:
+            if not self.poll_backlog:
+                return
+            now = time.monotonic()
+            while self.poll_backlog:
+                for frame in self.poll_backlog.popleft():
+                    air_time = max(now, self.mac_data_ready_at)
+                    heapq.heappush(self.mac_heap, (air_time, self.MAC_PRIO_DATA, next(self.timer_counter), frame))
+                    self.stats['unslotted_frames'] += 1
+        print(f"[Node {self.node_id}] Slot grid lost: held DATA sent without grants")
 
     def transmit_packet(self, packet):
         """Send packet to physical layer as a PDU"""
         try:
-            vec = pmt.init_u8vector(len(packet), list(packet))
-            pdu = pmt.cons(pmt.PMT_NIL, vec)
-            self.message_port_pub(self.port_pdu_out, pdu)
+            self.message_port_pub(self.port_pdu_out, bytes_to_pdu(packet))
+            self.stats['bytes_sent'] += len(packet)
 
         except Exception as e:
             print(f"[Node {self.node_id}] Error transmitting packet: {e}")
 
     # -------------------------------------------------------------------------
-    # Go-Back-N TX thread
+    # Go-Back-N TX thread (one send window per destination)
     # -------------------------------------------------------------------------
+    def tx_link(self, dst):
+        """Per-destination TX state (created on first use)."""
+        link = self.tx_links.get(dst)
+        if link is None:
+            link = {
+                'dst': dst,
+                'queue': PriorityTxQueue(ttl=self.priority_ttl, delays=self.queue_delays,
+                                         on_expire=self.expire_tx_message, limit=self.tx_queue_limit,
+                                         watermarks=self.tx_queue_watermarks, policy=self.drop_policy,
+                                         on_drop=self.drop_tx_message, on_status=self.publish_queue_status),
+                'seq_num_tx': 0,
+                'window': collections.OrderedDict(),
+                'timer_start': None,
+                'rto': self.timeout,
+                'retries': 0,
+                'next_msg_id': 0,
+                'skipped': [],
+            }
+            self.tx_links[dst] = link
+        return link
+
+    def fragment_tx_message(self, link, msg):
+        """Split a long app message into PKT_FRAG messages that share one feedback group."""
+        try:
+            payloads = fragment_message(msg['data'], link['next_msg_id'], self.MAX_PAYLOAD)
+        except ValueError as e:
+            print(f"[Node {self.node_id}] Cannot send message to {link['dst']}: {e}")
+            self.send_feedback(False)
+            return []
+        link['next_msg_id'] = (link['next_msg_id'] + 1) % 256
+
+        group = {'fragments': len(payloads), 'acked': 0, 'feedback_sent': False}
+        print(f"[Node {self.node_id}] TX: Fragmenting {len(msg['data'])} bytes for dst={link['dst']} into {len(payloads)} frames")
+        return [
+            {
+                'dst': msg['dst'],
+                'data': payload,
+                'type': self.PKT_FRAG,
+                'group': group,
+                # The message is counted once, with its last fragment
+                'msg_count': 1 if index == len(payloads) - 1 else 0,
+                'priority': msg.get('priority', PRIO_ROUTINE),
+                'enqueued': msg.get('enqueued', time.monotonic()),
+                # Fragments share the parent's deadline; a requeue keeps it
+                'expires': msg.get('expires'),
+            }
+            for index, payload in enumerate(payloads)
+        ]
+
     def process_acks(self):
-        """Process all pending ACKs and slide the GBN window."""
+        """Process all pending ACKs and slide the window of the ACKing station."""
         try:
             while True:
                 ack = self.ack_queue.get_nowait()
                 ack_seq = ack['seq']
-                # In this simple implementation we don't distinguish by src.
-                if not self.tx_window:
+                ack_rx_time = ack.get('rx_time')
+
+                # An ACK from station X only concerns frames we sent to X
+                link = self.tx_links.get(ack['src'])
+                if link is None:
                     continue
+                if link['skipped']:
+                    self.check_skipped(link, ack_seq)
+                if not link['window']:
+                    continue
+                window = link['window']
 
-                if ack_seq not in self.tx_window:
-                    # Could be a cumulative ACK for multiple packets.
-                    # We remove from the left until we pass ack_seq if it appears.
-                    keys = list(self.tx_window.keys())
-                    if ack_seq in keys:
-                        idx = keys.index(ack_seq)
-                        to_remove = keys[:idx + 1]
-                    else:
-                        # If ack_seq not present, we assume it's older than current base (duplicate) and ignore.
-                        continue
-                else:
-                    # ack_seq is present; treat as cumulative ACK up to this seq.
-                    keys = list(self.tx_window.keys())
-                    idx = keys.index(ack_seq)
-                    to_remove = keys[:idx + 1]
+                if self.arq_mode == 'sr':
+                    if self.apply_selective_ack(link, ack_seq, ack.get('bitmap', b''), ack_rx_time):
+                        self.stats['acks_received'] += 1
+                        self.record_ack_latency(ack_rx_time)
+                    continue
+
+                if ack_seq not in window:
+                    # Older than current base (duplicate ACK): ignore
+                    continue
+
+                # Cumulative ACK up to and including ack_seq
+                keys = list(window.keys())
+                to_remove = keys[:keys.index(ack_seq) + 1]
+
+                # Karn: RTT sample only from the newest ACKed frame, if sent once
+                newest = window[to_remove[-1]]
+                if not newest['retransmitted'] and ack_rx_time is not None:
+                    self.rtt_sample(link['dst'], ack_rx_time - newest['sent_at'])
 
                 # Remove all ACKed packets from window (cumulative ACK)
                 for s in to_remove:
-                    entry = self.tx_window.pop(s, None)
-                    if entry is not None and not entry.get('feedback_sent', False):
-                        self.send_feedback(True)
-                        entry['feedback_sent'] = True
+                    entry = window.pop(s, None)
+                    if entry is not None:
+                        self.entry_feedback(entry, True)
 
                 self.stats['acks_received'] += 1
 
                 # Reset timer/retries based on new window state
-                if self.tx_window:
-                    self.window_timer_start = time.time()
-                    self.window_retries = 0
+                if window:
+                    self.start_window_timer(link)
                 else:
-                    self.window_timer_start = None
-                    self.window_retries = 0
+                    self.stop_window_timer(link)
+                link['retries'] = 0
+
+                self.record_ack_latency(ack_rx_time)
 
         except queue.Empty:
             # No more ACKs for now
@@ -383,104 +1012,468 @@ class blk(gr.sync_block):
         except Exception as e:
             print(f"[Node {self.node_id}] Error processing ACKs: {e}")
 
+    def record_ack_latency(self, ack_rx_time):
+        """Accumulate ACK arrival (RX thread) -> window slid (TX thread) latency."""
+        if ack_rx_time is None:
+            return
+        latency = time.monotonic() - ack_rx_time
+        self.stats['ack_latency_sum'] += latency
+        self.stats['ack_latency_max'] = max(self.stats['ack_latency_max'], latency)
+
+    def seq_offset(self, seq, base):
+        """Distance from 'base' to 'seq' in the 8-bit sequence space."""
+        return (seq - base) & 0xFF
+
+    def apply_selective_ack(self, link, cum_seq, bitmap, ack_rx_time=None):
+        """
+        SR: mark frames ACKed by a cumulative seq + bitmap and slide the window base.
+        Bit i of the bitmap (LSB first in each byte) ACKs seq cum_seq + 1 + i.
+        Only the cumulative part means delivered (feedback TRUE); bitmap frames
+        are merely buffered behind a gap and are not retransmitted.
+        Returns True if the ACK acknowledged anything new.
+        """
+        window = link['window']
+        base = next(iter(window))
+        span = len(window)
+        newly_acked = []
+
+        # Cumulative part: everything up to and including cum_seq
+        if self.seq_offset(cum_seq, base) < span:
+            for i in range(self.seq_offset(cum_seq, base) + 1):
+                newly_acked.append(((base + i) & 0xFF, True))
+
+        # Selective part
+        for i in range(len(bitmap) * 8):
+            if bitmap[i // 8] & (1 << (i % 8)):
+                seq = (cum_seq + 1 + i) & 0xFF
+                if self.seq_offset(seq, base) < span:
+                    newly_acked.append((seq, False))
+
+        acked_any = False
+        newest = None
+        for seq, delivered in newly_acked:
+            entry = window.get(seq)
+            if entry is None or entry['delivered'] or entry['abandoned']:
+                continue
+            if not delivered and entry['acked']:
+                continue
+            if not entry['acked']:
+                acked_any = True
+                if not entry['retransmitted'] and (newest is None or entry['sent_at'] > newest['sent_at']):
+                    newest = entry
+            entry['acked'] = True
+            if delivered:
+                entry['delivered'] = True
+                acked_any = True
+                self.cancel_timer(('frame', link['dst'], seq))
+                self.entry_feedback(entry, True)
+
+        # Karn: RTT sample only from the newest frame ACKed here that was sent once
+        if newest is not None and ack_rx_time is not None:
+            self.rtt_sample(link['dst'], ack_rx_time - newest['sent_at'])
+
+        self.slide_sr_window(link)
+        return acked_any
+
+    def slide_sr_window(self, link):
+        """SR: drop delivered (or abandoned) frames from the base of the window."""
+        window = link['window']
+        while window:
+            base, entry = next(iter(window.items()))
+            if not (entry['delivered'] or entry['abandoned']):
+                break
+            window.popitem(last=False)
+
+    def send_skip(self, link):
+        """Tell the receiver to stop waiting for the seqs we gave up on (PKT_SKIP)."""
+        skipped = link['skipped'][-self.MAX_PAYLOAD:]
+        packet = self.create_packet(link['dst'], skipped[0], self.PKT_SKIP, bytes(skipped))
+        print(f"[Node {self.node_id}] TX: Sending SKIP seqs={skipped} to {link['dst']}")
+        self.send_with_aloha(packet, is_ack=True)
+        self.stats['skips_sent'] += 1
+
+    def check_skipped(self, link, ack_seq):
+        """
+        Forget the given-up seqs an ACK shows the receiver has moved past;
+        repeat the SKIP if it is still waiting for one of them (SKIP lost).
+        """
+        expected = (ack_seq + 1) & 0xFF
+        link['skipped'] = [s for s in link['skipped'] if not 0 < self.seq_offset(expected, s) < 128]
+        if expected in link['skipped']:
+            self.send_skip(link)
+
     def fill_window_from_queue(self):
-        """Pull new messages from tx_queue into the Go-Back-N window if there's space."""
+        """
+        Move queued messages into their destination's window while there is space.
+        Destinations are served round-robin, one frame per turn, so a busy or
+        unreachable station cannot starve the others on the shared PHY. Each
+        turn starts with the destinations whose next message is most urgent.
+        """
         try:
-            while len(self.tx_window) < self.window_size:
-                try:
-                    msg = self.tx_queue.get_nowait()
-                except queue.Empty:
-                    break
+            progress = True
+            while progress:
+                progress = False
+                # sorted() is stable: equal priorities keep their turn order
+                links = sorted(self.tx_links.values(),
+                               key=lambda link: link['queue'].head_priority(len(PRIORITY_NAMES)))
+                for link in links:
+                    if link['queue'] and self.send_next_from_link(link):
+                        progress = True
 
-                dst = msg['dst']
-                data = msg.get('data', b'')
-                pkt_type = msg.get('type', self.PKT_DATA)
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error filling window: {e}")
 
-                # Assign sequence number
-                seq = self.seq_num_tx
-                self.seq_num_tx = (self.seq_num_tx + 1) % 256
+    def send_next_from_link(self, link):
+        """Send the next queued message of one destination. Returns False if its window is full."""
+        window = link['window']
+        if len(window) >= self.window_size:
+            return False
 
-                packet = self.create_packet(dst, seq, pkt_type, data)
+        try:
+            msg = link['queue'].get_nowait()
+        except queue.Empty:
+            return False  # the rest of the queue expired
+        if msg.get('type', self.PKT_DATA) == self.PKT_DATA and len(msg.get('data', b'')) > self.MAX_PAYLOAD:
+            # Long message: its fragments go back to the head of the queue, in order
+            fragments = self.fragment_tx_message(link, msg)
+            if not fragments:
+                return True
+            for fragment in reversed(fragments[1:]):
+                link['queue'].put(fragment, front=True)
+            msg = fragments[0]
+        dst = link['dst']
+        data = msg.get('data', b'')
+        pkt_type = msg.get('type', self.PKT_DATA)
+        msg_count = msg.get('msg_count', 1)
+
+        # Aggregation: coalesce further queued messages for this destination
+        if self.aggregate and dst != 0xFF and pkt_type == self.PKT_DATA:
+            messages = [data]
+            while fits(messages, b'', self.MAX_PAYLOAD):
+                nxt = link['queue'].get_if(lambda m: m.get('type', self.PKT_DATA) == self.PKT_DATA
+                                           and fits(messages, m.get('data', b''), self.MAX_PAYLOAD))
+                if nxt is None:
+                    break
+                messages.append(nxt.get('data', b''))
+            if len(messages) > 1:
+                data = pack_messages(messages)
+                pkt_type = self.PKT_AGG
+                msg_count = len(messages)
+                print(f"[Node {self.node_id}] TX: Aggregated {msg_count} messages for dst={dst} ({len(data)} bytes)")
+
+        # Queueing delay per class, once per message (fragments: the first one)
+        priority = msg.get('priority', PRIO_ROUTINE)
+        queued = msg.get('enqueued')
+        group = msg.get('group')
+        if group is not None:
+            if group.get('on_air'):
+                queued = None
+            group['on_air'] = True
+
+        # Assign sequence number (independent sequence space per destination)
+        seq = link['seq_num_tx']
+        link['seq_num_tx'] = (seq + 1) % 256
+
+        packet = self.create_packet(dst, seq, pkt_type, data)
+
+        # Piggyback a pending ACK for dst on the first transmission only;
+        # retransmissions use the plain packet so they never carry a stale ACK
+        first_packet = packet
+        if dst != 0xFF:
+            ack = self.take_pending_ack(dst, self.MAX_PAYLOAD - len(data))
+            if ack is not None:
+                trailer = bytes([ack['seq'], len(ack['payload'])]) + ack['payload']
+                first_packet = self.create_packet(dst, seq, pkt_type | self.PKT_FLAG_ACK, trailer + data)
+                self.stats['acks_piggybacked'] += 1
+                self.stats['ack_bytes_saved'] += self.ack_frame_size(dst, ack['payload']) - len(trailer)
+                print(f"[Node {self.node_id}] TX: Piggybacking ACK seq={ack['seq']} on DATA seq={seq} to {dst}")
+
+        # For broadcast we typically don't do ARQ; transmit once and don't put in window
+        if dst == 0xFF or pkt_type not in (self.PKT_DATA, self.PKT_AGG, self.PKT_FRAG):
+            print(f"[Node {self.node_id}] TX (no ARQ): seq={seq} dst={dst}")
+            self.send_with_aloha(first_packet, priority=priority, queued=queued)
+            self.stats['packets_sent'] += 1
+            self.stats['messages_sent'] += msg_count
+            return True
+
+        # Reliable (GBN-managed) packet
+        window[seq] = {
+            'packet': packet,
+            'dst': dst,
+            'sent_at': None,
+            'retransmitted': False,
+            'feedback_sent': False,
+            'msg_count': msg_count,
+            'priority': priority,
+            'group': group,
+            'acked': False,
+            'delivered': False,
+            'abandoned': False,
+            'retries': 0,
+            'deadline': None,
+        }
 
-                # For broadcast we typically don't do ARQ; transmit once and don't put in window
-                if dst == 0xFF or pkt_type != self.PKT_DATA:
-                    print(f"[Node {self.node_id}] TX (no ARQ): seq={seq} dst={dst}")
-                    self.send_with_aloha(packet)
-                    self.stats['packets_sent'] += 1
-                    continue
+        print(f"[Node {self.node_id}] TX: Sending DATA seq={seq} dst={dst} (window size={len(window)})")
+        air_time = self.send_with_aloha(first_packet, priority=priority, queued=queued)
+        window[seq]['sent_at'] = air_time
+        self.stats['packets_sent'] += 1
+        self.stats['messages_sent'] += msg_count
+
+        if self.arq_mode == 'sr':
+            # Per-frame timer, started once the frame is on air
+            self.start_frame_timer(link, seq, air_time)
+            return True
+
+        # If this is the first packet in window, start timer once it is on air
+        if len(window) == 1:
+            self.start_window_timer(link, air_time)
+            link['retries'] = 0
+        return True
 
-                # Reliable (GBN-managed) packet
-                self.tx_window[seq] = {
-                    'packet': packet,
-                    'feedback_sent': False,
-                }
+    def start_frame_timer(self, link, seq, start):
+        """SR: (re)start the retransmission timer of a single frame."""
+        entry = link['window'][seq]
+        entry['deadline'] = start + self.rtt_for(link['dst']).rto
+        self.set_timer(('frame', link['dst'], seq), entry['deadline'])
+
+    def check_frame_timeouts(self, link):
+        """SR: retransmit only the frames whose own timer expired."""
+        now = time.monotonic()
+        dst = link['dst']
+        backed_off = False
+        skip = False
+        for seq, entry in list(link['window'].items()):
+            if entry['delivered'] or entry['abandoned'] or entry['deadline'] is None or now < entry['deadline']:
+                continue
+            if self.poll_holding() or (entry['acked'] and not link['skipped']):
+                # Polled: still waiting for a granted slot, not lost yet.
+                # Buffered: waiting for an earlier frame, which has its own timer
+                self.start_frame_timer(link, seq, now)
+                continue
+
+            self.stats['window_timeouts'] += 1
+            entry['retries'] += 1
+            print(f"[Node {self.node_id}] SR timeout at dst={dst} seq={seq}, retry {entry['retries']}/{self.max_retries}")
+
+            if entry['retries'] > self.max_retries:
+                print(f"[Node {self.node_id}] SR: Max retries exceeded, dropping dst={dst} seq={seq}")
+                self.framing_fallback(dst)
+                self.entry_feedback(entry, False)
+                entry['abandoned'] = True
+                entry['deadline'] = None
+                self.cancel_timer(('frame', dst, seq))
+                link['skipped'].append(seq)
+                skip = True
+                continue
+
+            if entry['acked']:
+                # Buffered behind a frame we gave up on: the SKIP was lost
+                skip = True
+                self.start_frame_timer(link, seq, now)
+                continue
+
+            # One RTO backoff per expiry round, not one per frame in it
+            if not backed_off:
+                self.rtt_timeout(dst)
+                backed_off = True
+            print(f"[Node {self.node_id}] SR retransmit dst={dst} seq={seq}")
+            air_time = self.send_with_aloha(entry['packet'], priority=entry['priority'], retry=True)
+            entry['sent_at'] = air_time
+            entry['retransmitted'] = True
+            self.stats['retransmissions'] += 1
+            self.start_frame_timer(link, seq, air_time)
 
-                print(f"[Node {self.node_id}] TX: Sending DATA seq={seq} dst={dst} (window size={len(self.tx_window)})")
-                self.send_with_aloha(packet)
-                self.stats['packets_sent'] += 1
+        if skip:
+            self.send_skip(link)
+        self.slide_sr_window(link)
 
-                # If this is the first packet in window, start timer
-                if len(self.tx_window) == 1:
-                    self.window_timer_start = time.time()
-                    self.window_retries = 0
+    def check_window_timeout(self):
+        """Check every destination's window for a retransmission timeout."""
+        for link in list(self.tx_links.values()):
+            if not link['window']:
+                continue
+            if self.arq_mode == 'sr':
+                self.check_frame_timeouts(link)
+            else:
+                self.check_link_timeout(link)
 
-        except Exception as e:
-            print(f"[Node {self.node_id}] Error filling window: {e}")
+    def check_link_timeout(self, link):
+        """Check for Go-Back-N timeout on the base of one window and retransmit if needed."""
+        window = link['window']
+        dst = link['dst']
 
-    def check_window_timeout(self):
-        """Check for Go-Back-N timeout on the base of the window and retransmit if needed."""
-        if not self.tx_window:
+        if link['timer_start'] is None:
             return
 
-        if self.window_timer_start is None:
+        now = time.monotonic()
+        if now - link['timer_start'] < link['rto']:
             return
-
-        now = time.time()
-        if now - self.window_timer_start < self.timeout:
+        if self.poll_holding():
+            # Polled: frames still wait for a granted slot; a retransmission
+            # would only queue up behind them
+            self.start_window_timer(link, now)
             return
 
         # Timeout occurred for base of window
         self.stats['window_timeouts'] += 1
-        self.window_retries += 1
-        base_seq = next(iter(self.tx_window.keys()))
-        print(f"[Node {self.node_id}] GBN timeout at seq={base_seq}, retry {self.window_retries}/{self.max_retries}")
-
-        if self.window_retries > self.max_retries:
-            print(f"[Node {self.node_id}] GBN: Max retries exceeded, dropping window")
-            # Mark all outstanding packets as failed
-            for _seq, entry in list(self.tx_window.items()):
-                if not entry.get('feedback_sent', False):
-                    self.send_feedback(False)
-                    entry['feedback_sent'] = True
-            self.tx_window.clear()
-            self.window_timer_start = None
-            self.window_retries = 0
+        link['retries'] += 1
+        base_seq = next(iter(window.keys()))
+        print(f"[Node {self.node_id}] GBN timeout at dst={dst} seq={base_seq}, retry {link['retries']}/{self.max_retries}")
+
+        if link['retries'] > self.max_retries:
+            print(f"[Node {self.node_id}] GBN: Max retries exceeded, dropping window to {dst}")
+            self.framing_fallback(dst)
+            # Mark all outstanding packets as failed; the receiver skips them
+            for seq, entry in list(window.items()):
+                self.entry_feedback(entry, False)
+                link['skipped'].append(seq)
+            window.clear()
+            self.send_skip(link)
+            self.stop_window_timer(link)
+            link['retries'] = 0
             return
 
+        # Back off the RTO of the destination that failed to answer
+        self.rtt_timeout(dst)
+
         # Go-Back-N: retransmit all packets currently in the window
-        for seq, entry in self.tx_window.items():
-            print(f"[Node {self.node_id}] GBN retransmit seq={seq}")
-            self.send_with_aloha(entry['packet'])
+        air_time = now
+        for seq, entry in window.items():
+            print(f"[Node {self.node_id}] GBN retransmit dst={dst} seq={seq}")
+            air_time = self.send_with_aloha(entry['packet'], priority=entry['priority'], retry=True)
+            entry['sent_at'] = air_time
+            entry['retransmitted'] = True
             self.stats['retransmissions'] += 1
 
-        # Restart timer for the base
-        self.window_timer_start = time.time()
+        # Restart timer for the base once the retransmitted window is on air
+        self.start_window_timer(link, air_time)
+
+    # -------------------------------------------------------------------------
+    # Adaptive retransmission timeout
+    # -------------------------------------------------------------------------
+    def rtt_for(self, dst):
+        """RTT estimator for a destination (created on first use)."""
+        est = self.rtt_estimators.get(dst)
+        if est is None:
+            est = RttEstimator(initial_rto=self.timeout)
+            self.rtt_estimators[dst] = est
+        return est
+
+    def rtt_sample(self, dst, rtt):
+        """Feed an RTT measurement for 'dst' and publish the new estimate."""
+        self.rtt_for(dst).sample(rtt)
+        self.publish_rtt_stats(dst)
+
+    def rtt_timeout(self, dst):
+        """Exponential RTO backoff for 'dst' after a retransmission timeout."""
+        self.rtt_for(dst).on_timeout()
+        # No ACK in time is taken as a collision: widen the ALOHA backoff window
+        self.contention.on_collision()
+        self.publish_stats(self.contention.as_dict())
+        if self.mac_mode == 'csma':
+            # No ACK in time is taken as a collision: widen the contention window
+            # and back off before the retransmission
+            self.csma.on_collision()
+            with self.mac_lock:
+                self.csma_ready_at = max(self.csma_ready_at, time.monotonic() + self.csma.backoff())
+        self.publish_rtt_stats(dst)
+
+    def publish_rtt_stats(self, dst):
+        """Publish SRTT/RTTVAR/RTO of 'dst' as a dict on the stats port."""
+        self.publish_stats(self.rtt_for(dst).as_dict(), dst)
+
+    def publish_stats(self, values, dst=None):
+        """Publish 'values' as a dict on the stats port ('dst' for per-destination ones)."""
+        try:
+            meta = pmt.make_dict()
+            if dst is not None:
+                meta = pmt.dict_add(meta, KEY_DST, pmt.from_long(dst))
+            for key, value in values.items():
+                sym = self.stats_keys.get(key)
+                if sym is None:
+                    sym = self.stats_keys[key] = pmt.intern(key)
+                if isinstance(value, int):
+                    meta = pmt.dict_add(meta, sym, pmt.from_long(value))
+                else:
+                    meta = pmt.dict_add(meta, sym, pmt.from_double(value))
+            self.message_port_pub(self.port_stats, meta)
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error publishing stats: {e}")
+
+    # -------------------------------------------------------------------------
+    # TX scheduler (condition variable + timer heap)
+    # -------------------------------------------------------------------------
+    def wake_tx(self):
+        """Wake the TX thread (new app message, ACK arrival or shutdown)."""
+        with self.tx_cond:
+            self.tx_wakeup = True
+            self.tx_cond.notify()
+
+    def set_timer(self, key, deadline):
+        """Arm (or re-arm) the timer 'key' to fire at the monotonic time 'deadline'."""
+        self.timer_deadlines[key] = deadline
+        heapq.heappush(self.timer_heap, (deadline, next(self.timer_counter), key))
+
+    def cancel_timer(self, key):
+        """Disarm the timer 'key'; its heap entry is discarded lazily."""
+        self.timer_deadlines.pop(key, None)
+
+    def next_timer_delay(self):
+        """Seconds until the earliest live timer, or None if no timer is armed."""
+        while self.timer_heap:
+            deadline, _, key = self.timer_heap[0]
+            if self.timer_deadlines.get(key) != deadline:
+                heapq.heappop(self.timer_heap)
+                continue
+            return max(0.0, deadline - time.monotonic())
+        return None
+
+    def start_window_timer(self, link, start=None):
+        """(Re)start the timer for the base of a destination's window (from 'start', default now)."""
+        link['timer_start'] = time.monotonic() if start is None else start
+        link['rto'] = self.rtt_for(link['dst']).rto
+        self.set_timer(('window', link['dst']), link['timer_start'] + link['rto'])
+
+    def stop_window_timer(self, link):
+        """Stop a destination's window timer (window empty or dropped)."""
+        link['timer_start'] = None
+        self.cancel_timer(('window', link['dst']))
 
     def tx_handler(self):
         """Thread for handling Go-Back-N transmission + ALOHA medium access."""
         while self.running:
             try:
+                # Sleep until there is something to do
+                with self.tx_cond:
+                    if not self.tx_wakeup:
+                        delays = [d for d in (self.next_timer_delay(), self.next_mac_delay(), self.next_ack_delay())
+                                  if d is not None]
+                        self.tx_cond.wait(min(delays) if delays else None)
+                    self.tx_wakeup = False
+
+                if not self.running:
+                    break
+
                 # 1) Process all ACKs
                 self.process_acks()
 
-                # 2) Check for timeout on window base
+                # 2) Check for timeouts on the window of every destination
                 self.check_window_timeout()
 
-                # 3) Fill window with new packets from tx_queue if space
+                # 3) Fill windows with new packets from the link queues if space
+                #    (pending ACKs may ride on this DATA)
                 self.fill_window_from_queue()
 
-                # Small sleep to avoid busy-wait
-                time.sleep(0.01)
+                # 4) Send delayed ACKs whose deadline has passed
+                self.flush_delayed_acks()
+
+                # 5) Base station: queue the next slot beacon
+                #    (polled, no beacons any more: release DATA held for grants)
+                self.schedule_beacon()
+                self.expire_poll_backlog()
+
+                # 6) Put frames whose ALOHA slot has come on the air
+                self.service_mac_queue()
 
             except Exception as e:
                 print(f"[Node {self.node_id}] TX handler error: {e}")
@@ -496,34 +1489,63 @@ class blk(gr.sync_block):
                     rx_data = self.rx_queue.get(timeout=0.1)
                 except queue.Empty:
                     continue
+                rx_time = time.monotonic()
+                crc_errors = self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors']
+
+                # A PDU is either one bare frame (delimited by the PHY header) or
+                # a chunk of full frames for the sync word scanners
+                pkt = self.framer.parse_delimited(rx_data)
+                if pkt is not None:
+                    packets = [pkt]
+                else:
+                    packets = self.framer.feed(rx_data) + self.fec_framer.feed(rx_data)
 
-                # Append to RX buffer
-                self.rx_buffer += rx_data
-
-                # Extract packets from buffer
-                while len(self.rx_buffer) > 0:
-                    pkt = self.parse_packet(self.rx_buffer)
-
-                    if pkt is None:
-                        # No valid packet at current alignment; drop one byte and re-try
-                        if len(self.rx_buffer) > 1:
-                            self.rx_buffer = self.rx_buffer[1:]
-                        else:
-                            self.rx_buffer = bytes()
-                        continue
+                # Contention evidence: CRC-error bursts and the stations heard
+                crc_errors = self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors'] - crc_errors
+                for _ in range(crc_errors):
+                    if self.contention.on_crc_error(rx_time):
+                        self.publish_stats(self.contention.as_dict())
 
-                    # Remove processed bytes
-                    self.rx_buffer = self.rx_buffer[pkt['consumed']:]
+                for pkt in packets:
+                    self.learn_framing(pkt)
+                    if pkt['src'] != self.node_id:
+                        self.contention.heard(pkt['src'], rx_time)
+                    if self.mac_mode == 'polled' and self.slots.master:
+                        self.poll.heard(pkt['src'], rx_time)
 
                     # Addressing: packet must be for us or broadcast
                     if pkt['dst'] != self.node_id and pkt['dst'] != 0xFF:
                         print(f"[Node {self.node_id}] RX: Packet not for us (dst={pkt['dst']})")
                         continue
 
-                    if pkt['type'] == self.PKT_DATA:
-                        self.handle_data_packet(pkt)
-                    elif pkt['type'] == self.PKT_ACK:
+                    if pkt['type'] == self.PKT_BEACON:
+                        self.handle_beacon(pkt, rx_time, len(rx_data))
+                        continue
+                    if pkt['type'] == self.PKT_POLL_REQ:
+                        if self.slots.master and pkt['payload']:
+                            self.poll.on_request(pkt['src'], pkt['payload'][0], rx_time)
+                        continue
+
+                    if pkt['type'] & self.PKT_FLAG_ACK:
+                        pkt = self.split_piggyback(pkt)
+                        if pkt is None:
+                            continue
+
+                    is_data = pkt['type'] in (self.PKT_DATA, self.PKT_AGG, self.PKT_FRAG)
+                    if is_data and pkt['dst'] == 0xFF:
+                        # Broadcasts are sent without ARQ and use their own
+                        # sequence space: deliver without touching expected_seq_rx
+                        self.stats['packets_received'] += 1
+                        self.deliver_packet(pkt)
+                    elif is_data:
+                        if self.arq_mode == 'sr':
+                            self.handle_data_packet_sr(pkt)
+                        else:
+                            self.handle_data_packet(pkt)
+                    elif pkt['type'] in (self.PKT_ACK, self.PKT_SACK):
                         self.handle_ack_packet(pkt)
+                    elif pkt['type'] == self.PKT_SKIP:
+                        self.handle_skip_packet(pkt)
 
             except Exception as e:
                 print(f"[Node {self.node_id}] RX handler error: {e}")
@@ -532,7 +1554,6 @@ class blk(gr.sync_block):
         """Handle incoming DATA packet with GBN receiver logic."""
         src = pkt['src']
         seq = pkt['seq']
-        payload = pkt['payload']
 
         self.stats['packets_received'] += 1
         expected = self.expected_seq_rx.get(src, 0)
@@ -553,51 +1574,313 @@ class blk(gr.sync_block):
                 ack_seq = (expected - 1) & 0xFF
             is_new = False
 
-        # Send ACK for last in-order seq (GBN cumulative ACK)
-        ack_packet = self.create_packet(src, ack_seq, self.PKT_ACK)
-        print(f"[Node {self.node_id}] RX: Sending ACK seq={ack_seq} to {src}")
-        self.send_with_aloha(ack_packet)
-        self.stats['acks_sent'] += 1
+        # ACK last in-order seq (GBN cumulative ACK); out-of-order/duplicate
+        # frames are ACKed at once so the sender learns about the loss
+        self.queue_ack(src, self.PKT_ACK, ack_seq, b'', immediate=not is_new)
 
         # Deliver only new, in-order packets to the application
         if is_new:
-            self.forward_to_app(src, payload)
+            self.deliver_packet(pkt)
+
+    def handle_data_packet_sr(self, pkt):
+        """Handle incoming DATA packet with Selective Repeat receiver logic."""
+        src = pkt['src']
+        seq = pkt['seq']
+
+        self.stats['packets_received'] += 1
+        expected = self.expected_seq_rx.get(src, 0)
+        reorder = self.rx_reorder.setdefault(src, {})
+        offset = self.seq_offset(seq, expected)
+
+        if offset < self.window_size:
+            # Inside the receive window: buffer it, then deliver the in-order run
+            # (a seq the sender gave up on keeps its None placeholder)
+            if seq not in reorder:
+                reorder[seq] = pkt
+            print(f"[Node {self.node_id}] RX: SR DATA from {src}, seq={seq} (expected={expected}, buffered={len(reorder)})")
+            self.deliver_sr_run(src)
+            in_order = offset == 0 and not reorder
+        else:
+            # Already delivered (our previous ACK was lost) or too far ahead: just re-ACK
+            print(f"[Node {self.node_id}] RX: SR old/out-of-window DATA from {src}, seq={seq}, expected={expected}")
+            in_order = False
+
+        # Gaps and old frames are SACKed at once, in-order frames may be delayed
+        self.queue_sack(src, immediate=not in_order)
+
+    def deliver_sr_run(self, src):
+        """SR: deliver the in-order run of buffered frames from src and advance expected_seq_rx."""
+        expected = self.expected_seq_rx.get(src, 0)
+        reorder = self.rx_reorder.setdefault(src, {})
+        while expected in reorder:
+            pkt = reorder.pop(expected)
+            if pkt is not None:
+                self.deliver_packet(pkt)
+            expected = (expected + 1) & 0xFF
+        self.expected_seq_rx[src] = expected
+
+    def queue_sack(self, src, immediate=False):
+        """SR: ACK src with cumulative seq = last in-order seq, bitmap = frames buffered beyond it."""
+        expected = self.expected_seq_rx.get(src, 0)
+        reorder = self.rx_reorder.get(src, {})
+        cum_seq = (expected - 1) & 0xFF
+        bitmap = bytearray((self.window_size + 7) // 8)
+        for buffered, pkt in reorder.items():
+            i = self.seq_offset(buffered, expected)
+            if pkt is not None and i < len(bitmap) * 8:
+                bitmap[i // 8] |= 1 << (i % 8)
+        self.queue_ack(src, self.PKT_SACK, cum_seq, bytes(bitmap), immediate=immediate)
+
+    def handle_skip_packet(self, pkt):
+        """Stop waiting for the seqs src gave up on and deliver what was buffered behind them."""
+        src = pkt['src']
+        expected = self.expected_seq_rx.get(src, 0)
+        skipped = [s for s in pkt['payload'] if self.seq_offset(s, expected) < self.window_size]
+        print(f"[Node {self.node_id}] RX: SKIP from {src}, seqs={list(pkt['payload'])} (expected={expected})")
+
+        if self.arq_mode == 'sr':
+            reorder = self.rx_reorder.setdefault(src, {})
+            for seq in skipped:
+                reorder.setdefault(seq, None)
+            self.deliver_sr_run(src)
+            self.queue_sack(src, immediate=True)
+            return
+
+        # GBN: the sender dropped its whole window, nothing is buffered here
+        while expected in skipped:
+            expected = (expected + 1) & 0xFF
+        self.expected_seq_rx[src] = expected
+        self.queue_ack(src, self.PKT_ACK, (expected - 1) & 0xFF, b'', immediate=True)
+
+    # -------------------------------------------------------------------------
+    # Delayed / piggybacked ACKs
+    # -------------------------------------------------------------------------
+    def ack_frame_size(self, dst, payload=b''):
+        """On-air size (bytes) of a standalone ACK/SACK frame to dst."""
+        size = 5 + len(payload) + self.CRC_SIZE
+        if not self.use_bare_framing(dst):
+            size += len(self.PREAMBLE) + len(self.SYNC_WORD)
+        return size
+
+    def queue_ack(self, src, pkt_type, seq, payload, immediate=False):
+        """
+        RX thread: ACK a DATA frame from src. A pending ACK for src is replaced
+        (the new one is cumulative); the ACK goes out now once ack_every frames
+        are pending or if 'immediate', otherwise by the TX thread after ack_delay.
+        """
+        with self.rx_ack_lock:
+            pending = self.rx_acks.pop(src, None)
+            count = 1
+            deadline = time.monotonic() + self.ack_delay
+            if pending is not None:
+                # The pending ACK is superseded and never goes on air
+                count += pending['count']
+                deadline = pending['deadline']
+                self.stats['acks_coalesced'] += 1
+                self.stats['ack_bytes_saved'] += self.ack_frame_size(src, pending['payload'])
+
+            if not immediate and count < self.ack_every:
+                self.rx_acks[src] = {
+                    'type': pkt_type,
+                    'seq': seq,
+                    'payload': payload,
+                    'count': count,
+                    'deadline': deadline,
+                }
+
+        if immediate or count >= self.ack_every:
+            self.send_ack(src, pkt_type, seq, payload)
+        else:
+            # Let the TX thread re-arm its wait for the ACK deadline
+            self.wake_tx()
+
+    def send_ack(self, src, pkt_type, seq, payload):
+        """Send a standalone ACK/SACK frame ahead of queued DATA."""
+        ack_packet = self.create_packet(src, seq, pkt_type, payload)
+        if pkt_type == self.PKT_SACK:
+            print(f"[Node {self.node_id}] RX: Sending SACK seq={seq} bitmap={payload.hex()} to {src}")
+        else:
+            print(f"[Node {self.node_id}] RX: Sending ACK seq={seq} to {src}")
+        self.send_with_aloha(ack_packet, is_ack=True)
+        self.stats['acks_sent'] += 1
+
+    def take_pending_ack(self, dst, room):
+        """TX thread: remove and return the pending ACK for dst if it fits in 'room' payload bytes."""
+        with self.rx_ack_lock:
+            pending = self.rx_acks.get(dst)
+            if pending is None or 2 + len(pending['payload']) > room:
+                return None
+            return self.rx_acks.pop(dst)
+
+    def flush_delayed_acks(self):
+        """TX thread: send every pending ACK whose delay has run out."""
+        now = time.monotonic()
+        with self.rx_ack_lock:
+            due = [src for src, ack in self.rx_acks.items() if ack['deadline'] <= now]
+            acks = [(src, self.rx_acks.pop(src)) for src in due]
+        for src, ack in acks:
+            self.send_ack(src, ack['type'], ack['seq'], ack['payload'])
+
+    def next_ack_delay(self):
+        """Seconds until the earliest delayed ACK is due, or None if none is pending."""
+        with self.rx_ack_lock:
+            if not self.rx_acks:
+                return None
+            earliest = min(ack['deadline'] for ack in self.rx_acks.values())
+        return max(0.0, earliest - time.monotonic())
+
+    def split_piggyback(self, pkt):
+        """Hand the ACK carried by a flagged DATA frame to the ACK path; return the plain DATA frame."""
+        payload = pkt['payload']
+        if len(payload) < 2 or len(payload) < 2 + payload[1]:
+            print(f"[Node {self.node_id}] RX: Malformed piggybacked ACK from {pkt['src']}")
+            return None
+        ack_len = 2 + payload[1]
+        bitmap = bytes(payload[2:ack_len])
+        self.handle_ack_packet({
+            'src': pkt['src'],
+            'dst': pkt['dst'],
+            'seq': payload[0],
+            'type': self.PKT_SACK if bitmap else self.PKT_ACK,
+            'payload': bitmap,
+        })
+        data_pkt = dict(pkt)
+        data_pkt['type'] = pkt['type'] & ~self.PKT_FLAG_ACK
+        data_pkt['payload'] = payload[ack_len:]
+        return data_pkt
 
     def handle_ack_packet(self, pkt):
         """Handle incoming ACK packet (push to ack_queue for TX thread)."""
         src = pkt['src']
         seq = pkt['seq']
         print(f"[Node {self.node_id}] RX: ACK from node {src}, seq={seq}")
+        self.csma.on_success()
+        self.contention.on_success()
+        self.publish_stats(self.contention.as_dict())
         # Push seq to ack queue; TX thread handles window sliding
-        self.ack_queue.put({'src': src, 'seq': seq})
+        self.ack_queue.put({
+            'src': src,
+            'seq': seq,
+            'bitmap': pkt['payload'] if pkt['type'] == self.PKT_SACK else b'',
+            'rx_time': time.monotonic(),
+        })
+        self.wake_tx()
 
     # -------------------------------------------------------------------------
     # Upper-layer delivery & feedback
     # -------------------------------------------------------------------------
+    def deliver_packet(self, pkt):
+        """Forward a DATA packet's message(s) to the application, splitting aggregates
+        and reassembling fragments."""
+        if pkt['type'] == self.PKT_AGG:
+            for message in unpack_messages(pkt['payload']):
+                self.forward_to_app(pkt['src'], message)
+        elif pkt['type'] == self.PKT_FRAG:
+            # Broadcast and unicast fragments use separate msg-id spaces at the sender
+            message = self.reassembler.add((pkt['src'], pkt['dst']), pkt['payload'])
+            if message is not None:
+                self.forward_to_app(pkt['src'], message)
+        else:
+            self.forward_to_app(pkt['src'], pkt['payload'])
+
     def forward_to_app(self, src_id, data):
-        """Forward received data to application/GUI."""
+        """Forward received data to application/GUI as a message PDU."""
         try:
-            message = data.decode('utf-8', errors='ignore')
-            output = f"[From Node {src_id}]: {message}"
-
-            # Simple string out
-            msg = pmt.intern(output)
+            if self.string_out:
+                # Compatibility shim: interns every message, only for old flowgraphs
+                msg = pmt.intern(f"[From Node {src_id}]: {data.decode('utf-8', errors='ignore')}")
+            else:
+                msg = make_message(
+                    data,
+                    dst=self.node_id,
+                    src=src_id,
+                    msg_id=next(self.rx_msg_counter),
+                    timestamp=time.time()
+                )
             self.message_port_pub(self.port_msg_out, msg)
 
-            # (Optional) could also send a dict PDU here if needed
-            print(f"[Node {self.node_id}] Message delivered: {output}")
+            print(f"[Node {self.node_id}] Message delivered from {src_id}: {data.decode('utf-8', errors='ignore')}")
 
         except Exception as e:
             print(f"[Node {self.node_id}] Error forwarding to app: {e}")
 
+    def entry_feedback(self, entry, success):
+        """Send feedback once for every app message carried by a window entry."""
+        if entry.get('feedback_sent', False):
+            return
+        entry['feedback_sent'] = True
+
+        group = entry.get('group')
+        if group is None:
+            for _ in range(entry.get('msg_count', 1)):
+                self.send_feedback(success)
+            return
+
+        # Fragment: the message succeeds once every fragment is ACKed and
+        # fails as soon as one of them is dropped
+        if group['feedback_sent']:
+            return
+        if success:
+            group['acked'] += 1
+            if group['acked'] < group['fragments']:
+                return
+        else:
+            # Do not send the rest of a message that can no longer be reassembled
+            link = self.tx_links.get(entry['dst'])
+            if link is not None:
+                link['queue'].discard(lambda m: m.get('group') is group)
+        group['feedback_sent'] = True
+        self.send_feedback(success)
+
     def send_feedback(self, success):
         """Send boolean-like feedback (TRUE/FALSE) to feedback port."""
         try:
-            text = "TRUE" if success else "FALSE"
-            msg = pmt.intern(text)
+            msg = self.feedback_true if success else self.feedback_false
             self.message_port_pub(self.port_feedback, msg)
         except Exception as e:
             print(f"[Node {self.node_id}] Error sending feedback: {e}")
+        self.publish_stats(dict(self.queue_delays.as_dict(self.queue_depths()), **self.queue_bounds()))
+
+    def expire_tx_message(self, msg):
+        """A queued message outlived its TTL: drop it and report it as failed."""
+        waited = time.monotonic() - msg['enqueued']
+        print(f"[Node {self.node_id}] TX: Dropping {PRIORITY_NAMES[msg['priority']]} message "
+              f"to dst={msg['dst']} after {waited:.1f}s in the queue (TTL)")
+        self.entry_feedback({'dst': msg['dst'], 'msg_count': msg.get('msg_count', 1),
+                             'group': msg.get('group')}, False)
+
+    def drop_tx_message(self, msg):
+        """A queued message was dropped to make room for a new one: report it as failed."""
+        print(f"[Node {self.node_id}] TX: Dropping {PRIORITY_NAMES[msg['priority']]} message "
+              f"to dst={msg['dst']} (queue full, '{self.drop_policy}' policy)")
+        self.entry_feedback({'dst': msg['dst'], 'msg_count': msg.get('msg_count', 1),
+                             'group': msg.get('group')}, False)
+
+    def publish_queue_status(self, dst, status):
+        """Depth and congestion of the queue of one destination, on the queue_status port."""
+        try:
+            self.message_port_pub(self.port_queue_status, make_queue_status(dst, status))
+        except Exception as e:
+            print(f"[Node {self.node_id}] Error publishing queue status: {e}")
+
+    def queue_bounds(self):
+        """Bound counters of the per-destination queues, summed (queue_peak: the deepest one)."""
+        totals = {}
+        for link in list(self.tx_links.values()):
+            for key, value in link['queue'].as_dict().items():
+                if key == 'queue_peak':
+                    totals[key] = max(totals.get(key, 0), value)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def queue_depths(self):
+        """Messages waiting for window space per priority class, over all destinations."""
+        depths = [0] * len(PRIORITY_NAMES)
+        for link in list(self.tx_links.values()):
+            for level, depth in enumerate(link['queue'].depths()):
+                depths[level] += depth
+        return depths
 
     # -------------------------------------------------------------------------
     # GNU Radio boilerplate
@@ -614,10 +1897,72 @@ class blk(gr.sync_block):
         print(f"  ACKs sent:         {self.stats['acks_sent']}")
         print(f"  ACKs received:     {self.stats['acks_received']}")
         print(f"  Retransmissions:   {self.stats['retransmissions']}")
-        print(f"  CRC errors:        {self.stats['crc_errors']}")
+        if self.stats['skips_sent']:
+            print(f"  SKIPs sent:        {self.stats['skips_sent']}")
+        print(f"  CRC errors:        {self.framer.stats['crc_errors'] + self.fec_framer.stats['crc_errors']}")
+        if self.fec_framer.stats['fec_frames'] or self.fec_framer.stats['fec_failures']:
+            fec = self.fec_framer.stats
+            print(f"  FEC frames:        {fec['fec_frames']} ({fec['fec_corrected_frames']} corrected, "
+                  f"{fec['fec_corrected_bytes']} bytes fixed, {fec['fec_failures']} uncorrectable)")
         print(f"  Window timeouts:   {self.stats['window_timeouts']}")
+        if self.stats['acks_coalesced'] or self.stats['acks_piggybacked']:
+            print(f"  ACKs coalesced:    {self.stats['acks_coalesced']}, piggybacked: {self.stats['acks_piggybacked']}"
+                  f" ({self.stats['ack_bytes_saved']} bytes of ACK airtime saved)")
+        if self.burst_filter.stats['bursts_discarded']:
+            print(f"  Sync bursts:       {self.burst_filter.stats['bursts_discarded']} dropped "
+                  f"({self.burst_filter.stats['burst_bytes_discarded']} bytes)")
+        if self.reassembler.stats['completed'] or len(self.reassembler):
+            print(f"  Reassembly:        {self.reassembler.stats}")
+        print(f"  Bytes sent:        {self.stats['bytes_sent']}")
+        if any(c['bare'] for c in self.framing_savings.sizes.values()):
+            print("  Bare framing:      (frames built, PHY header included in the airtime)")
+            for line in self.framing_savings.report():
+                print(f"    {line}")
+        if self.stats['messages_sent']:
+            per_kb = 1000.0 * self.stats['messages_sent'] / self.stats['bytes_sent']
+            print(f"  Messages per kB:   {per_kb:.2f} (airtime efficiency)")
+        for dst, est in self.rtt_estimators.items():
+            if est.srtt is not None:
+                print(f"  RTT to {dst}:         srtt={1000.0 * est.srtt:.1f} ms rto={1000.0 * est.rto:.1f} ms")
+        if self.stats['acks_received']:
+            avg_ms = 1000.0 * self.stats['ack_latency_sum'] / self.stats['acks_received']
+            print(f"  ACK->slide avg:    {avg_ms:.3f} ms (max {1000.0 * self.stats['ack_latency_max']:.3f} ms)")
+        for cls, counters in self.mac_latency.items():
+            if counters['frames']:
+                avg_ms = 1000.0 * counters['sum'] / counters['frames']
+                print(f"  MAC delay ({cls}):  {avg_ms:.1f} ms avg, {1000.0 * counters['max']:.1f} ms max over {counters['frames']} frames")
+        for line in self.queue_delays.report():
+            print(f"  Priority:          {line}")
+        for dst, link in list(self.tx_links.items()):
+            if link['queue'].report() is not None:
+                print(f"  TX queue to {dst}:    {link['queue'].report()}")
+        if self.mac_mode == 'csma':
+            c = self.csma.stats
+            print(f"  CSMA:              {c['busy_periods']} busy periods, {c['deferrals']} frames deferred, "
+                  f"{c['collisions']} collisions, {c['forced']} forced, cw={self.csma.cw}")
+        if self.mac_mode in ('aloha', 'slotted'):
+            c = self.contention.as_dict()
+            print(f"  Contention:        p={c['p']:.3f}, window={c['window']:.1f}, {c['stations']} stations, "
+                  f"{c['collisions']} collisions, {c['crc_errors']} CRC errors in bursts, loss {100.0 * c['loss']:.0f}%")
+        if self.stats['beacons_sent']:
+            print(f"  Beacons sent:      {self.stats['beacons_sent']} ({1000.0 * self.slots.slot:.2f} ms slots)")
+        if self.mac_mode in ('slotted', 'polled') and not self.slots.master:
+            g = self.slots.as_dict()
+            print(f"  Slot grid:         {g['beacons']} beacons ({g['outliers']} outliers, {g['resyncs']} resyncs), "
+                  f"drift {g['drift_ppm']:.1f} ppm, phase error {1000.0 * g['error_avg']:.2f} ms avg "
+                  f"{1000.0 * g['error_max']:.2f} ms max, {self.stats['unslotted_frames']} frames before sync")
+        if self.mac_mode == 'polled' and self.slots.master:
+            p = self.poll.as_dict()
+            print(f"  Polling:           {p['stations']} stations on the roster, {p['requests']} requests, "
+                  f"{p['grants']} slots granted on request, {p['polls']} polls, "
+                  f"{p['idle_slots']} idle over {p['superframes']} superframes")
+        elif self.mac_mode == 'polled':
+            p = self.poll_grants.as_dict()
+            print(f"  Polling:           {p['requests']} requests ({p['contended']} in minislots), "
+                  f"{p['grants']} slots granted, {p['unused']} unused")
 
         self.running = False
+        self.wake_tx()
         if self.tx_thread.is_alive():
             self.tx_thread.join()
         if self.rx_thread.is_alive():
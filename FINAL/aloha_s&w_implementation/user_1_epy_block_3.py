@@ -0,0 +1,218 @@
+"""
+Embedded Python Block for GNU Radio - Burst TX queue
+Replaces pdu_to_tagged_stream (x2) -> tagged_stream_mux in front of the
+modulator, so the radio only transmits while there is something to send.
+
+protocol_formatter_async publishes a header and a payload PDU per frame.
+They are paired here and queued. Everything that is queued when a burst
+starts, or that arrives while it is still being written, is sent as one
+burst:
+
+    [tx_sob] frame | frame | ... | pad [tx_eob]
+
+The pad bytes flush the modulator's RRC filter, so the end of the last
+frame is on the air before tx_eob. Tags are placed on the byte stream and
+scale with the modulator's interpolation (the gr-control xmt_rcv_switch
+prototype uses the same tx_sob/tx_eob convention).
+
+Between bursts no bytes are produced, so the sink gets no samples and the
+modulator, the sink and the USB link stay idle. A 'tx_done' message is
+published when a burst has been closed. Half-duplex turnaround can key on
+it instead of on fixed delays.
+"""
+
+import collections
+import time
+
+import numpy as np
+from gnuradio import gr
+import pmt
+
+from link_pdu import pdu_to_bytes
+
+
+class blk(gr.sync_block):
+    """
+    Header/payload PDUs in, tx_sob/tx_eob tagged byte bursts out
+    (connect the output to the modulator).
+    """
+
+    def __init__(self, pad_bytes=4, max_queue=64):
+        """
+        Arguments:
+            pad_bytes: Bytes appended to every burst to flush the modulator's
+                       pulse-shaping filter (>= half the RRC span, in bytes)
+            max_queue: Frames waiting for the air before new ones are dropped
+        """
+        gr.sync_block.__init__(
+            self,
+            name='Burst TX Queue',
+            in_sig=None,
+            out_sig=[np.uint8]
+        )
+
+        self.pad = np.zeros(max(int(pad_bytes), 1), dtype=np.uint8)
+        self.max_queue = int(max_queue)
+
+        self.port_header = pmt.intern('header')
+        self.port_payload = pmt.intern('payload')
+        self.port_tx_done = pmt.intern('tx_done')
+        self.message_port_register_in(self.port_header)
+        self.message_port_register_in(self.port_payload)
+        self.message_port_register_out(self.port_tx_done)
+        self.set_msg_handler(self.port_header, self.handle_header)
+        self.set_msg_handler(self.port_payload, self.handle_payload)
+
+        self.key_sob = pmt.intern('tx_sob')
+        self.key_eob = pmt.intern('tx_eob')
+        self.key_frames = pmt.intern('frames')
+        self.key_bytes = pmt.intern('bytes')
+
+        # protocol_formatter_async emits header then payload for every frame;
+        # the two ports have separate queues, so pair them in FIFO order
+        self.headers = collections.deque()
+        self.payloads = collections.deque()
+
+        # Frames ready for the air: (bytes as uint8 array, time queued)
+        self.frames = collections.deque()
+
+        # Burst being written: current frame and offset into it, pad offset
+        # once the queue has run dry (-1 while frames are still being written)
+        self.in_burst = False
+        self.current = None
+        self.offset = 0
+        self.pad_offset = -1
+        self.burst_frames = 0
+        self.burst_bytes = 0
+        self.last_queued = 0.0
+
+        self.stats = {
+            'bursts': 0,
+            'frames': 0,
+            'frames_coalesced': 0,  # frames sent in an already open burst
+            'frames_dropped': 0,
+            'bytes': 0,
+            'pad_bytes': 0,
+            'idle_calls': 0,        # work() calls with nothing to send
+            'queue_delay_sum': 0.0, # frame queued -> first byte written
+            'queue_delay_max': 0.0,
+            'close_delay_sum': 0.0, # last frame queued -> tx_eob written
+            'close_delay_max': 0.0,
+        }
+
+    # -------------------------------------------------------------------------
+    # Message handlers
+    # -------------------------------------------------------------------------
+    def handle_header(self, msg):
+        data = pdu_to_bytes(msg)
+        if data is not None:
+            self.headers.append(data)
+            self.pair_frames()
+
+    def handle_payload(self, msg):
+        data = pdu_to_bytes(msg)
+        if data is not None:
+            self.payloads.append(data)
+            self.pair_frames()
+
+    def pair_frames(self):
+        """Queue header + payload as one frame"""
+        while self.headers and self.payloads:
+            frame = self.headers.popleft() + self.payloads.popleft()
+            if len(self.frames) >= self.max_queue:
+                self.stats['frames_dropped'] += 1
+                print(f"[Burst TX] Queue full, dropping {len(frame)}-byte frame")
+                continue
+            now = time.monotonic()
+            self.frames.append((np.frombuffer(frame, dtype=np.uint8), now))
+            self.last_queued = now
+
+    # -------------------------------------------------------------------------
+    # Stream output
+    # -------------------------------------------------------------------------
+    def next_frame(self, now):
+        """Move the next queued frame into the burst (False if there is none)"""
+        if not self.frames:
+            return False
+        self.current, queued = self.frames.popleft()
+        self.offset = 0
+        delay = now - queued
+        self.stats['queue_delay_sum'] += delay
+        self.stats['queue_delay_max'] = max(self.stats['queue_delay_max'], delay)
+        self.stats['frames'] += 1
+        if self.burst_frames:
+            self.stats['frames_coalesced'] += 1
+        self.burst_frames += 1
+        return True
+
+    def close_burst(self, now):
+        """Account for a finished burst and announce it"""
+        delay = now - self.last_queued
+        self.stats['close_delay_sum'] += delay
+        self.stats['close_delay_max'] = max(self.stats['close_delay_max'], delay)
+        info = pmt.make_dict()
+        info = pmt.dict_add(info, self.key_frames, pmt.from_long(self.burst_frames))
+        info = pmt.dict_add(info, self.key_bytes, pmt.from_long(self.burst_bytes))
+        self.message_port_pub(self.port_tx_done, info)
+        self.in_burst = False
+        self.burst_frames = 0
+        self.burst_bytes = 0
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        n_out = 0
+        now = time.monotonic()
+
+        if not self.in_burst:
+            if not self.next_frame(now):
+                self.stats['idle_calls'] += 1
+                return 0  # nothing to send: no samples until the next frame
+            self.in_burst = True
+            self.pad_offset = -1
+            self.stats['bursts'] += 1
+            self.add_item_tag(0, self.nitems_written(0), self.key_sob, pmt.PMT_T)
+
+        while n_out < len(out):
+            if self.pad_offset < 0:
+                # Frames: copy the current one, then continue with whatever was queued
+                if self.current is None and not self.next_frame(now):
+                    self.pad_offset = 0
+                    continue
+                n = min(len(self.current) - self.offset, len(out) - n_out)
+                out[n_out:n_out + n] = self.current[self.offset:self.offset + n]
+                n_out += n
+                self.offset += n
+                self.burst_bytes += n
+                self.stats['bytes'] += n
+                if self.offset == len(self.current):
+                    self.current = None
+            else:
+                # Queue ran dry: pad and end the burst on the last pad byte
+                n = min(len(self.pad) - self.pad_offset, len(out) - n_out)
+                out[n_out:n_out + n] = self.pad[self.pad_offset:self.pad_offset + n]
+                n_out += n
+                self.pad_offset += n
+                self.stats['pad_bytes'] += n
+                if self.pad_offset == len(self.pad):
+                    self.add_item_tag(0, self.nitems_written(0) + n_out - 1, self.key_eob, pmt.PMT_T)
+                    self.close_burst(now)
+                    break
+
+        return n_out
+
+    def stop(self):
+        s = self.stats
+        print("\n[Burst TX] Statistics:")
+        print(f"  Bursts:            {s['bursts']}")
+        print(f"  Frames:            {s['frames']} ({s['frames_coalesced']} coalesced, "
+              f"{s['frames_dropped']} dropped)")
+        print(f"  Bytes:             {s['bytes']} + {s['pad_bytes']} pad")
+        print(f"  Idle work calls:   {s['idle_calls']}")
+        if s['frames']:
+            print(f"  Queue delay:       {1000.0 * s['queue_delay_sum'] / s['frames']:.2f} ms avg, "
+                  f"{1000.0 * s['queue_delay_max']:.2f} ms max")
+        closed = s['bursts'] - (1 if self.in_burst else 0)
+        if closed:
+            print(f"  Burst close delay: {1000.0 * s['close_delay_sum'] / closed:.2f} ms avg, "
+                  f"{1000.0 * s['close_delay_max']:.2f} ms max")
+        return True
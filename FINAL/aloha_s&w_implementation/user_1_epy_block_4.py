@@ -0,0 +1,181 @@
+"""
+Embedded Python Block for GNU Radio - Energy gate
+Sits between the radio (or channel model) and symbol_sync, so the demod
+chain behind it only runs while something is on the air.
+
+Input power is averaged over blocks of 'block_len' samples (one reshape and
+mean per work() call). A block opens the gate when its power is
+'threshold_db' above the noise floor. The gate stays open for 'hang' more
+samples after the last loud block. When the gate opens, the last
+'pretrigger' samples before the trigger are sent first, so the start of the
+burst (the access code) is not lost.
+
+The noise floor is an exponential average of a low percentile of the quiet
+blocks' power, so the edges of bursts do not drag it up. If the gate has
+been open for longer than 'max_open' samples, the floor is pulled up to the
+current level as well (continuous interferer, or a floor estimate that
+started too low).
+
+The gate state is published on the 'busy' port (True when it opens, False
+when it closes) for the carrier sense of the link blocks (mac_mode='csma').
+"""
+
+import time
+
+import numpy as np
+from gnuradio import gr
+import pmt
+
+
+class blk(gr.basic_block):
+    """
+    Complex samples in, only the samples around bursts out.
+    """
+
+    NOISE_PERCENTILE = 25  # of the quiet blocks' power, per work call
+
+    def __init__(self, threshold_db=3.0, block_len=64, pretrigger=512, hang=1024,
+                 noise_alpha=0.05, max_open=200000):
+        """
+        Arguments:
+            threshold_db: Block power above the noise floor that opens the gate (dB)
+            block_len:    Samples per power estimate
+            pretrigger:   Samples before the trigger that are passed on (history)
+            hang:         Samples the gate stays open after the last loud block
+            noise_alpha:  Weight of a new noise floor estimate (0-1, per work call)
+            max_open:     Open samples after which the floor tracks the current level
+        """
+        gr.basic_block.__init__(
+            self,
+            name='Energy Gate',
+            in_sig=[np.complex64],
+            out_sig=[np.complex64]
+        )
+        # Sample counts change; tags from the source would land on the wrong samples
+        self.set_tag_propagation_policy(gr.TPP_DONT)
+
+        self.port_busy = pmt.intern('busy')
+        self.message_port_register_out(self.port_busy)
+
+        self.threshold = 10.0 ** (float(threshold_db) / 10.0)
+        self.block_len = max(int(block_len), 1)
+        self.pretrigger = int(pretrigger)
+        self.hang_blocks = -(-int(hang) // self.block_len)  # ceil
+        self.noise_alpha = float(noise_alpha)
+        self.max_open = int(max_open)
+
+        self.noise_floor = None  # mean power per sample, set from the first samples
+        self.history = np.zeros(0, dtype=np.complex64)  # last samples while closed
+        self.pending = np.zeros(0, dtype=np.complex64)  # output not yet written
+        self.since_loud = self.hang_blocks + 1          # blocks since the last loud one
+        self.open_run = 0                               # samples the gate has been open
+
+        self.stats = {
+            'samples_in': 0,
+            'samples_out': 0,
+            'bursts': 0,
+            'work_time': 0.0,  # seconds spent in general_work
+        }
+
+    def set_threshold_db(self, threshold_db):
+        self.threshold = 10.0 ** (float(threshold_db) / 10.0)
+
+    def gate(self, samples):
+        """Gated output for one chunk of input (pre-trigger history included)"""
+        if not len(samples):
+            return np.zeros(0, dtype=np.complex64)
+        was_open = self.open_run > 0
+        bursts_before = self.stats['bursts']
+        n_blocks = -(-len(samples) // self.block_len)
+        padded = np.zeros(n_blocks * self.block_len, dtype=np.complex64)
+        padded[:len(samples)] = samples
+        power = np.mean(np.abs(padded.reshape(n_blocks, self.block_len)) ** 2, axis=1)
+        if len(samples) % self.block_len:
+            power[-1] *= self.block_len / float(len(samples) % self.block_len)
+
+        if self.noise_floor is None:
+            self.noise_floor = max(float(np.median(power)), 1e-12)
+
+        # Blocks since the last loud one, carried over from the previous chunk
+        loud = power > self.noise_floor * self.threshold
+        index = np.arange(n_blocks)
+        last_loud = np.maximum.accumulate(np.where(loud, index, -self.since_loud - 1))
+        is_open = (index - last_loud) <= self.hang_blocks
+        self.since_loud = int(n_blocks - 1 - last_loud[-1])
+
+        quiet = power[~loud]
+        if len(quiet):
+            estimate = float(np.percentile(quiet, self.NOISE_PERCENTILE))
+            self.noise_floor += self.noise_alpha * (estimate - self.noise_floor)
+        if is_open.all():
+            self.open_run += len(samples)
+            if self.open_run > self.max_open:
+                self.noise_floor += self.noise_alpha * (float(np.median(power)) - self.noise_floor)
+        self.noise_floor = max(self.noise_floor, 1e-12)
+
+        # Sample ranges of the open stretches: [start, stop) per run of open blocks
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], is_open.astype(np.int8), [0]))))
+        segments = []
+        history = self.history  # samples before 'done' that were not passed on
+        done = 0
+        for start, stop in zip(edges[0::2] * self.block_len, edges[1::2] * self.block_len):
+            stop = min(stop, len(samples))
+            if start > 0 or not was_open:
+                # Gate opens: send the pre-trigger history first
+                self.stats['bursts'] += 1
+                pre = samples[max(start - self.pretrigger, done):start]
+                if len(pre) < self.pretrigger and done == 0:
+                    pre = np.concatenate((history[max(len(history) - self.pretrigger + len(pre), 0):], pre))
+                segments.append(pre)
+            segments.append(samples[start:stop])
+            done = stop
+            history = history[:0]
+
+        # Channel busy/idle for carrier sense: one message per transition
+        opened = self.stats['bursts'] > bursts_before
+        if opened and not was_open:
+            self.message_port_pub(self.port_busy, pmt.PMT_T)
+        if (opened or was_open) and not is_open[-1]:
+            self.message_port_pub(self.port_busy, pmt.PMT_F)
+
+        if is_open[-1]:
+            self.history = history[:0]
+            if not is_open.all():
+                self.open_run = len(samples) - int(edges[-2] * self.block_len)
+        else:
+            self.open_run = 0
+            self.history = np.concatenate((history, samples[done:]))[-self.pretrigger:]
+
+        if not segments:
+            return np.zeros(0, dtype=np.complex64)
+        return np.concatenate(segments)
+
+    def general_work(self, input_items, output_items):
+        t0 = time.perf_counter()
+        in0 = input_items[0]
+        out = output_items[0]
+
+        # Output left over from the last call goes first; no new input until it is out
+        if not len(self.pending):
+            self.pending = self.gate(in0)
+            self.consume(0, len(in0))
+            self.stats['samples_in'] += len(in0)
+
+        n = min(len(self.pending), len(out))
+        out[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        self.stats['samples_out'] += n
+        self.stats['work_time'] += time.perf_counter() - t0
+        return n
+
+    def stop(self):
+        s = self.stats
+        print("\n[Energy Gate] Statistics:")
+        print(f"  Bursts:            {s['bursts']}")
+        if s['samples_in']:
+            print(f"  Samples passed:    {s['samples_out']}/{s['samples_in']} "
+                  f"({100.0 * s['samples_out'] / s['samples_in']:.1f}% reach the demodulator)")
+            print(f"  Gate cost:         {1e9 * s['work_time'] / s['samples_in']:.1f} ns/sample")
+        if self.noise_floor is not None:
+            print(f"  Noise floor:       {10.0 * np.log10(self.noise_floor):.1f} dB")
+        return True
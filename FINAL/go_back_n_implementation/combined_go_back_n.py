@@ -30,6 +30,8 @@ import combined_go_back_n_epy_block_0_1 as epy_block_0_1  # embedded python bloc
 import combined_go_back_n_epy_block_0_1_0 as epy_block_0_1_0  # embedded python block
 import combined_go_back_n_epy_block_1_0_0_0 as epy_block_1_0_0_0  # embedded python block
 import combined_go_back_n_epy_block_1_0_0_1 as epy_block_1_0_0_1  # embedded python block
+import combined_go_back_n_epy_block_2 as epy_block_2  # embedded python block
+import combined_go_back_n_epy_block_2_0 as epy_block_2_0  # embedded python block
 import sip
 
 
@@ -463,10 +465,12 @@ class combined_go_back_n(gr.top_block, Qt.QWidget):
             self.controls_grid_layout_1.setRowStretch(r, 1)
         for c in range(1, 2):
             self.controls_grid_layout_1.setColumnStretch(c, 1)
-        self.epy_block_1_0_0_1 = epy_block_1_0_0_1.blk(node_id=2, aloha_prob=0.3, timeout=1.0, max_retries=3, window_size=4, aloha_backoff_min=0.1, aloha_backoff_max=0.5, sync_burst_len=1000)
-        self.epy_block_1_0_0_0 = epy_block_1_0_0_0.blk(node_id=1, aloha_prob=0.3, timeout=1.0, max_retries=3, window_size=4, aloha_backoff_min=0.1, aloha_backoff_max=0.5, sync_burst_len=1000)
+        self.epy_block_1_0_0_1 = epy_block_1_0_0_1.blk(node_id=2, aloha_prob=0.3, timeout=1.0, max_retries=3, window_size=4, aloha_backoff_min=0.1, aloha_backoff_max=0.5, sync_burst_len=1000, samp_rate=48000, sps=sps)
+        self.epy_block_1_0_0_0 = epy_block_1_0_0_0.blk(node_id=1, aloha_prob=0.3, timeout=1.0, max_retries=3, window_size=4, aloha_backoff_min=0.1, aloha_backoff_max=0.5, sync_burst_len=1000, samp_rate=48000, sps=sps)
         self.epy_block_0_1_0 = epy_block_0_1_0.messenger_gui(bg_image=r"C:\Users\Oshan\Desktop\message.jpg")
         self.epy_block_0_1 = epy_block_0_1.messenger_gui(bg_image=r"C:\Users\Oshan\Desktop\message.jpg")
+        self.epy_block_2_0 = epy_block_2_0.blk(threshold_db=3.0, block_len=64, pretrigger=512, hang=1024, noise_alpha=0.05, max_open=200000)
+        self.epy_block_2 = epy_block_2.blk(threshold_db=3.0, block_len=64, pretrigger=512, hang=1024, noise_alpha=0.05, max_open=200000)
         self.digital_symbol_sync_xx_0_0_0 = digital.symbol_sync_cc(
             digital.TED_SIGNAL_TIMES_SLOPE_ML,
             sps,
@@ -561,9 +565,13 @@ class combined_go_back_n(gr.top_block, Qt.QWidget):
         self.msg_connect((self.epy_block_1_0_0_0, 'pdu_out'), (self.digital_protocol_formatter_async_0, 'in'))
         self.msg_connect((self.epy_block_1_0_0_0, 'feedback'), (self.epy_block_0_1, 'feedback'))
         self.msg_connect((self.epy_block_1_0_0_0, 'msg_out'), (self.epy_block_0_1, 'in_msg'))
+        self.msg_connect((self.epy_block_1_0_0_0, 'queue_status'), (self.epy_block_0_1, 'queue_status'))
         self.msg_connect((self.epy_block_1_0_0_1, 'pdu_out'), (self.digital_protocol_formatter_async_0_0, 'in'))
         self.msg_connect((self.epy_block_1_0_0_1, 'msg_out'), (self.epy_block_0_1_0, 'in_msg'))
+        self.msg_connect((self.epy_block_1_0_0_1, 'queue_status'), (self.epy_block_0_1_0, 'queue_status'))
         self.msg_connect((self.epy_block_1_0_0_1, 'feedback'), (self.epy_block_0_1_0, 'feedback'))
+        self.msg_connect((self.epy_block_2, 'busy'), (self.epy_block_1_0_0_0, 'channel_busy'))
+        self.msg_connect((self.epy_block_2_0, 'busy'), (self.epy_block_1_0_0_1, 'channel_busy'))
         self.msg_connect((self.pdu_tagged_stream_to_pdu_0_0, 'pdus'), (self.epy_block_1_0_0_0, 'pdu_in'))
         self.msg_connect((self.pdu_tagged_stream_to_pdu_0_0_0, 'pdus'), (self.epy_block_1_0_0_1, 'pdu_in'))
         self.connect((self.blocks_repack_bits_bb_1_0, 0), (self.pdu_tagged_stream_to_pdu_0_0, 0))
@@ -574,10 +582,10 @@ class combined_go_back_n(gr.top_block, Qt.QWidget):
         self.connect((self.blocks_throttle2_0_0, 0), (self.channels_channel_model_0_0, 0))
         self.connect((self.blocks_unpack_k_bits_bb_0_0, 0), (self.digital_correlate_access_code_xx_ts_0_0, 0))
         self.connect((self.blocks_unpack_k_bits_bb_0_0_0, 0), (self.digital_correlate_access_code_xx_ts_0_0_0, 0))
-        self.connect((self.channels_channel_model_0, 0), (self.digital_symbol_sync_xx_0_0_0, 0))
+        self.connect((self.channels_channel_model_0, 0), (self.epy_block_2_0, 0))
         self.connect((self.channels_channel_model_0, 0), (self.qtgui_const_sink_x_0_0, 0))
         self.connect((self.channels_channel_model_0, 0), (self.qtgui_freq_sink_x_1_0_0, 0))
-        self.connect((self.channels_channel_model_0_0, 0), (self.digital_symbol_sync_xx_0_0, 0))
+        self.connect((self.channels_channel_model_0_0, 0), (self.epy_block_2, 0))
         self.connect((self.channels_channel_model_0_0, 0), (self.qtgui_const_sink_x_0, 0))
         self.connect((self.channels_channel_model_0_0, 0), (self.qtgui_freq_sink_x_1_0, 0))
         self.connect((self.digital_constellation_decoder_cb_0_0, 0), (self.digital_diff_decoder_bb_0_0, 0))
@@ -599,6 +607,8 @@ class combined_go_back_n(gr.top_block, Qt.QWidget):
         self.connect((self.digital_map_bb_0_0, 0), (self.blocks_unpack_k_bits_bb_0_0, 0))
         self.connect((self.digital_map_bb_0_0_0, 0), (self.blocks_unpack_k_bits_bb_0_0_0, 0))
         self.connect((self.digital_symbol_sync_xx_0_0, 0), (self.digital_linear_equalizer_0_0_0, 0))
+        self.connect((self.epy_block_2, 0), (self.digital_symbol_sync_xx_0_0, 0))
+        self.connect((self.epy_block_2_0, 0), (self.digital_symbol_sync_xx_0_0_0, 0))
         self.connect((self.digital_symbol_sync_xx_0_0_0, 0), (self.digital_linear_equalizer_0_0_0_0, 0))
         self.connect((self.pdu_pdu_to_tagged_stream_0, 0), (self.blocks_tagged_stream_mux_0, 0))
         self.connect((self.pdu_pdu_to_tagged_stream_0_0, 0), (self.blocks_tagged_stream_mux_0, 1))
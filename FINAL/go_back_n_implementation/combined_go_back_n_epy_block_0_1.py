@@ -5,7 +5,10 @@ from gnuradio import gr
 from PyQt5 import QtWidgets, QtCore, QtGui
 import sys
 import pmt
+import time
 from datetime import datetime
+from link_pdu import make_message, parse_message, parse_queue_status
+from link_priority import PRIO_EMERGENCY, PRIO_ROUTINE, PRIO_URGENT, SendGate
 
 class WallpaperScrollArea(QtWidgets.QScrollArea):
     def __init__(self, bg_image="", parent=None):
@@ -22,8 +25,8 @@ class WallpaperScrollArea(QtWidgets.QScrollArea):
 
 
 class _GuiPoster(QtCore.QObject):
-    """Helper QObject to post strings into the Qt thread safely."""
-    sig = QtCore.pyqtSignal(str)  # emits text payload
+    """Helper QObject to post incoming messages into the Qt thread safely."""
+    sig = QtCore.pyqtSignal(object)  # emits a parse_message() dict
 
     def __init__(self):
         super().__init__()
@@ -32,10 +35,14 @@ class _GuiPoster(QtCore.QObject):
 class messenger_gui(gr.basic_block):
     """
     WhatsApp-style Messenger GUI (GNU Radio embedded block).
-    - Outgoing messages: published on message port "out" with address prepended as "addr:body"
+    - Outgoing messages: published on message port "out" as message PDUs
+      ({'dst', 'msg_id', 'timestamp'} + UTF-8 body, see link_pdu)
     - Feedback port "feedback": updates delivery timestamp / failed status
-    - Incoming messages: received on port "in_msg" (same format "addr:body") and displayed
-      on the left in a different color.
+    - Port "queue_status": TX queue depth per destination (see link_pdu). Routine
+      messages to a congested destination are held back until it drains, and
+      refused once too many are held
+    - Incoming messages: message PDUs received on port "in_msg" (legacy "addr:body"
+      strings are still accepted) and displayed on the left in a different color.
     """
 
     def __init__(self, bg_image=""):
@@ -47,17 +54,25 @@ class messenger_gui(gr.basic_block):
         )
 
         # Message ports
-        self.message_port_register_out(pmt.intern("out"))    # outgoing messages
+        self.port_out = pmt.intern("out")
+        self.message_port_register_out(self.port_out)    # outgoing messages
         self.message_port_register_in(pmt.intern("feedback"))# delivery feedback
         self.message_port_register_in(pmt.intern("in_msg"))  # incoming messages from remote/devices
+        self.message_port_register_in(pmt.intern("queue_status"))  # TX queue depth per destination
 
         # Bind handlers
         self.set_msg_handler(pmt.intern("feedback"), self._process_feedback)
         self.set_msg_handler(pmt.intern("in_msg"), self._receive_message)
+        self.set_msg_handler(pmt.intern("queue_status"), self._process_queue_status)
 
         # Poster used to safely move messages to GUI thread
         self._poster = _GuiPoster()
         self._poster.sig.connect(self._display_incoming)  # connect to GUI-thread handler
+        self._status_poster = _GuiPoster()
+        self._status_poster.sig.connect(self._apply_queue_status)
+
+        # Backpressure from the link layer (held messages wait here)
+        self.send_gate = SendGate()
 
         # Qt Application
         self.app = QtWidgets.QApplication.instance()
@@ -85,8 +100,24 @@ class messenger_gui(gr.basic_block):
         self.addr_box.setFixedWidth(100)
         self.addr_box.setStyleSheet("font-size: 16px; padding: 4px;")
         addr_layout.addWidget(self.addr_box)
+
+        # Priority class sent in the message PDU (link layer: emergency jumps the queue)
+        prio_label = QtWidgets.QLabel("Priority:")
+        prio_label.setStyleSheet("font-size: 18px; font-weight: bold;")
+        addr_layout.addWidget(prio_label)
+        self.prio_box = QtWidgets.QComboBox()
+        self.prio_box.addItem("Routine", userData=PRIO_ROUTINE)
+        self.prio_box.addItem("Urgent", userData=PRIO_URGENT)
+        self.prio_box.addItem("Emergency", userData=PRIO_EMERGENCY)
+        self.prio_box.setFixedWidth(140)
+        self.prio_box.setStyleSheet("font-size: 16px; padding: 4px;")
+        addr_layout.addWidget(self.prio_box)
         addr_layout.addStretch()
 
+        # TX queue of the selected destination (queue_status port)
+        self.queue_label = QtWidgets.QLabel()
+        addr_layout.addWidget(self.queue_label)
+
         main_layout.addLayout(addr_layout)
 
         # Scroll area with background
@@ -137,14 +168,32 @@ class messenger_gui(gr.basic_block):
         # Connect GUI signals
         self.send_button.clicked.connect(self.send_message)
         self.input_box.returnPressed.connect(self.send_message)
+        self.addr_box.currentIndexChanged.connect(self.update_queue_label)
 
         # Track last sent message timestamp widget (simple approach)
         # If you want per-message tracking, change to a list/map of widgets per message id.
         self._last_message_timestamp = None
+        self._sent_counter = 0  # msg_id of outgoing messages
+        self.update_queue_label()
 
         # show window
         self.qt_widget.show()
 
+    def update_queue_label(self, index=None):
+        """Show the TX queue depth of the selected destination."""
+        dst = int(self.addr_box.currentText())
+        status = self.send_gate.status.get(dst)
+        held = len(self.send_gate.held[dst])
+        if status is None:
+            text, color = "Queue: -", "#4CAF50"
+        else:
+            text = f"Queue: {status['depth']}/{status['limit'] or '∞'}"
+            color = "#F44336" if status['full'] else "#FF9800" if status['congested'] or held else "#4CAF50"
+        if held:
+            text += f" (+{held} held)"
+        self.queue_label.setText(text)
+        self.queue_label.setStyleSheet(f"font-size: 16px; font-weight: bold; color: {color};")
+
     def send_message(self):
         """Called from GUI thread when user presses Send or Enter."""
         text = self.input_box.text().strip()
@@ -152,14 +201,25 @@ class messenger_gui(gr.basic_block):
             return
 
         addr = self.addr_box.currentText().strip()
-        full_msg = f"{addr}:{text}"
 
-        # Publish as PMT symbol/string on 'out' port
+        # Publish as a message PDU on 'out' port (routine messages wait while the
+        # destination's TX queue is congested)
         try:
-            self.message_port_pub(pmt.intern("out"), pmt.intern(full_msg))
-        except Exception:
-            # fallback to generic intern
-            self.message_port_pub(pmt.intern("out"), pmt.intern(full_msg))
+            msg = make_message(text, dst=int(addr), msg_id=self._sent_counter + 1, timestamp=time.time(),
+                               priority=self.prio_box.currentData())
+            held = {'msg': msg, 'timestamp': None}
+            verdict = self.send_gate.admit(int(addr), self.prio_box.currentData(), held)
+            if verdict == 'refuse':
+                print(f"[messenger_gui] TX queue to {addr} is full, message not sent")
+                self.queue_label.setText(f"Queue to {addr} full, try again")
+                QtCore.QTimer.singleShot(2000, self.update_queue_label)
+                return
+            self._sent_counter += 1
+            if verdict == 'send':
+                self.message_port_pub(self.port_out, msg)
+        except Exception as e:
+            print("[messenger_gui] failed to send message:", e)
+            return
 
         # Build outgoing bubble (right side)
         container = QtWidgets.QWidget()
@@ -234,6 +294,10 @@ class messenger_gui(gr.basic_block):
         # Clear input and store timestamp widget for feedback updates
         self.input_box.clear()
         self._last_message_timestamp = timestamp
+        if verdict == 'hold':
+            held['timestamp'] = timestamp
+            timestamp.setText("Held")
+            self.update_queue_label()
 
     def _process_feedback(self, msg_pmt):
         """
@@ -276,42 +340,56 @@ class messenger_gui(gr.basic_block):
                     }
                 """)
 
+    def _process_queue_status(self, msg_pmt):
+        """Handler for 'queue_status' port: posts the status to the GUI thread."""
+        status = parse_queue_status(msg_pmt)
+        if status is not None:
+            self._status_poster.sig.emit(status)
+
+    def _apply_queue_status(self, status):
+        """New TX queue status: send the held messages it makes room for."""
+        for held in self.send_gate.update(status['dst'], status):
+            try:
+                self.message_port_pub(self.port_out, held['msg'])
+            except Exception as e:
+                print("[messenger_gui] failed to send held message:", e)
+                continue
+            if held['timestamp'] is not None:
+                held['timestamp'].setText("Sending...")
+        self.update_queue_label()
+
     def _receive_message(self, msg_pmt):
         """
-        Handler for 'in_msg' port. Extracts string and posts it to GUI thread
+        Handler for 'in_msg' port. Decodes the message PDU and posts it to GUI thread
         via _poster.sig so _display_incoming runs in Qt thread.
         """
         try:
-            if pmt.is_symbol(msg_pmt) or pmt.is_string(msg_pmt):
-                s = pmt.symbol_to_string(msg_pmt)
-            else:
-                py = pmt.to_python(msg_pmt)
-                s = str(py)
+            message = parse_message(msg_pmt)
+            if message is None:
+                # Not a message PDU: show whatever text it holds
+                text = pmt.symbol_to_string(msg_pmt) if pmt.is_symbol(msg_pmt) else str(pmt.to_python(msg_pmt))
+                message = {'src': None, 'dst': None, 'body': text.encode('utf-8')}
         except Exception:
-            s = "<unreadable message>"
+            message = {'src': None, 'dst': None, 'body': b"<unreadable message>"}
 
         # Post to GUI-thread handler
         try:
-            self._poster.sig.emit(s)
+            self._poster.sig.emit(message)
         except Exception:
             # If signal emit fails for any reason, try direct call in case we're already in Qt thread
             try:
-                self._display_incoming(s)
+                self._display_incoming(message)
             except Exception:
-                print("[messenger_gui] failed to deliver incoming message to GUI:", s)
+                print("[messenger_gui] failed to deliver incoming message to GUI:", message)
 
-    def _display_incoming(self, full_msg):
+    def _display_incoming(self, message):
         """
-        Build incoming bubble (left aligned). full_msg expected in "addr:body" format.
+        Build incoming bubble (left aligned) from a parse_message() dict.
+        Legacy "addr:body" strings carry the sender address in 'dst'.
         """
-        # try to split "addr:body"
-        if ":" in full_msg:
-            addr, body = full_msg.split(":", 1)
-            display_text = f"{body}"
-            header_text = f"{addr}"
-        else:
-            display_text = full_msg
-            header_text = ""
+        display_text = message['body'].decode('utf-8', errors='replace')
+        addr = message['src'] if message['src'] is not None else message['dst']
+        header_text = f"Node {addr}" if addr is not None else ""
 
         container = QtWidgets.QWidget()
         vbox = QtWidgets.QVBoxLayout()
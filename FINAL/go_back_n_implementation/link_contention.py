@@ -0,0 +1,176 @@
+"""
+Online contention estimate for the p-persistent ALOHA backoff, shared by the
+link-layer embedded blocks (mac_mode 'aloha' and 'slotted').
+
+The transmit probability p and the backoff window (a factor on the ALOHA
+backoff step) follow what the node sees on the channel:
+
+- Good frames: frames heard from other stations (addressed to this node or
+  not) and this node's ACKed frames.
+- Lost frames: this node's frames that were not ACKed in time, and frames
+  that failed the CRC within 'burst_gap' seconds of another CRC error (a
+  CRC-error burst; a lone CRC error is left to the noise).
+
+Every good frame raises p by 'gain' * target_loss and every lost one lowers
+it by 'gain' * (1 - target_loss), both in proportion to p. p therefore
+settles where about 'target_loss' of the frames on the channel are lost:
+it drops as stations join and climbs back (up to aloha_prob) as they leave.
+All nodes see mostly the same frames, so they settle on about the same p.
+
+The window:
+
+- Its floor comes from the stations heard. The distinct sources heard
+  within 'horizon' seconds, plus this node, give n. The window does not go
+  below nT / step, with T the airtime of a DATA frame plus its ACK, so one
+  backoff step spans a frame from each of the other stations.
+- On top of the floor it follows binary exponential backoff with decay. It
+  doubles on every ACK timeout, up to window_max times the floor, and halves
+  on every ACKed frame.
+
+Without new evidence, p and the window relax back with a half-life of
+'horizon' seconds, so an old collision burst does not hold up the next
+message.
+"""
+
+import random
+import threading
+import time
+
+
+class ContentionEstimator:
+    """Adaptive ALOHA transmit probability + backoff window"""
+
+    def __init__(self, p_max=0.3, step=0.3, airtime=0.01, p_min=0.02, target_loss=0.4,
+                 gain=0.1, window_max=8.0, horizon=10.0, burst_gap=1.0, adaptive=True):
+        """
+        Arguments:
+            p_max:       Transmit probability on an uncontended channel (aloha_prob)
+            step:        Mean ALOHA backoff step (seconds)
+            airtime:     Airtime of a DATA frame + ACK (seconds) until set_airtime()
+            p_min:       Lowest transmit probability
+            target_loss: Share of lost frames on the channel that p settles at
+            gain:        Relative change of p per frame (0-1)
+            window_max:  Largest backoff window, as a multiple of the window floor
+            horizon:     Seconds a heard station counts as contending; also the
+                         half-life of the relaxation back to p_max and the floor
+            burst_gap:   Longest gap (seconds) between CRC errors of one burst
+            adaptive:    False keeps p = p_max and the window at 1 (static ALOHA)
+        """
+        self.p_max = min(max(float(p_max), 0.0), 1.0)
+        self.p_min = min(float(p_min), self.p_max)
+        self.step_mean = float(step)
+        self.airtime = float(airtime)
+        self.target_loss = min(max(float(target_loss), 0.01), 0.99)
+        self.gain = float(gain)
+        self.window_max = max(float(window_max), 1.0)
+        self.horizon = float(horizon)
+        self.burst_gap = float(burst_gap)
+        self.adaptive = bool(adaptive)
+
+        self.p = self.p_max
+        self.backoff = 1.0      # binary exponential backoff factor (1 .. window_max)
+        self.loss = 0.0         # smoothed share of lost frames (for the stats port)
+        self.heard_at = {}      # heard_at[src] = last time a frame from src was heard
+        self.last_update = time.monotonic()
+        self.last_crc = None    # time of the last CRC error
+        self.lock = threading.Lock()
+
+        self.stats = {
+            'collisions': 0,    # ACK timeouts
+            'successes': 0,     # ACKed frames
+            'crc_errors': 0,    # CRC errors in bursts
+        }
+
+    def stations(self, now):
+        """Contending stations: this node + sources heard within the horizon"""
+        return 1 + sum(1 for t in self.heard_at.values() if now - t < self.horizon)
+
+    def floor(self, now):
+        """Smallest window for the stations heard: nT / step, at least 1"""
+        return max(self.stations(now) * self.airtime / self.step_mean, 1.0)
+
+    def set_airtime(self, airtime):
+        """Airtime of the DATA frame about to be sent, plus its ACK (smoothed)"""
+        self.airtime += 0.125 * (float(airtime) - self.airtime)
+
+    def _relax(self, now):
+        """Decay p and the backoff factor back towards p_max / 1 (call with the lock held)"""
+        factor = 0.5 ** (max(now - self.last_update, 0.0) / self.horizon)
+        self.p = self.p_max - (self.p_max - self.p) * factor
+        self.backoff = 1.0 + (self.backoff - 1.0) * factor
+        self.last_update = now
+
+    def _evidence(self, lost, now):
+        """One good or lost frame on the channel (call with the lock held)"""
+        self.loss += 0.0625 * (float(lost) - self.loss)
+        if not self.adaptive:
+            return
+        self._relax(now)
+        if lost:
+            self.p = max(self.p * (1.0 - self.gain * (1.0 - self.target_loss)), self.p_min)
+        else:
+            self.p = min(self.p * (1.0 + self.gain * self.target_loss), self.p_max)
+
+    def heard(self, src, now=None):
+        """Frame from another station (for us or not)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.heard_at[src] = now
+            if len(self.heard_at) > 256:
+                for node in [n for n, t in self.heard_at.items() if now - t >= self.horizon]:
+                    del self.heard_at[node]
+            self._evidence(False, now)
+
+    def on_crc_error(self, now=None):
+        """Frame that failed the CRC: lost if it is part of a burst. True if counted"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            burst = self.last_crc is not None and now - self.last_crc < self.burst_gap
+            self.last_crc = now
+            if burst:
+                self.stats['crc_errors'] += 1
+                self._evidence(True, now)
+            return burst
+
+    def on_collision(self, now=None):
+        """Frame not ACKed in time: lost, and the window doubles"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.stats['collisions'] += 1
+            self._evidence(True, now)
+            if self.adaptive:
+                self.backoff = min(self.backoff * 2.0, self.window_max)
+
+    def on_success(self, now=None):
+        """Frame ACKed: good, and the window halves"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.stats['successes'] += 1
+            self._evidence(False, now)
+            if self.adaptive:
+                self.backoff = max(self.backoff * 0.5, 1.0)
+
+    def current(self, now=None):
+        """(p, window) to use for the next attempt"""
+        if not self.adaptive:
+            return self.p_max, 1.0
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self._relax(now)
+            return self.p, self.backoff * self.floor(now)
+
+    def transmit_now(self, now=None):
+        """One p-persistence trial: True to send, False to back off one step"""
+        return random.random() <= self.current(now)[0]
+
+    def step(self, low, high, now=None):
+        """One backoff step (seconds): uniform in [low, high], times the window"""
+        return random.uniform(low, high) * self.current(now)[1]
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        now = time.monotonic()
+        p, window = self.current(now)
+        with self.lock:
+            stations = self.stations(now)
+        return dict(self.stats, p=p, window=window, stations=stations, loss=self.loss)
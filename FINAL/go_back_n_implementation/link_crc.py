@@ -0,0 +1,43 @@
+"""
+CRC-16 CCITT (poly 0x1021, init 0xFFFF, no reflection, no final XOR)
+shared by the link-layer embedded blocks.
+
+Frames go through binascii.crc_hqx (C implementation of the same
+polynomial). The table-driven loop it replaced is kept as crc16_reference().
+"""
+
+import binascii
+
+CRC16_POLY = 0x1021
+CRC16_INIT = 0xFFFF
+
+
+def generate_crc_table(poly=CRC16_POLY):
+    """Generate CRC-16 CCITT lookup table"""
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ poly) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+CRC16_TABLE = generate_crc_table()
+
+
+def crc16(data, init=CRC16_INIT):
+    """Calculate CRC-16 CCITT of a bytes-like object"""
+    return binascii.crc_hqx(data, init)
+
+
+def crc16_reference(data, init=CRC16_INIT):
+    """Table-driven pure-Python CRC-16 CCITT (reference implementation)"""
+    crc = init
+    for byte in data:
+        crc = ((crc << 8) ^ CRC16_TABLE[((crc >> 8) ^ byte) & 0xFF]) & 0xFFFF
+    return crc
+
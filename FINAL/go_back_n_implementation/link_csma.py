@@ -0,0 +1,94 @@
+"""
+Carrier sense (listen-before-talk) state shared by the link-layer embedded
+blocks.
+
+The RX-side energy gate publishes True/False on its 'busy' port when the
+channel becomes busy/idle; the link block forwards those to set_busy().
+Frames wait until the channel is idle and then for a random number of
+backoff slots drawn from the contention window (ACKs only wait for idle).
+The window doubles on every detected collision (a frame that was not ACKed
+in time) up to cw_max and falls back to cw_min when a frame gets through
+(binary exponential backoff).
+"""
+
+import random
+import threading
+import time
+
+
+class CarrierSense:
+    """Channel busy flag + contention window (binary exponential backoff)"""
+
+    def __init__(self, slot=0.005, cw_min=4, cw_max=256, max_defer=2.0):
+        """
+        Arguments:
+            slot:      Backoff slot length (seconds), at least one detector hang time
+            cw_min:    Contention window (slots) after a successful frame
+            cw_max:    Largest contention window (slots)
+            max_defer: Longest wait for an idle channel (seconds); after that the
+                       channel is treated as idle so a stuck detector cannot
+                       silence the node
+        """
+        self.slot = float(slot)
+        self.cw_min = max(int(cw_min), 1)
+        self.cw_max = max(int(cw_max), self.cw_min)
+        self.max_defer = float(max_defer)
+
+        self.cw = self.cw_min
+        self.busy = False
+        self.busy_since = 0.0
+        self.idle = threading.Event()
+        self.idle.set()
+
+        self.stats = {
+            'busy_periods': 0,
+            'deferrals': 0,       # frames that found the channel busy
+            'collisions': 0,      # frames not ACKed in time
+            'forced': 0,          # frames sent after max_defer on a busy channel
+        }
+
+    def set_busy(self, busy):
+        """Channel state from the energy detector. True if it changed"""
+        busy = bool(busy)
+        if busy == self.busy:
+            return False
+        self.busy = busy
+        if busy:
+            self.busy_since = time.monotonic()
+            self.stats['busy_periods'] += 1
+            self.idle.clear()
+        else:
+            self.idle.set()
+        return True
+
+    def blocked(self, now=None):
+        """True while the channel is busy and max_defer has not run out"""
+        if not self.busy:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.busy_since < self.max_defer
+
+    def unblock_delay(self, now=None):
+        """Seconds until a busy channel is treated as idle (max_defer)"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.busy_since + self.max_defer - now)
+
+    def backoff(self):
+        """
+        Random backoff (seconds): one slot, so ACKs (which do not back off) win
+        the channel right after a frame, plus 0..cw-1 slots
+        """
+        return (1 + random.randrange(self.cw)) * self.slot
+
+    def on_collision(self):
+        """Frame not ACKed in time: double the contention window"""
+        self.stats['collisions'] += 1
+        self.cw = min(self.cw * 2, self.cw_max)
+
+    def on_success(self):
+        """Frame ACKed: back to the smallest contention window"""
+        self.cw = self.cw_min
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        return dict(self.stats, cw=self.cw, busy=int(self.busy))
@@ -0,0 +1,437 @@
+"""
+Optional forward error correction for the link-layer embedded blocks.
+
+A FEC frame replaces the plain [SYNC_WORD][header][payload][CRC16] frame by:
+    [FEC_SYNC_WORD][FEC header codeword][interleaved data codewords]
+
+- The FEC header is a short Reed-Solomon codeword carrying the length of the
+  protected data and the code parameters (nsym, depth) chosen by the sender,
+  so the receiver needs no per-sender configuration.
+- The protected data is the usual header + payload + CRC16. It is split into
+  'depth' (or more) Reed-Solomon codewords over GF(256), each with 'nsym'
+  parity bytes (corrects nsym // 2 byte errors per codeword), and the
+  codewords are block-interleaved so a burst of errors is spread over them:
+  a burst of up to blocks * (nsym // 2) bytes is always correctable.
+- The CRC16 is still checked after decoding, which catches miscorrections.
+
+Encoding, syndrome computation and the interleaver work on all codewords of
+a frame at once with NumPy (one table lookup and one XOR reduction each,
+both linear in the codeword bytes); the error locator/evaluator
+(Berlekamp-Massey, Chien search, Forney) only runs for codewords with
+non-zero syndromes.
+"""
+
+import struct
+import numpy as np
+from link_framing import FrameExtractor
+
+FEC_SYNC_WORD = bytes([0x93, 0x0B, 0x51, 0xDE])
+FEC_HEADER_DATA = 4   # data length (2), nsym (1), depth (1)
+FEC_HEADER_NSYM = 6   # header codeword corrects 3 byte errors
+RS_MAX_LEN = 255
+FEC_MAX_NSYM = 64     # limits accepted from a received FEC header
+FEC_MAX_DEPTH = 16
+
+# -----------------------------------------------------------------------------
+# GF(256) arithmetic (primitive polynomial x^8 + x^4 + x^3 + x^2 + 1, alpha = 2)
+# -----------------------------------------------------------------------------
+_GF_EXP = np.zeros(512, dtype=np.uint8)
+_GF_LOG = np.zeros(256, dtype=np.int32)
+_x = 1
+for _i in range(255):
+    _GF_EXP[_i] = _x
+    _GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+_GF_EXP[255:510] = _GF_EXP[:255]
+GF_EXP = _GF_EXP.tolist()
+GF_LOG = _GF_LOG.tolist()
+# Full product table: _GF_MUL[a, b] = a * b
+_GF_MUL = _GF_EXP[_GF_LOG[:, None] + _GF_LOG[None, :]]
+_GF_MUL[0, :] = 0
+_GF_MUL[:, 0] = 0
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_div(a, b):
+    if b == 0:
+        raise ZeroDivisionError("division by zero in GF(256)")
+    if a == 0:
+        return 0
+    return GF_EXP[(GF_LOG[a] + 255 - GF_LOG[b]) % 255]
+
+
+def gf_pow(a, power):
+    return GF_EXP[(GF_LOG[a] * power) % 255]
+
+
+def gf_inverse(a):
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+def gf_mul_np(a, b):
+    """Element-wise GF(256) product of two broadcastable uint8 arrays"""
+    return _GF_MUL[np.asarray(a, dtype=np.uint8), np.asarray(b, dtype=np.uint8)]
+
+
+def gf_poly_scale(p, x):
+    return [gf_mul(c, x) for c in p]
+
+
+def gf_poly_add(p, q):
+    r = [0] * max(len(p), len(q))
+    for i, c in enumerate(p):
+        r[i + len(r) - len(p)] = c
+    for i, c in enumerate(q):
+        r[i + len(r) - len(q)] ^= c
+    return r
+
+
+def gf_poly_mul(p, q):
+    r = [0] * (len(p) + len(q) - 1)
+    for j, qc in enumerate(q):
+        for i, pc in enumerate(p):
+            r[i + j] ^= gf_mul(pc, qc)
+    return r
+
+
+def gf_poly_eval(p, x):
+    y = p[0]
+    for c in p[1:]:
+        y = gf_mul(y, x) ^ c
+    return y
+
+
+def gf_poly_mod(dividend, divisor):
+    """Remainder of the division of two polynomials (highest degree first)"""
+    out = list(dividend)
+    for i in range(len(dividend) - len(divisor) + 1):
+        coef = out[i]
+        if coef != 0:
+            for j in range(1, len(divisor)):
+                if divisor[j] != 0:
+                    out[i + j] ^= gf_mul(divisor[j], coef)
+    return out[-(len(divisor) - 1):]
+
+
+# -----------------------------------------------------------------------------
+# Reed-Solomon codec (generator roots alpha^0 .. alpha^(nsym-1))
+# -----------------------------------------------------------------------------
+_GENERATORS = {}
+_PARITY = {}
+_SYNDROME_POWERS = {}
+
+
+def rs_generator_poly(nsym):
+    g = _GENERATORS.get(nsym)
+    if g is None:
+        g = [1]
+        for i in range(nsym):
+            g = gf_poly_mul(g, [1, gf_pow(2, i)])
+        _GENERATORS[nsym] = g
+    return g
+
+
+def rs_parity_matrix(nsym):
+    """
+    (RS_MAX_LEN - nsym, nsym) array: row j is x^(nsym + k_max - 1 - j) mod g(x),
+    the parity contributed by a 1 at message position j. A message of k bytes
+    uses the last k rows.
+    """
+    parity = _PARITY.get(nsym)
+    if parity is None:
+        g = rs_generator_poly(nsym)[1:]
+        parity = np.zeros((RS_MAX_LEN - nsym, nsym), dtype=np.uint8)
+        rem = list(g)  # x^nsym mod g (g is monic)
+        for j in range(parity.shape[0] - 1, -1, -1):
+            parity[j] = rem
+            # Next power: multiply by x and reduce
+            rem = [r ^ gf_mul(rem[0], c) for r, c in zip(rem[1:] + [0], g)]
+        _PARITY[nsym] = parity
+    return parity
+
+
+def rs_encode_batch(messages, nsym):
+    """
+    Systematic RS encoding of a (B, k) uint8 array, one message per row.
+    Returns the (B, k + nsym) codewords. Leading zero bytes are allowed and
+    encode a shortened codeword.
+    """
+    messages = np.asarray(messages, dtype=np.uint8)
+    k = messages.shape[1]
+    parity = rs_parity_matrix(nsym)[RS_MAX_LEN - nsym - k:]
+    rem = np.bitwise_xor.reduce(_GF_MUL[messages[:, :, None], parity[None, :, :]], axis=1)
+    return np.concatenate([messages, rem.reshape(messages.shape[0], nsym)], axis=1)
+
+
+def rs_syndromes_batch(codewords, nsym):
+    """Syndromes of a (B, n) uint8 array of codewords, as a (B, nsym) array."""
+    codewords = np.asarray(codewords, dtype=np.uint8)
+    powers = _SYNDROME_POWERS.get(nsym)
+    if powers is None:
+        # powers[m, i] = (alpha^i)^m, for the byte m positions from the end
+        m = np.arange(RS_MAX_LEN)[:, None]
+        powers = _GF_EXP[(m * np.arange(nsym)[None, :]) % 255]
+        _SYNDROME_POWERS[nsym] = powers
+    n = codewords.shape[1]
+    synd = np.bitwise_xor.reduce(_GF_MUL[codewords[:, :, None], powers[n - 1::-1][None, :, :]], axis=1)
+    return synd.reshape(codewords.shape[0], nsym)
+
+
+def _error_locator(synd, nsym):
+    """Berlekamp-Massey; 'synd' is prefixed with one zero"""
+    err_loc = [1]
+    old_loc = [1]
+    shift = len(synd) - nsym
+    for i in range(nsym):
+        k = i + shift
+        delta = synd[k]
+        for j in range(1, len(err_loc)):
+            delta ^= gf_mul(err_loc[-(j + 1)], synd[k - j])
+        old_loc = old_loc + [0]
+        if delta != 0:
+            if len(old_loc) > len(err_loc):
+                new_loc = gf_poly_scale(old_loc, delta)
+                old_loc = gf_poly_scale(err_loc, gf_inverse(delta))
+                err_loc = new_loc
+            err_loc = gf_poly_add(err_loc, gf_poly_scale(old_loc, delta))
+    while err_loc and err_loc[0] == 0:
+        del err_loc[0]
+    if (len(err_loc) - 1) * 2 > nsym:
+        return None
+    return err_loc
+
+
+def _error_positions(err_loc, n):
+    """Chien search; 'err_loc' lowest degree first"""
+    errs = len(err_loc) - 1
+    positions = [n - 1 - i for i in range(n) if gf_poly_eval(err_loc, gf_pow(2, i)) == 0]
+    if len(positions) != errs:
+        return None
+    return positions
+
+
+def _correct_errata(codeword, synd, positions):
+    """Forney algorithm: error magnitudes at the given positions"""
+    n = len(codeword)
+    coef_pos = [n - 1 - p for p in positions]
+    errata_loc = [1]
+    for i in coef_pos:
+        errata_loc = gf_poly_mul(errata_loc, gf_poly_add([1], [gf_pow(2, i), 0]))
+
+    nerr = len(errata_loc) - 1
+    err_eval = gf_poly_mod(gf_poly_mul(synd[::-1], errata_loc), [1] + [0] * (nerr + 1))[::-1]
+
+    X = [gf_pow(2, i) for i in coef_pos]
+    for i, Xi in enumerate(X):
+        Xi_inv = gf_inverse(Xi)
+        loc_prime = 1
+        for j, Xj in enumerate(X):
+            if j != i:
+                loc_prime = gf_mul(loc_prime, 1 ^ gf_mul(Xi_inv, Xj))
+        if loc_prime == 0:
+            return False
+        y = gf_mul(Xi, gf_poly_eval(err_eval[::-1], Xi_inv))
+        codeword[positions[i]] ^= gf_div(y, loc_prime)
+    return True
+
+
+def rs_correct(codeword, synd, nsym):
+    """
+    Correct one codeword in place (list of ints) given its non-zero syndromes.
+    Returns the number of corrected bytes, or -1 if it is not correctable.
+    """
+    synd = [0] + [int(s) for s in synd]
+    err_loc = _error_locator(synd, nsym)
+    if err_loc is None:
+        return -1
+    positions = _error_positions(err_loc[::-1], len(codeword))
+    if positions is None:
+        return -1
+    if not _correct_errata(codeword, synd, positions):
+        return -1
+    return len(positions)
+
+
+def rs_decode_batch(codewords, nsym):
+    """
+    Decode a (B, n) uint8 array of codewords.
+    Returns (data, corrected) where data is the (B, n - nsym) array of
+    corrected messages and corrected the number of fixed bytes per row
+    (-1 for rows that could not be corrected).
+    """
+    codewords = np.array(codewords, dtype=np.uint8)
+    synd = rs_syndromes_batch(codewords, nsym)
+    corrected = np.zeros(codewords.shape[0], dtype=np.int64)
+    for row in np.nonzero(synd.any(axis=1))[0]:
+        fixed = codewords[row].tolist()
+        count = rs_correct(fixed, synd[row], nsym)
+        if count >= 0 and not rs_syndromes_batch(np.array([fixed], dtype=np.uint8), nsym).any():
+            codewords[row] = fixed
+            corrected[row] = count
+        else:
+            corrected[row] = -1
+    return codewords[:, :codewords.shape[1] - nsym], corrected
+
+
+# -----------------------------------------------------------------------------
+# Frame level: block split + interleaver
+# -----------------------------------------------------------------------------
+def _block_layout(data_len, nsym, depth):
+    """Number of codewords and per-codeword data lengths for 'data_len' bytes"""
+    k_max = RS_MAX_LEN - nsym
+    blocks = max(1, min(data_len, max(int(depth), -(-data_len // k_max))))
+    base, extra = divmod(data_len, blocks)
+    # Longer blocks first; every row is left-padded to the longest one
+    return [base + 1 if b < extra else base for b in range(blocks)]
+
+
+def _layout_mask(sizes, nsym):
+    width = max(sizes) + nsym
+    mask = np.zeros((len(sizes), width), dtype=bool)
+    for b, size in enumerate(sizes):
+        mask[b, width - size - nsym:] = True
+    return mask
+
+
+def _interleave_order(sizes, nsym):
+    """
+    Flat codeword-matrix indices in on-air order: byte k of every codeword,
+    then byte k + 1, ... Codewords are counted from their first byte (not
+    right-aligned like in the matrix), so the codewords take strict turns
+    and a burst of n bytes puts at most ceil(n / blocks) errors in each.
+    """
+    width = max(sizes) + nsym
+    lengths = [size + nsym for size in sizes]
+    order = np.full((len(sizes), max(lengths)), -1, dtype=np.int64)
+    for b, n in enumerate(lengths):
+        order[b, :n] = b * width + width - n + np.arange(n)
+    order = order.T.ravel()
+    return order[order >= 0]
+
+
+def fec_encode(data, nsym=16, depth=2):
+    """FEC header codeword + interleaved data codewords for the bytes 'data'"""
+    if nsym < 2 or nsym % 2 or nsym > FEC_MAX_NSYM or not 1 <= depth <= FEC_MAX_DEPTH:
+        raise ValueError(f"unsupported FEC parameters nsym={nsym} depth={depth}")
+    header = rs_encode_batch(
+        np.frombuffer(struct.pack('>HBB', len(data), nsym, depth), dtype=np.uint8)[None, :],
+        FEC_HEADER_NSYM
+    )[0]
+
+    sizes = _block_layout(len(data), nsym, depth)
+    mask = _layout_mask(sizes, nsym)
+    rows = np.zeros((len(sizes), mask.shape[1] - nsym), dtype=np.uint8)
+    rows[mask[:, :-nsym]] = np.frombuffer(bytes(data), dtype=np.uint8)
+    codewords = rs_encode_batch(rows, nsym)
+
+    # Interleave: the codewords take turns, one byte each
+    return header.tobytes() + codewords.ravel()[_interleave_order(sizes, nsym)].tobytes()
+
+
+def fec_header_size():
+    return FEC_HEADER_DATA + FEC_HEADER_NSYM
+
+
+def fec_decode_header(raw):
+    """Decode the FEC header; returns (data_len, nsym, depth, corrected) or None."""
+    data, corrected = rs_decode_batch(np.frombuffer(bytes(raw), dtype=np.uint8)[None, :], FEC_HEADER_NSYM)
+    if corrected[0] < 0:
+        return None
+    data_len, nsym, depth = struct.unpack('>HBB', data[0].tobytes())
+    if nsym < 2 or nsym % 2 or nsym > FEC_MAX_NSYM or not 1 <= depth <= FEC_MAX_DEPTH:
+        return None
+    return data_len, nsym, depth, int(corrected[0])
+
+
+def fec_coded_size(data_len, nsym, depth):
+    """Bytes of interleaved codewords following the FEC header"""
+    return data_len + len(_block_layout(data_len, nsym, depth)) * nsym
+
+
+def fec_decode(coded, data_len, nsym, depth):
+    """Deinterleave and decode; returns (data, corrected) or (None, -1)."""
+    sizes = _block_layout(data_len, nsym, depth)
+    mask = _layout_mask(sizes, nsym)
+    codewords = np.zeros(mask.shape, dtype=np.uint8)
+    codewords.ravel()[_interleave_order(sizes, nsym)] = np.frombuffer(bytes(coded), dtype=np.uint8)
+    data, corrected = rs_decode_batch(codewords, nsym)
+    if (corrected < 0).any():
+        return None, -1
+    return data[mask[:, :-nsym]].tobytes(), int(corrected.sum())
+
+
+class FecFrameExtractor(FrameExtractor):
+    """
+    FrameExtractor for FEC frames. Returns the same frame dicts as the plain
+    extractor; FEC statistics are added to 'stats'.
+    """
+
+    def __init__(self, crc_func, max_payload=255, valid_types=None, capacity=8192, sync_word=FEC_SYNC_WORD):
+        # Room for two of the largest FEC frames a sender may announce
+        max_data = self.HEADER_SIZE + int(max_payload) + self.CRC_SIZE
+        largest = len(sync_word) + fec_header_size() + fec_coded_size(max_data, FEC_MAX_NSYM, FEC_MAX_DEPTH)
+        super().__init__(sync_word, crc_func, max_payload=max_payload, valid_types=valid_types,
+                         capacity=max(int(capacity), 2 * largest))
+        self.stats.update({
+            'fec_frames': 0,
+            'fec_corrected_frames': 0,
+            'fec_corrected_bytes': 0,
+            'fec_failures': 0,
+        })
+
+    def _try_frame(self, start):
+        view = self._view
+        hdr_size = fec_header_size()
+        if self._tail - start < hdr_size:
+            return None
+
+        header = fec_decode_header(view[start:start + hdr_size])
+        if header is None:
+            self.stats['bad_headers'] += 1
+            return False
+        data_len, nsym, depth, corrected = header
+        if data_len < self.HEADER_SIZE + self.CRC_SIZE or data_len > self.HEADER_SIZE + self.max_payload + self.CRC_SIZE:
+            self.stats['bad_headers'] += 1
+            return False
+
+        end = start + hdr_size + fec_coded_size(data_len, nsym, depth)
+        if end > self._tail:
+            return None
+
+        data, fixed = fec_decode(view[start + hdr_size:end], data_len, nsym, depth)
+        if data is None:
+            self.stats['fec_failures'] += 1
+            return False
+        corrected += fixed
+
+        payload_end = data_len - self.CRC_SIZE
+        pkt_type = data[3]
+        if data[4] != payload_end - self.HEADER_SIZE or \
+                (self.valid_types is not None and pkt_type not in self.valid_types):
+            self.stats['bad_headers'] += 1
+            return False
+        rx_crc = struct.unpack_from('>H', data, payload_end)[0]
+        if rx_crc != self.crc_func(data[:payload_end]):
+            self.stats['crc_errors'] += 1
+            return False
+
+        self.stats['fec_frames'] += 1
+        if corrected:
+            self.stats['fec_corrected_frames'] += 1
+            self.stats['fec_corrected_bytes'] += corrected
+
+        frame = {
+            'src': data[0],
+            'dst': data[1],
+            'seq': data[2],
+            'type': pkt_type,
+            'payload': data[self.HEADER_SIZE:payload_end],
+        }
+        return frame, end
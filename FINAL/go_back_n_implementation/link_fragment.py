@@ -0,0 +1,132 @@
+"""
+Fragmentation / reassembly of long messages shared by the link-layer
+embedded blocks.
+
+A message longer than one frame payload is sent as PKT_FRAG frames whose
+payload is:
+    [msg_id(1)][index(1)][count(1)][fragment bytes ...]
+
+The receiver keeps one reassembly buffer per (sender, msg_id). Buffers
+are dropped when no fragment arrived for 'timeout' seconds, and the
+oldest ones are evicted when the buffered bytes or the number of
+messages in progress exceed their caps.
+"""
+
+import collections
+import time
+
+FRAG_HEADER_SIZE = 3
+MAX_FRAGMENTS = 255
+
+
+def max_message_size(max_payload):
+    """Longest message that can be sent as fragments"""
+    return MAX_FRAGMENTS * (max_payload - FRAG_HEADER_SIZE)
+
+
+def fragment_message(data, msg_id, max_payload):
+    """Split 'data' into PKT_FRAG payloads (raises ValueError if it is too long)"""
+    chunk = max_payload - FRAG_HEADER_SIZE
+    count = max(1, -(-len(data) // chunk))
+    if count > MAX_FRAGMENTS:
+        raise ValueError(f"message of {len(data)} bytes exceeds {max_message_size(max_payload)} bytes")
+    return [
+        bytes([msg_id & 0xFF, index, count]) + data[index * chunk:(index + 1) * chunk]
+        for index in range(count)
+    ]
+
+
+class Reassembler:
+    """Streaming reassembly buffers keyed by (sender, msg_id)"""
+
+    def __init__(self, timeout=30.0, max_bytes=64 * 1024, max_messages=16):
+        """
+        Arguments:
+            timeout:      Seconds without a new fragment before a buffer is dropped
+            max_bytes:    Cap on the fragment bytes buffered over all messages
+            max_messages: Cap on the number of messages being reassembled
+        """
+        self.timeout = float(timeout)
+        self.max_bytes = int(max_bytes)
+        self.max_messages = int(max_messages)
+
+        # _pending[(sender, msg_id)] = {'count', 'parts': {index: bytes}, 'size', 'last'}
+        # ordered from least to most recently updated
+        self._pending = collections.OrderedDict()
+        self._size = 0
+
+        self.stats = {
+            'completed': 0,
+            'timeouts': 0,
+            'evicted': 0,
+            'bad_fragments': 0,
+        }
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, sender, payload, now=None):
+        """Store one fragment; returns the whole message once complete, else None."""
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+
+        if len(payload) < FRAG_HEADER_SIZE:
+            self.stats['bad_fragments'] += 1
+            return None
+        msg_id, index, count = payload[0], payload[1], payload[2]
+        if count == 0 or index >= count:
+            self.stats['bad_fragments'] += 1
+            return None
+        data = bytes(payload[FRAG_HEADER_SIZE:])
+
+        key = (sender, msg_id)
+        buf = self._pending.get(key)
+        if buf is not None and buf['count'] != count:
+            # msg_id reused for a different message: start over
+            self._drop(key)
+            buf = None
+        if buf is None:
+            buf = {'count': count, 'parts': {}, 'size': 0, 'last': now}
+            self._pending[key] = buf
+
+        if index not in buf['parts']:
+            buf['parts'][index] = data
+            buf['size'] += len(data)
+            self._size += len(data)
+        buf['last'] = now
+        self._pending.move_to_end(key)
+
+        if len(buf['parts']) == count:
+            self._drop(key)
+            self.stats['completed'] += 1
+            return b''.join(buf['parts'][i] for i in range(count))
+
+        self._enforce_caps(key)
+        return None
+
+    def expire(self, now=None):
+        """Drop buffers that have not received a fragment within the timeout."""
+        now = time.monotonic() if now is None else now
+        while self._pending:
+            key, buf = next(iter(self._pending.items()))
+            if now - buf['last'] < self.timeout:
+                break
+            self._drop(key)
+            self.stats['timeouts'] += 1
+
+    def _enforce_caps(self, keep):
+        """Evict the least recently updated buffers (other than 'keep') over the caps."""
+        while len(self._pending) > 1 and (self._size > self.max_bytes or len(self._pending) > self.max_messages):
+            key = next(iter(self._pending))
+            if key == keep:
+                break
+            self._drop(key)
+            self.stats['evicted'] += 1
+        if self._size > self.max_bytes:
+            # A single message larger than the cap cannot be reassembled
+            self._drop(keep)
+            self.stats['evicted'] += 1
+
+    def _drop(self, key):
+        buf = self._pending.pop(key)
+        self._size -= buf['size']
@@ -0,0 +1,208 @@
+"""
+Structured message PDUs exchanged between the messenger GUI and the link blocks.
+
+A message is a PDU (pair) of:
+    meta: dict {'dst': int, 'src': int, 'msg_id': int, 'timestamp': float,
+                'priority': int, 'ttl': float}
+          (keys are left out when unknown, e.g. the GUI does not know 'src';
+          'priority' is a link_priority class, 'ttl' the seconds the message
+          may wait in the TX queue)
+    body: u8vector with the UTF-8 message text
+
+Only the fixed key symbols are interned. Message bodies never become PMT
+symbols, so the global symbol table does not grow with every new text.
+
+The link blocks report the depth of their TX queue per destination on a
+'queue_status' port (see link_priority for the bound and the watermarks):
+    dict {'dst': int, 'depth': int, 'limit': int, 'high': int, 'low': int,
+          'dropped': int, 'refused': int, 'congested': bool, 'full': bool}
+
+The old "addr:body" symbol format is still accepted by parse_message() as a
+compatibility shim for flowgraphs that have not been updated.
+
+The byte conversions below are shared by the link blocks for their PHY PDUs
+as well. They hand PMT a buffer (bytes/memoryview/NumPy) to iterate instead of
+building a Python list of ints first; the PMT bindings still copy into their
+own std::vector, so a copy per direction remains.
+"""
+
+import numpy as np
+import pmt
+
+KEY_DST = pmt.intern('dst')
+KEY_SRC = pmt.intern('src')
+KEY_MSG_ID = pmt.intern('msg_id')
+KEY_TIMESTAMP = pmt.intern('timestamp')
+KEY_PRIORITY = pmt.intern('priority')
+KEY_TTL = pmt.intern('ttl')
+QUEUE_COUNTS = ('depth', 'limit', 'high', 'low', 'dropped', 'refused')
+QUEUE_FLAGS = ('congested', 'full')
+QUEUE_KEYS = {name: pmt.intern(name) for name in QUEUE_COUNTS + QUEUE_FLAGS}
+
+
+# -----------------------------------------------------------------------------
+# Byte codec: PMT u8vector <-> bytes / memoryview / NumPy
+# -----------------------------------------------------------------------------
+def bytes_to_u8vector(data):
+    """bytes, bytearray, memoryview or uint8 NumPy array -> PMT u8vector"""
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data, dtype=np.uint8)
+    # A memoryview iterates as ints, so no intermediate list is built
+    view = memoryview(data).cast('B')
+    return pmt.init_u8vector(len(view), view)
+
+
+def u8vector_to_bytes(vec):
+    """PMT u8vector -> bytes"""
+    return bytes(pmt.u8vector_elements(vec))
+
+
+def u8vector_to_numpy(vec):
+    """PMT u8vector -> uint8 NumPy array"""
+    return np.frombuffer(u8vector_to_bytes(vec), dtype=np.uint8)
+
+
+def uniform_vector_to_bytes(vec):
+    """Any PMT uniform vector -> bytes, keeping the low 8 bits of each element"""
+    if pmt.is_u8vector(vec):
+        return u8vector_to_bytes(vec)
+    elements = np.asarray(pmt.to_python(vec))
+    return (elements.astype(np.int64) & 0xFF).astype(np.uint8).tobytes()
+
+
+def bytes_to_pdu(data, meta=None):
+    """bytes-like -> PDU (meta, u8vector); meta defaults to PMT_NIL"""
+    return pmt.cons(pmt.PMT_NIL if meta is None else meta, bytes_to_u8vector(data))
+
+
+def pdu_to_bytes(pdu):
+    """PDU (meta, uniform vector) -> bytes, or None if 'pdu' is not a byte PDU"""
+    if not pmt.is_pair(pdu):
+        return None
+    data = pmt.cdr(pdu)
+    if not pmt.is_uniform_vector(data):
+        return None
+    return uniform_vector_to_bytes(data)
+
+
+# -----------------------------------------------------------------------------
+# Message schema
+# -----------------------------------------------------------------------------
+
+
+def make_message(body, dst=None, src=None, msg_id=None, timestamp=None, priority=None, ttl=None):
+    """Build a message PDU; 'body' is str or bytes-like"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    meta = pmt.make_dict()
+    if dst is not None:
+        meta = pmt.dict_add(meta, KEY_DST, pmt.from_long(int(dst)))
+    if src is not None:
+        meta = pmt.dict_add(meta, KEY_SRC, pmt.from_long(int(src)))
+    if msg_id is not None:
+        meta = pmt.dict_add(meta, KEY_MSG_ID, pmt.from_long(int(msg_id)))
+    if timestamp is not None:
+        meta = pmt.dict_add(meta, KEY_TIMESTAMP, pmt.from_double(float(timestamp)))
+    if priority is not None:
+        meta = pmt.dict_add(meta, KEY_PRIORITY, pmt.from_long(int(priority)))
+    if ttl is not None:
+        meta = pmt.dict_add(meta, KEY_TTL, pmt.from_double(float(ttl)))
+    return pmt.cons(meta, bytes_to_u8vector(body))
+
+
+def _meta_long(meta, key):
+    value = pmt.dict_ref(meta, key, pmt.PMT_NIL)
+    if pmt.is_null(value) or not pmt.is_integer(value):
+        return None
+    return pmt.to_long(value)
+
+
+def _meta_double(meta, key):
+    value = pmt.dict_ref(meta, key, pmt.PMT_NIL)
+    if pmt.is_null(value) or not pmt.is_number(value):
+        return None
+    return pmt.to_double(value)
+
+
+def parse_message(msg):
+    """
+    Decode a message PDU into a dict with 'dst', 'src', 'msg_id', 'timestamp',
+    'priority', 'ttl' (None when absent) and 'body' (bytes). Returns None if 'msg' is not a message.
+
+    Also accepts the legacy formats: an "addr:body" symbol, where addr is
+    returned as 'dst', and a dict with 'dst' and 'data' entries.
+    """
+    message = {'dst': None, 'src': None, 'msg_id': None, 'timestamp': None,
+               'priority': None, 'ttl': None, 'body': b''}
+
+    # A legacy dict is a pair too (an association list): only a pair whose
+    # cdr is the body is a message PDU, anything else falls through to the shims
+    if pmt.is_pair(msg) and (pmt.is_u8vector(pmt.cdr(msg)) or pmt.is_symbol(pmt.cdr(msg))):
+        meta = pmt.car(msg)
+        body = pmt.cdr(msg)
+        if not pmt.is_dict(meta):
+            return None
+        if pmt.is_u8vector(body):
+            message['body'] = u8vector_to_bytes(body)
+        else:
+            message['body'] = pmt.symbol_to_string(body).encode('utf-8')
+        message['dst'] = _meta_long(meta, KEY_DST)
+        message['src'] = _meta_long(meta, KEY_SRC)
+        message['msg_id'] = _meta_long(meta, KEY_MSG_ID)
+        message['timestamp'] = _meta_double(meta, KEY_TIMESTAMP)
+        message['priority'] = _meta_long(meta, KEY_PRIORITY)
+        message['ttl'] = _meta_double(meta, KEY_TTL)
+        return message
+
+    # Compatibility shim: "addr:body" symbol
+    if pmt.is_symbol(msg):
+        text = pmt.symbol_to_string(msg)
+        if ':' not in text:
+            return None
+        addr, body = text.split(':', 1)
+        try:
+            message['dst'] = int(addr)
+        except ValueError:
+            return None
+        message['body'] = body.encode('utf-8')
+        return message
+
+    # Compatibility shim: dict with 'dst' and 'data'
+    if pmt.is_dict(msg):
+        meta = pmt.to_python(msg)
+        if 'dst' not in meta or 'data' not in meta:
+            return None
+        data = meta['data']
+        message['dst'] = int(meta['dst'])
+        message['body'] = data.encode('utf-8') if isinstance(data, str) else bytes(data)
+        return message
+
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Queue status (link block -> GUI)
+# -----------------------------------------------------------------------------
+def make_queue_status(dst, status):
+    """queue_status dict for 'dst' from a PriorityTxQueue status"""
+    meta = pmt.dict_add(pmt.make_dict(), KEY_DST, pmt.from_long(int(dst)))
+    for name in QUEUE_COUNTS:
+        meta = pmt.dict_add(meta, QUEUE_KEYS[name], pmt.from_long(int(status[name])))
+    for name in QUEUE_FLAGS:
+        meta = pmt.dict_add(meta, QUEUE_KEYS[name], pmt.from_bool(bool(status[name])))
+    return meta
+
+
+def parse_queue_status(msg):
+    """Decode a queue_status dict (Python dict with the keys above), None if it is not one"""
+    if not pmt.is_dict(msg):
+        return None
+    status = {'dst': _meta_long(msg, KEY_DST)}
+    if status['dst'] is None:
+        return None
+    for name in QUEUE_COUNTS:
+        status[name] = _meta_long(msg, QUEUE_KEYS[name]) or 0
+    for name in QUEUE_FLAGS:
+        value = pmt.dict_ref(msg, QUEUE_KEYS[name], pmt.PMT_F)
+        status[name] = pmt.is_bool(value) and pmt.to_bool(value)
+    return status
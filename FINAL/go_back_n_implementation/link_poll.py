@@ -0,0 +1,262 @@
+"""
+Reservation (polling) MAC on top of the link_slots beacon grid, shared by
+the link-layer embedded blocks (mac_mode='polled').
+
+The base station keeps the roster of stations it has heard. Each beacon
+starts a superframe of 'beacon_slots' slots:
+
+    [beacon] [request minislots ...] [granted slot] [granted slot] ...
+
+The beacon payload (link_slots) is followed by the grant trailer:
+
+    [request minislots (u8)][minislot length in 10 us units (u16)][poll cycle (u8)]
+    [node id per granted slot]
+
+Right after the beacon come 'n' short request minislots. They are rounded
+up to whole slots. A station with frames that have no grant asks for slots
+with a PKT_POLL_REQ (payload: number of frames waiting, u8) to the base
+station:
+
+- If the beacon granted it a slot, the request goes in that slot, ahead of
+  the DATA. This costs no contention.
+- Otherwise it goes in a random minislot. Only these requests contend. A
+  station whose request got no grant waits a random number of superframes
+  before it asks again (binary exponential backoff). A station that had a
+  grant within the last 'poll cycle' superframes is on the roster and
+  waits for its next poll instead.
+
+A station that has never been granted a slot joins the roster the same
+way, with a request for 0 frames, as soon as it hears a beacon.
+
+In each beacon the base station grants the slots of the new superframe.
+Stations with outstanding demand come first, round robin, one slot per
+station per round. Slots left over go to the stations on the roster as
+polls, also round robin (several rounds if there are slots enough). A
+station can use a poll slot for a frame that has just arrived without
+asking first. The poll cycle in the beacon is the number of superframes
+it takes to poll every station on the roster (0: no polls).
+
+A granted slot holds the request, one DATA frame and the immediate ACK,
+like a slotted-ALOHA slot plus the request.
+"""
+
+import collections
+import math
+import random
+import struct
+
+from link_slots import BEACON_SIZE, BEACON_TICK
+
+GRANT_FORMAT = '>BHB'
+GRANT_SIZE = struct.calcsize(GRANT_FORMAT)
+
+
+def build_grants(minislots, minislot, grants, poll_cycle=0):
+    """Grant trailer for a beacon: request minislots, poll cycle and the granted node ids"""
+    ticks = min(max(int(round(minislot / BEACON_TICK)), 1), 0xFFFF)
+    header = struct.pack(GRANT_FORMAT, minislots & 0xFF, ticks, min(poll_cycle, 0xFF))
+    return header + bytes(n & 0xFF for n in grants)
+
+
+def parse_grants(payload):
+    """
+    (request minislots, minislot in seconds, poll cycle, [node ids]) of a
+    beacon, None without a trailer
+    """
+    trailer = payload[BEACON_SIZE:]
+    if len(trailer) < GRANT_SIZE:
+        return None
+    minislots, ticks, poll_cycle = struct.unpack(GRANT_FORMAT, trailer[:GRANT_SIZE])
+    return minislots, ticks * BEACON_TICK, poll_cycle, list(trailer[GRANT_SIZE:])
+
+
+def request_slots(minislots, minislot, slot):
+    """Whole slots taken by the request minislots after the beacon"""
+    return int(math.ceil(minislots * minislot / slot - 1e-9)) if minislots > 0 else 0
+
+
+class PollScheduler:
+    """Base station roster + round-robin slot grants"""
+
+    def __init__(self, node_id, minislots=4, roster_timeout=60.0):
+        """
+        Arguments:
+            node_id:        The base station's own id (never polled)
+            minislots:      Request minislots per superframe
+            roster_timeout: Seconds without hearing a station before it leaves the roster
+        """
+        self.node_id = node_id
+        self.minislots = max(int(minislots), 1)
+        self.roster_timeout = float(roster_timeout)
+
+        # roster[node] = {'demand': frames without a grant, 'heard': last time heard}
+        self.roster = {}
+        self.last_served = 0  # round robin: node that got the last grant
+        self.last_polled = 0  # round robin: node that got the last poll
+        self.poll_cycle = 0   # superframes to poll the whole roster (0: no polls)
+
+        self.stats = {
+            'requests': 0,
+            'grants': 0,
+            'polls': 0,        # leftover slots granted without a request
+            'superframes': 0,
+            'idle_slots': 0,   # grantable slots left unused
+        }
+
+    def heard(self, node, now):
+        """Any frame from 'node': keep it on the roster"""
+        entry = self.roster.setdefault(node, {'demand': 0, 'heard': now})
+        entry['heard'] = now
+
+    def set_demand(self, node, frames, now):
+        """Frames waiting at 'node' without a grant (replaces what was known)"""
+        self.heard(node, now)
+        self.roster[node]['demand'] = max(int(frames), 0)
+
+    def on_request(self, node, frames, now):
+        """Slot request received from 'node'"""
+        self.set_demand(node, frames, now)
+        self.stats['requests'] += 1
+
+    def assign(self, n_slots, now):
+        """Node ids for the next 'n_slots' grantable slots (may be fewer)"""
+        for node, entry in list(self.roster.items()):
+            if now - entry['heard'] > self.roster_timeout:
+                del self.roster[node]
+
+        grants = []
+        nodes = self.round_robin(sorted(self.roster), self.last_served)
+        while len(grants) < n_slots:
+            served = False
+            for node in nodes:
+                entry = self.roster[node]
+                if entry['demand'] > 0 and len(grants) < n_slots:
+                    entry['demand'] -= 1
+                    grants.append(node)
+                    self.last_served = node
+                    served = True
+            if not served:
+                break
+        self.stats['grants'] += len(grants)
+
+        # Leftover slots: poll the stations on the roster, round after round
+        stations = self.round_robin([n for n in sorted(self.roster) if n != self.node_id],
+                                    self.last_polled)
+        polls = [stations[k % len(stations)] for k in range(n_slots - len(grants))] if stations else []
+        if polls:
+            self.last_polled = polls[-1]
+            grants += polls
+            self.stats['polls'] += len(polls)
+        self.poll_cycle = -(-len(stations) // len(polls)) if polls else 0
+
+        self.stats['superframes'] += 1
+        self.stats['idle_slots'] += n_slots - len(grants)
+        return grants
+
+    @staticmethod
+    def round_robin(nodes, last):
+        """'nodes' (sorted) starting after 'last', so no station is favoured"""
+        start = next((i for i, n in enumerate(nodes) if n > last), 0)
+        return nodes[start:] + nodes[:start]
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        return dict(
+            self.stats,
+            stations=len(self.roster),
+            demand=sum(e['demand'] for e in self.roster.values()),
+        )
+
+
+class GrantQueue:
+    """Station side: slots granted to this node, and when to ask for more"""
+
+    def __init__(self):
+        self.granted = collections.deque()  # granted slot indices, oldest first
+        self.requested = 0                  # frames the base station still owes slots for
+        self.request_slots = 0              # slots after the beacon taken by minislots
+        self.asked = False                  # minislot request sent, no grant since
+        self.poll_cycle = 0                 # from the beacon (0: no polls)
+        self.since_grant = None             # superframes since the last grant (None: never)
+        self.failures = 0                   # minislot requests in a row without a grant
+        self.skip = 0                       # superframes to wait before the next one
+
+        self.stats = {
+            'requests': 0,
+            'contended': 0,  # requests sent in a minislot
+            'grants': 0,
+            'unused': 0,     # granted slots that had started before a frame was ready
+        }
+
+    def on_beacon(self, node_id, slot_index, slot, payload):
+        """
+        Take this node's grants from a beacon. Returns (request minislots,
+        minislot length, number of new grants), or None for a beacon
+        without a grant trailer.
+        """
+        info = parse_grants(payload)
+        if info is None:
+            return None
+        minislots, minislot, self.poll_cycle, grants = info
+        self.request_slots = request_slots(minislots, minislot, slot)
+        first = slot_index + 1 + self.request_slots
+        mine = [first + k for k, node in enumerate(grants) if node == node_id]
+        if mine:
+            self.since_grant = 0
+        elif self.since_grant is not None:
+            self.since_grant += 1
+        self.granted.extend(mine)
+        self.requested = max(self.requested - len(mine), 0)
+        self.stats['grants'] += len(mine)
+        return minislots, minislot, len(mine)
+
+    def take(self, clock, now):
+        """Index of the first granted slot that has not started yet (None if there is none)"""
+        while self.granted:
+            index = self.granted.popleft()
+            if clock.slot_start(index) >= now:
+                return index
+            self.stats['unused'] += 1
+        return None
+
+    def plan_request(self, waiting, new_grants):
+        """
+        Where to ask for slots for 'waiting' frames that have none: 'granted'
+        (in a slot of this superframe), 'minislot' or None (nothing waiting,
+        or backing off). Not on the roster yet: 'minislot' even for none.
+        """
+        if new_grants:
+            self.asked = False
+            self.failures = 0
+            self.skip = 0
+            return 'granted' if waiting > 0 else None
+        if waiting <= 0 and self.since_grant is not None:
+            return None
+        if self.poll_cycle and self.since_grant is not None and self.since_grant < self.poll_cycle:
+            # On the roster: the next poll comes within the cycle
+            return None
+        if self.skip > 0:
+            self.skip -= 1
+            return None
+        if self.asked:
+            # Asked before and still no grant: the request may have collided
+            self.failures += 1
+        self.skip = random.randrange(2 ** min(self.failures, 4))
+        return 'minislot'
+
+    def request_time(self, clock, slot_index, minislots, minislot):
+        """Start of a random request minislot after the beacon of 'slot_index'"""
+        scale = clock.period / clock.slot  # minislots follow the tracked drift too
+        return clock.slot_start(slot_index + 1) + random.randrange(minislots) * minislot * scale
+
+    def on_request(self, waiting, contended):
+        """A request for 'waiting' frames has been queued ('contended': in a minislot)"""
+        self.requested = waiting
+        self.stats['requests'] += 1
+        if contended:
+            self.asked = True
+            self.stats['contended'] += 1
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        return dict(self.stats, granted=len(self.granted), requested=self.requested)
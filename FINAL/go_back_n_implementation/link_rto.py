@@ -0,0 +1,74 @@
+"""
+Retransmission timeout estimation (Jacobson/Karels, as in RFC 6298)
+shared by the link-layer embedded blocks.
+
+One RttEstimator is kept per destination. Samples must only be taken from
+frames that were sent exactly once (Karn's algorithm); the caller is
+responsible for that, the estimator only handles the arithmetic and the
+exponential backoff on timeouts.
+"""
+
+
+class RttEstimator:
+    """Smoothed RTT / RTT variance tracker producing a retransmission timeout"""
+
+    ALPHA = 1.0 / 8
+    BETA = 1.0 / 4
+    K = 4
+
+    def __init__(self, initial_rto=1.0, min_rto=0.05, max_rto=30.0, granularity=0.001):
+        """
+        Arguments:
+            initial_rto: RTO used until the first RTT sample (seconds)
+            min_rto:     Lower bound of the RTO (seconds)
+            max_rto:     Upper bound of the RTO, also caps the backoff (seconds)
+            granularity: Clock granularity added to the variance term (seconds)
+        """
+        self.initial_rto = float(initial_rto)
+        self.min_rto = float(min_rto)
+        self.max_rto = max(float(max_rto), self.initial_rto)
+        self.granularity = float(granularity)
+
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.backoffs = 0
+        self.base_rto = self._clamp(self.initial_rto)
+
+    def _clamp(self, rto):
+        return min(max(rto, self.min_rto), self.max_rto)
+
+    @property
+    def rto(self):
+        """Current RTO including exponential backoff"""
+        return self._clamp(self.base_rto * (2 ** self.backoffs))
+
+    def sample(self, rtt):
+        """Feed one RTT measurement (seconds) from a frame that was not retransmitted"""
+        if rtt < 0:
+            return
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+        self.base_rto = self._clamp(self.srtt + max(self.granularity, self.K * self.rttvar))
+        # A fresh sample ends any backoff in progress
+        self.backoffs = 0
+
+    def on_timeout(self):
+        """Double the RTO after a retransmission timeout (bounded by max_rto)"""
+        if self.rto < self.max_rto:
+            self.backoffs += 1
+
+    def as_dict(self):
+        """Current state, for the stats port"""
+        return {
+            'srtt': self.srtt if self.srtt is not None else -1.0,
+            'rttvar': self.rttvar if self.rttvar is not None else -1.0,
+            'rto': self.rto,
+            'samples': self.samples,
+            'backoffs': self.backoffs,
+        }
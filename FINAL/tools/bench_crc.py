@@ -0,0 +1,30 @@
+"""
+CRC-16 CCITT benchmark: crc16 (binascii.crc_hqx) against the table-driven
+crc16_reference the blocks used before, over frame-sized inputs.
+
+    python bench_crc.py [count]
+"""
+
+import random
+import sys
+import timeit
+
+import sim_env  # noqa: F401
+from link_crc import crc16, crc16_reference
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    rng = random.Random(1)
+    print(f"{count} inputs per size, best of 5")
+    print("  size   crc16_reference      crc16   speed-up")
+    for size in (5, 32, 64, 128, 255, 1024):
+        frames = [bytes(rng.getrandbits(8) for _ in range(size)) for _ in range(count)]
+        assert all(crc16(f) == crc16_reference(f) for f in frames)
+        ref = min(timeit.repeat(lambda: [crc16_reference(f) for f in frames], number=1, repeat=5)) / count
+        fast = min(timeit.repeat(lambda: [crc16(f) for f in frames], number=1, repeat=5)) / count
+        print(f"  {size:4d}   {ref * 1e6:10.2f} us  {fast * 1e6:6.2f} us  {ref / fast:8.0f}x")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
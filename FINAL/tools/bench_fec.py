@@ -0,0 +1,77 @@
+"""
+FEC benchmark: frame delivery rate of plain and FEC frames under random bit
+errors (sync word included, so a hit sync word loses the frame either way),
+and the encode/decode cost per frame.
+
+    python bench_fec.py [frames] [payload_len] [nsym] [depth]
+"""
+
+import random
+import struct
+import sys
+import timeit
+
+import numpy as np
+
+import sim_env  # noqa: F401
+from framing_util import SYNC_WORD
+from link_crc import crc16
+from link_fec import FEC_SYNC_WORD, FecFrameExtractor, fec_decode, fec_encode, fec_header_size
+from link_framing import PKT_DATA, FrameExtractor
+
+BERS = (1e-4, 1e-3, 3e-3, 1e-2)
+
+
+def flip_bits(data, ber, rng):
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    bits ^= (rng.random(bits.size) < ber).astype(np.uint8)
+    return np.packbits(bits).tobytes()
+
+
+def delivered(extractor, frames, ber, rng):
+    ok = 0
+    for frame in frames:
+        extractor.reset()
+        ok += len(extractor.feed(flip_bits(frame, ber, rng)))
+    return ok
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1000
+    payload_len = int(argv[2]) if len(argv) > 2 else 60
+    nsym = int(argv[3]) if len(argv) > 3 else 16
+    depth = int(argv[4]) if len(argv) > 4 else 2
+    rng = np.random.default_rng(1)
+    prng = random.Random(1)
+
+    bodies = []
+    for seq in range(count):
+        body = bytes([1, 2, seq % 256, PKT_DATA, payload_len]) + bytes(prng.getrandbits(8) for _ in range(payload_len))
+        bodies.append(body + struct.pack('>H', crc16(body)))
+    plain = [SYNC_WORD + body for body in bodies]
+    coded = [FEC_SYNC_WORD + fec_encode(body, nsym, depth) for body in bodies]
+
+    print(f"{count} frames, {payload_len} B payload, RS nsym={nsym} depth={depth}")
+    print(f"on-air bytes per frame (after the preamble): plain {len(plain[0])}, FEC {len(coded[0])}")
+    print("     BER   plain delivered   FEC delivered")
+    for ber in BERS:
+        plain_ok = delivered(FrameExtractor(SYNC_WORD, crc16, valid_types={PKT_DATA}), plain, ber, rng)
+        fec_ok = delivered(FecFrameExtractor(crc16, valid_types={PKT_DATA}), coded, ber, rng)
+        print(f"  {ber:6.0e}   {100.0 * plain_ok / count:14.1f}%   {100.0 * fec_ok / count:12.1f}%")
+
+    hdr = fec_header_size()
+    body, frame = bodies[0], coded[0][len(FEC_SYNC_WORD) + hdr:]
+    t = (nsym // 2) * depth
+    damaged = bytearray(frame)
+    for i in range(t):
+        damaged[i] ^= 0x5A
+    n = 200
+    enc = min(timeit.repeat(lambda: fec_encode(body, nsym, depth), number=n, repeat=3)) / n
+    dec = min(timeit.repeat(lambda: fec_decode(frame, len(body), nsym, depth), number=n, repeat=3)) / n
+    fix = min(timeit.repeat(lambda: fec_decode(bytes(damaged), len(body), nsym, depth), number=n, repeat=3)) / n
+    print(f"encode {enc * 1e6:.0f} us, decode clean {dec * 1e6:.0f} us, "
+          f"decode with a {t}-byte burst {fix * 1e6:.0f} us per frame")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,104 @@
+"""
+Receive-path framing benchmark: FrameExtractor against the rx_buffer loop
+the link blocks used before it (find the sync word, parse, else drop one
+byte and rescan). Both get the same input: one PDU per frame (noise +
+frame), the same stream cut into random chunks, and noise-only PDUs. The
+old loop loses frames split across PDUs.
+
+    python bench_framing.py [frames] [payload_len]
+"""
+
+import random
+import struct
+import sys
+import time
+
+import sim_env  # noqa: F401
+from framing_util import SYNC_WORD, garbage, make_frame, random_payload, split
+from link_crc import crc16
+from link_framing import PKT_ACK, PKT_DATA, FrameExtractor
+
+
+def legacy_parse(data):
+    """parse_packet() of the original blocks (CRC via the same crc16)"""
+    sync_idx = data.find(SYNC_WORD)
+    if sync_idx == -1:
+        return None
+    start = sync_idx + len(SYNC_WORD)
+    if len(data) < start + 5 + 2:
+        return None
+    payload_len = data[start + 4]
+    total_len = start + 5 + payload_len + 2
+    if len(data) < total_len:
+        return None
+    rx_crc = struct.unpack('>H', data[total_len - 2:total_len])[0]
+    if rx_crc != crc16(data[start:total_len - 2]):
+        return None
+    return {'src': data[start], 'dst': data[start + 1], 'seq': data[start + 2], 'type': data[start + 3],
+            'payload': data[start + 5:start + 5 + payload_len], 'consumed': total_len}
+
+
+def legacy_extract(pdus):
+    frames = []
+    rx_buffer = bytes()
+    for pdu in pdus:
+        rx_buffer += pdu
+        while len(rx_buffer) > 0:
+            pkt = legacy_parse(rx_buffer)
+            if pkt is None:
+                rx_buffer = rx_buffer[1:] if len(rx_buffer) > 1 else bytes()
+                continue
+            rx_buffer = rx_buffer[pkt['consumed']:]
+            frames.append(pkt)
+    return frames
+
+
+def extractor_extract(pdus):
+    fx = FrameExtractor(SYNC_WORD, crc16, max_payload=255, valid_types={PKT_DATA, PKT_ACK})
+    frames = []
+    for pdu in pdus:
+        frames += fx.feed(pdu)
+    return frames
+
+
+def timed(fn, pdus, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frames = fn(pdus)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return frames, best
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    payload_len = int(argv[2]) if len(argv) > 2 else 60
+    rng = random.Random(1)
+    pdus = [garbage(rng, rng.randint(0, 40)) + make_frame(1, 2, i % 256, random_payload(rng, payload_len))
+            for i in range(count)]
+    total = sum(len(p) for p in pdus)
+    stream = b''.join(pdus)
+
+    chunks_64 = split(rng, stream, 64)
+    chunks_1k = split(rng, stream, 1024)
+    noise = [garbage(rng, 1024) for _ in range(count // 10)]
+    cases = [
+        ('legacy, 1 PDU/frame', legacy_extract, pdus),
+        ('FrameExtractor, 1 PDU/frame', extractor_extract, pdus),
+        ('legacy, 64 B chunks', legacy_extract, chunks_64),
+        ('FrameExtractor, 64 B chunks', extractor_extract, chunks_64),
+        ('legacy, 1 KiB chunks', legacy_extract, chunks_1k),
+        ('FrameExtractor, 1 KiB chunks', extractor_extract, chunks_1k),
+        ('legacy, 1 KiB noise PDUs', legacy_extract, noise),
+        ('FrameExtractor, 1 KiB noise PDUs', extractor_extract, noise),
+    ]
+    print(f"{count} frames, {payload_len} B payload, {total} bytes incl. noise")
+    for name, fn, chunks in cases:
+        size = sum(len(c) for c in chunks)
+        frames, elapsed = timed(fn, chunks)
+        print(f"  {name:34} {len(frames):6d} frames  {elapsed * 1e3:8.1f} ms  {size / elapsed / 1e6:6.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
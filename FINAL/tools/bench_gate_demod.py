@@ -0,0 +1,115 @@
+"""
+Demodulator CPU with and without the energy gate (user_1_epy_block_4) in
+front of it. The demodulator is the burst-mode DQPSK receiver
+(user_1_epy_block_2, the burst_rx=1 path of user_1.grc); the
+symbol_sync -> costas_loop chain needs the GNU Radio runtime and is not
+timed here.
+
+Both run on the same samples at 1.2 Msps (samp_rate*2): noise only, and
+DQPSK bursts at a 10% duty cycle. The time of the gate itself is counted in
+the gated column.
+
+    python bench_gate_demod.py [seconds] [snr_db] [payload_len]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import sim_env  # noqa: F401
+import pmt
+import user_1_epy_block_2 as burst_rx
+import user_1_epy_block_4 as energy_gate
+from burst_util import ACCESS_CODE, EXCESS_BW, SPS, Modulator
+
+SAMP_RATE = 1.2e6
+CHUNK = 8192
+NOISE_AMP = 0.01
+
+
+def make_stream(n, duty, snr_db, payload_len, rng):
+    """Complex noise with bursts every len/duty samples; returns (samples, payloads)"""
+    x = (rng.standard_normal(n) + 1j * rng.standard_normal(n)) * NOISE_AMP * np.sqrt(0.5)
+    payloads = []
+    if duty > 0:
+        mod = Modulator()
+        scale = NOISE_AMP * 10 ** (snr_db / 20.0)
+        burst_len = len(mod.burst(bytes(payload_len)))
+        period = int(burst_len / duty)
+        for start in range(period // 2, n - burst_len, period):
+            payload = rng.integers(0, 256, payload_len, dtype=np.uint8).tobytes()
+            burst = mod.burst(payload)
+            burst *= scale / np.sqrt(np.mean(np.abs(burst) ** 2))
+            x[start:start + len(burst)] += burst
+            payloads.append(payload)
+    return x.astype(np.complex64), payloads
+
+
+def new_demod(got):
+    block = burst_rx.blk(sps=SPS, excess_bw=EXCESS_BW, access_code=ACCESS_CODE,
+                         samp_rate=SAMP_RATE)
+    block.connect_to(pmt.intern('pdus'),
+                     lambda msg: got.append(bytes(pmt.u8vector_elements(pmt.cdr(msg)))))
+    return block
+
+
+def ungated(x):
+    """Demodulator on every sample: (demod seconds, payloads)"""
+    got = []
+    demod = new_demod(got)
+    elapsed = 0.0
+    for i in range(0, len(x), CHUNK):
+        t0 = time.perf_counter()
+        demod.work([x[i:i + CHUNK]], [])
+        elapsed += time.perf_counter() - t0
+    return elapsed, got
+
+
+def gated(x):
+    """Gate, then the demodulator on what it passes: (gate s, demod s, fraction passed, payloads)"""
+    got = []
+    demod = new_demod(got)
+    gate = energy_gate.blk()
+    out = np.zeros(4 * CHUNK, dtype=np.complex64)
+    elapsed = 0.0
+    passed = 0
+    for i in range(0, len(x), CHUNK):
+        chunk = x[i:i + CHUNK]
+        while True:
+            n = gate.general_work([chunk], [out])
+            if n:
+                t0 = time.perf_counter()
+                demod.work([out[:n]], [])
+                elapsed += time.perf_counter() - t0
+                passed += n
+            if not len(gate.pending):
+                break
+            chunk = chunk[:0]
+    return gate.stats['work_time'], elapsed, passed / float(len(x)), got
+
+
+def main(argv):
+    seconds = float(argv[1]) if len(argv) > 1 else 5.0
+    snr_db = float(argv[2]) if len(argv) > 2 else 10.0
+    payload_len = int(argv[3]) if len(argv) > 3 else 250
+    n = int(seconds * SAMP_RATE)
+    rng = np.random.default_rng(1)
+
+    print(f"{seconds:g} s at {SAMP_RATE / 1e6:.1f} Msps, bursts of {payload_len} B at {snr_db:g} dB SNR")
+    print("  CPU as % of one core at this sample rate")
+    print("                 ungated demod   gate + demod (gate, demod)   passed   frames (ungated/gated)")
+    for name, duty in (('idle', 0.0), ('10% duty', 0.1)):
+        x, payloads = make_stream(n, duty, snr_db, payload_len, rng)
+        t_full, got_full = ungated(x)
+        t_gate, t_demod, passed, got_gated = gated(x)
+        ok_full = sum(p in payloads for p in set(got_full))
+        ok_gated = sum(p in payloads for p in set(got_gated))
+        print(f"  {name:<12} {100 * t_full / seconds:12.1f}%   "
+              f"{100 * (t_gate + t_demod) / seconds:10.1f}% ({100 * t_gate / seconds:.1f}%, "
+              f"{100 * t_demod / seconds:.1f}%)   {100 * passed:6.1f}%   "
+              f"{ok_full}/{len(payloads)} {ok_gated}/{len(payloads)}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
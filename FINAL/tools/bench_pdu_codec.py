@@ -0,0 +1,66 @@
+"""
+PDU codec micro-benchmark: the link_pdu conversions against the per-element
+code the blocks used before (list(packet) on TX, a comprehension over
+to_python() for non-u8 vectors on RX), plus message PDUs per second.
+
+    python bench_pdu_codec.py
+    LINK_TOOLS_REAL_PMT=1 python bench_pdu_codec.py    (GNU Radio's pmt)
+"""
+
+import os
+import sys
+import timeit
+
+import sim_env  # noqa: F401
+import pmt
+from link_pdu import bytes_to_pdu, make_message, parse_message, pdu_to_bytes
+
+SIZES = (16, 64, 255, 2048)
+
+
+def old_tx(packet):
+    return pmt.cons(pmt.PMT_NIL, pmt.init_u8vector(len(packet), list(packet)))
+
+
+def old_rx(pdu):
+    data = pmt.cdr(pdu)
+    if pmt.is_u8vector(data):
+        return bytes(pmt.u8vector_elements(data))
+    return bytes([int(x) & 0xFF for x in pmt.to_python(data)])
+
+
+def per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main(argv):
+    real = bool(os.environ.get('LINK_TOOLS_REAL_PMT'))
+    print(f"pmt: {'GNU Radio' if real else 'tools/shim'}, times per call, best of 5")
+    print("  bytes   TX old     TX new    RX u8 old  RX u8 new  RX s32 old  RX s32 new")
+    for size in SIZES:
+        packet = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+        u8_pdu = bytes_to_pdu(packet)
+        s32_pdu = pmt.cons(pmt.PMT_NIL, pmt.init_s32vector(size, list(packet)))
+        assert old_rx(u8_pdu) == pdu_to_bytes(u8_pdu) == pdu_to_bytes(old_tx(packet)) == packet
+        assert old_rx(s32_pdu) == pdu_to_bytes(s32_pdu) == packet
+        n = 2000
+        times = [
+            per_call(lambda: old_tx(packet), n),
+            per_call(lambda: bytes_to_pdu(packet), n),
+            per_call(lambda: old_rx(u8_pdu), n),
+            per_call(lambda: pdu_to_bytes(u8_pdu), n),
+            per_call(lambda: old_rx(s32_pdu), n),
+            per_call(lambda: pdu_to_bytes(s32_pdu), n),
+        ]
+        print(f"  {size:5d}" + "".join(f"  {t * 1e6:7.2f} us" for t in times))
+
+    body = 'Dr. Perera to ward 12, bed 4'
+    make = per_call(lambda: make_message(body, dst=2, src=1, msg_id=7, timestamp=1.0), 20000)
+    msg = make_message(body, dst=2, src=1, msg_id=7, timestamp=1.0)
+    parse = per_call(lambda: parse_message(msg), 20000)
+    print(f"message PDUs: make {make * 1e6:.2f} us, parse {parse * 1e6:.2f} us "
+          f"({1.0 / (make + parse):.0f} round trips/s)")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
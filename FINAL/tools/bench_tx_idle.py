@@ -0,0 +1,87 @@
+"""
+TX thread benchmark of the GBN/SR block: process CPU while the block is
+idle, and the latency from a message on msg_in to its DATA frame on
+pdu_out (node 2 ACKs every frame, so the window never blocks).
+
+    python bench_tx_idle.py [block.py]
+
+A block file can be given to measure another version of the block, e.g.
+one exported with 'git show <commit>:FINAL/go_back_n_implementation/...'.
+"""
+
+import importlib.util
+import os
+import statistics
+import sys
+import time
+
+import sim_env  # noqa: F401
+import pmt
+from link_pdu import pdu_to_bytes
+from sim_link import NodePair
+
+IDLE_SECONDS = 10.0
+MESSAGES = 50
+PARAMS = dict(aloha_prob=1.0, aloha_backoff_min=0.01, aloha_backoff_max=0.02)
+
+
+def load_block(path=None):
+    if path is None:
+        from combined_go_back_n_epy_block_1_0_0_0 import blk
+        return blk
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.blk
+
+
+def idle_cpu(block_class):
+    """Percent of one CPU used by a single block with nothing to send."""
+    block = block_class(node_id=1, **PARAMS)
+    try:
+        time.sleep(1.0)
+        cpu, wall = time.process_time(), time.monotonic()
+        time.sleep(IDLE_SECONDS)
+        return 100.0 * (time.process_time() - cpu) / (time.monotonic() - wall)
+    finally:
+        block.stop()
+
+
+def send_latency(block_class):
+    """msg_in -> first pdu_out carrying the message, in seconds, per message."""
+    pair = NodePair(block_class, **PARAMS)
+    sent, latencies = {}, []
+
+    def on_pdu(pdu):
+        for frame in pair.forward.frames(pdu_to_bytes(pdu)):
+            body = frame['payload']
+            for key in list(sent):
+                if key in body:
+                    latencies.append(time.perf_counter() - sent.pop(key))
+
+    pair.a.connect_to(pmt.intern('pdu_out'), on_pdu)
+    try:
+        time.sleep(0.5)
+        for i in range(MESSAGES):
+            key = f"page {i:03d}".encode()
+            sent[key] = time.perf_counter()
+            pair.a.handlers[pmt.intern('msg_in')](pmt.intern(f"2:{key.decode()}"))
+            time.sleep(0.05)
+        pair.wait(MESSAGES, timeout=10.0)
+    finally:
+        pair.stop()
+    return latencies
+
+
+def main(argv):
+    block_class = load_block(argv[1] if len(argv) > 1 else None)
+    cpu = idle_cpu(block_class)
+    latencies = send_latency(block_class)
+    ms = sorted(x * 1e3 for x in latencies)
+    print(f"\nidle CPU: {cpu:.2f}% of one core over {IDLE_SECONDS:.0f} s")
+    print(f"msg_in -> pdu_out: {len(ms)}/{MESSAGES} messages, median {statistics.median(ms):.2f} ms, "
+          f"p90 {ms[int(0.9 * (len(ms) - 1))]:.2f} ms, max {ms[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
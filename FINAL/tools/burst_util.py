@@ -0,0 +1,51 @@
+"""
+NumPy model of the transmit side of the burst-mode DQPSK link, shared by
+test_burst_rx and bench_gate_demod: access code + 16-bit length sent twice +
+payload, 2 bits per symbol as differential QPSK, RRC pulse shaping at 4
+samples per symbol, and a channel with delay, frequency offset and noise.
+"""
+
+import numpy as np
+
+import sim_env  # noqa: F401
+import user_1_epy_block_2 as burst_rx
+
+SPS = 4
+EXCESS_BW = 0.5
+ACCESS_CODE = '11100001010110101110100010010011'
+
+
+class Modulator:
+    """Frames and differential QPSK symbols, carrying the phase across bursts"""
+
+    def __init__(self):
+        self.phase = 0
+        self.taps = burst_rx.rrc_taps(SPS, EXCESS_BW)
+
+    def symbols(self, payload, flip=0):
+        n = len(payload)
+        header = bytes(int(ACCESS_CODE[i:i + 8], 2) for i in range(0, 32, 8))
+        header += bytes([n >> 8, n & 0xFF, n >> 8, (n & 0xFF) ^ flip])
+        bits = np.unpackbits(np.frombuffer(header + payload, dtype=np.uint8))
+        steps = bits[0::2] * 2 + bits[1::2]
+        index = (self.phase + np.cumsum(steps)) % 4
+        self.phase = int(index[-1])
+        return np.exp(1j * (np.pi / 4 + np.pi / 2 * index))
+
+    def burst(self, payload, flip=0):
+        """flip: XOR mask applied to the low byte of the second length copy"""
+        sym = self.symbols(payload, flip)
+        up = np.zeros(len(sym) * SPS, dtype=complex)
+        up[::SPS] = sym
+        return np.convolve(up, self.taps)
+
+
+def channel(x, rng, snr_db, cfo, p_sig):
+    """Fractional delay, frequency/phase offset and AWGN (cfo in cycles per sample)"""
+    t = np.arange(len(x) - 1) + rng.uniform(0, 1)
+    idx = np.arange(len(x))
+    x = np.interp(t, idx, x.real) + 1j * np.interp(t, idx, x.imag)
+    x = x * np.exp(1j * (2 * np.pi * cfo * np.arange(len(x)) + rng.uniform(0, 2 * np.pi)))
+    sigma = np.sqrt(p_sig / 10 ** (snr_db / 10) / 2)
+    x = x + sigma * (rng.standard_normal(len(x)) + 1j * rng.standard_normal(len(x)))
+    return x.astype(np.complex64)
@@ -0,0 +1,35 @@
+"""Frame builders and byte streams shared by the framing tests and benchmarks."""
+
+import struct
+
+import sim_env  # noqa: F401
+from link_crc import crc16
+from link_framing import PKT_DATA
+
+PREAMBLE = bytes([0xAA, 0xAA, 0xAA, 0xAA])
+SYNC_WORD = bytes([0x2D, 0xD4])
+
+
+def make_frame(src, dst, seq, payload, pkt_type=PKT_DATA, preamble=PREAMBLE):
+    """Full frame as create_packet builds it: preamble + sync word + header + payload + CRC"""
+    body = bytes([src, dst, seq, pkt_type, len(payload)]) + payload
+    return preamble + SYNC_WORD + body + struct.pack('>H', crc16(body))
+
+
+def garbage(rng, n):
+    """n random bytes that hold no sync word (not even across a frame boundary)"""
+    return bytes(rng.choice(range(0x2E, 0xD4)) for _ in range(n))
+
+
+def random_payload(rng, n):
+    return bytes(rng.getrandbits(8) for _ in range(n))
+
+
+def split(rng, data, max_chunk):
+    """Cut 'data' into random chunks of 1..max_chunk bytes"""
+    chunks, pos = [], 0
+    while pos < len(data):
+        n = rng.randint(1, max_chunk)
+        chunks.append(data[pos:pos + n])
+        pos += n
+    return chunks
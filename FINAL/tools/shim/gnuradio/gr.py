@@ -0,0 +1,39 @@
+"""
+Minimal stand-in for gnuradio.gr: message ports only. Output ports are
+wired to plain callables with connect_to(port, fn); input handlers are
+reachable as block.handlers[port]. Stream blocks are driven by calling
+work()/general_work() directly; consume() and tag propagation are no-ops.
+"""
+
+TPP_DONT = 0
+
+
+class basic_block:
+    def __init__(self, name='', in_sig=None, out_sig=None):
+        self.handlers = {}
+        self.subscribers = {}
+
+    def message_port_register_in(self, port):
+        pass
+
+    def message_port_register_out(self, port):
+        self.subscribers.setdefault(port, [])
+
+    def set_msg_handler(self, port, handler):
+        self.handlers[port] = handler
+
+    def message_port_pub(self, port, msg):
+        for fn in self.subscribers.get(port, []):
+            fn(msg)
+
+    def connect_to(self, port, fn):
+        self.subscribers.setdefault(port, []).append(fn)
+
+    def set_tag_propagation_policy(self, policy):
+        pass
+
+    def consume(self, port, n):
+        pass
+
+
+sync_block = basic_block
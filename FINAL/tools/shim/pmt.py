@@ -0,0 +1,159 @@
+"""
+Minimal stand-in for GNU Radio's pmt module, for running the epy blocks and
+link_* modules without GNU Radio (tests, simulations, benchmarks).
+Only the calls the blocks use are provided. As in PMT, interned symbols
+are never freed, and a dict is an association list (is_pair() is true).
+"""
+
+import numpy as np
+
+
+class Sym(str):
+    pass
+
+
+class Pair(tuple):
+    pass
+
+
+class U8(bytes):
+    pass
+
+
+class S32(tuple):
+    pass
+
+
+class Dict(dict):
+    pass
+
+
+PMT_NIL = None
+PMT_T = True
+PMT_F = False
+
+_interned = {}
+
+
+def intern(s):
+    return _interned.setdefault(s, Sym(s))
+
+
+string_to_symbol = intern
+
+
+def symbol_to_string(s):
+    return str(s)
+
+
+def is_symbol(x):
+    return isinstance(x, Sym)
+
+
+is_string = is_symbol
+
+
+def is_pair(x):
+    return isinstance(x, (Pair, Dict)) and len(x) > 0
+
+
+def is_dict(x):
+    return isinstance(x, Dict)
+
+
+def is_u8vector(x):
+    return isinstance(x, U8)
+
+
+def is_uniform_vector(x):
+    return isinstance(x, (U8, S32))
+
+
+def is_null(x):
+    return x is None
+
+
+def is_bool(x):
+    return isinstance(x, bool)
+
+
+def is_integer(x):
+    return isinstance(x, int) and not isinstance(x, bool)
+
+
+def is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def cons(a, b):
+    return Pair((a, b))
+
+
+def car(p):
+    if isinstance(p, Dict):
+        return Pair(next(iter(p.items())))
+    return p[0]
+
+
+def cdr(p):
+    if isinstance(p, Dict):
+        return Dict(list(p.items())[1:])
+    return p[1]
+
+
+def init_u8vector(n, items):
+    return U8(bytes(items))
+
+
+def u8vector_elements(v):
+    return list(v)
+
+
+def init_s32vector(n, items):
+    return S32(int(x) for x in items)
+
+
+def make_dict():
+    return Dict()
+
+
+def dict_add(d, k, v):
+    d = Dict(d)
+    d[k] = v
+    return d
+
+
+def dict_ref(d, k, not_found):
+    return d.get(k, not_found)
+
+
+def dict_has_key(d, k):
+    return k in d
+
+
+def _same(x):
+    return x
+
+
+from_long = to_long = from_double = to_double = from_float = _same
+from_bool = to_bool = _same
+
+
+def to_python(x):
+    if isinstance(x, Sym):
+        return str(x)
+    if isinstance(x, (U8, S32)):
+        return np.array(x, dtype=np.uint8 if isinstance(x, U8) else np.int32)
+    if isinstance(x, Dict):
+        return {to_python(k): to_python(v) for k, v in x.items()}
+    return x
+
+
+def to_pmt(x):
+    if isinstance(x, str):
+        return intern(x)
+    if isinstance(x, dict):
+        return Dict({to_pmt(k): to_pmt(v) for k, v in x.items()})
+    if isinstance(x, (bytes, bytearray)):
+        return U8(x)
+    return x
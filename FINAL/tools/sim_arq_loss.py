@@ -0,0 +1,65 @@
+"""
+Go-Back-N vs Selective Repeat under random frame loss (both directions).
+Node 1 sends MESSAGES messages to node 2 over the simulated channel of
+sim_link; for each loss rate and ARQ mode prints the messages delivered,
+the DATA frames put on air per delivered message and the completion time,
+summed over SEEDS runs. The channel has no air time, so the times mostly
+count retransmission timeouts. 'pending' messages had no feedback yet when
+a run was stopped (120 s).
+
+    python sim_arq_loss.py [messages] [loss ...]
+"""
+
+import collections
+import sys
+
+import sim_env  # noqa: F401
+from combined_go_back_n_epy_block_1_0_0_0 import blk
+from sim_link import NodePair
+
+PARAMS = dict(aloha_prob=1.0, timeout=0.2, max_retries=6, window_size=4,
+              aloha_backoff_min=0.01, aloha_backoff_max=0.02, tx_queue_limit=256,
+              tx_queue_watermarks=(192, 64))
+SEEDS = (1, 2, 3)
+
+
+def run(arq_mode, loss, messages, seed=1):
+    pair = NodePair(blk, loss=loss, seed=seed, arq_mode=arq_mode, **PARAMS)
+    try:
+        pair.send(messages)
+        elapsed = pair.wait(messages, timeout=120.0)
+    finally:
+        pair.stop()
+    stats = pair.a.stats
+    return {
+        'delivered': len(pair.delivered),
+        'failed': pair.feedback.count('FALSE'),
+        'pending': messages - len(pair.feedback),
+        'frames': stats['packets_sent'] + stats['retransmissions'],
+        'retransmissions': stats['retransmissions'],
+        'time': elapsed,
+    }
+
+
+def main(argv):
+    messages = int(argv[1]) if len(argv) > 1 else 40
+    losses = [float(x) for x in argv[2:]] or [0.0, 0.1, 0.2, 0.3]
+    rows = []
+    for loss in losses:
+        for mode in ('gbn', 'sr'):
+            total = collections.Counter()
+            for seed in SEEDS:
+                total.update(run(mode, loss, messages, seed))
+            rows.append((loss, mode, total))
+
+    print(f"\n{messages} messages x {len(SEEDS)} runs, window {PARAMS['window_size']}, "
+          f"timeout {PARAMS['timeout']} s")
+    print("loss  mode  delivered  failed  pending  frames/msg  retx  time [s]")
+    for loss, mode, r in rows:
+        per_msg = r['frames'] / max(r['delivered'], 1)
+        print(f"{loss:4.2f}  {mode:4}  {r['delivered']:9d}  {r['failed']:6d}  {r['pending']:7d}  {per_msg:10.2f}  "
+              f"{r['retransmissions']:4d}  {r['time']:8.2f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,23 @@
+"""
+Import path set-up shared by the scripts in this folder: puts the pmt/gnuradio
+shim and both implementation folders on sys.path, so the epy blocks and the
+link_* modules run without GNU Radio. Import it before any block module.
+"""
+
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+FINAL_DIR = os.path.dirname(TOOLS_DIR)
+ALOHA_DIR = os.path.join(FINAL_DIR, 'aloha_s&w_implementation')
+GBN_DIR = os.path.join(FINAL_DIR, 'go_back_n_implementation')
+
+# The shim wins over a real GNU Radio install: the scripts drive the blocks'
+# message handlers directly, without a flowgraph. Scripts that only use pmt
+# (soak_link_pdu, bench_pdu_codec) run on the real one with LINK_TOOLS_REAL_PMT=1.
+paths = [GBN_DIR, ALOHA_DIR]
+if not os.environ.get('LINK_TOOLS_REAL_PMT'):
+    paths.append(os.path.join(TOOLS_DIR, 'shim'))
+for path in paths:
+    if path not in sys.path:
+        sys.path.insert(0, path)
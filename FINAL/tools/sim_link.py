@@ -0,0 +1,76 @@
+"""
+Two ARQ nodes on a simulated lossy channel, for the tests and simulations in
+this folder. Each node's pdu_out is fed straight into the other's pdu_in;
+frames are dropped at random ('loss') or by a rule ('drop(frame)').
+"""
+
+import random
+import time
+
+import sim_env  # noqa: F401
+import pmt
+from link_crc import crc16
+from link_framing import FrameExtractor
+from link_pdu import parse_message, pdu_to_bytes
+
+
+class Channel:
+    """One direction of the channel; counts the frames it carries and drops."""
+
+    def __init__(self, dst_block, loss=0.0, drop=None, rng=None):
+        self.dst_block = dst_block
+        self.loss = loss
+        self.drop = drop
+        self.rng = rng or random.Random(1)
+        self.framer = FrameExtractor(dst_block.SYNC_WORD, crc16, max_payload=255)
+        self.stats = {'pdus': 0, 'dropped': 0}
+
+    def frames(self, data):
+        """Frames in one transmitted PDU (none for a sync burst)."""
+        frame = self.framer.parse_delimited(data)
+        return [frame] if frame is not None else self.framer.feed(data)
+
+    def __call__(self, pdu):
+        self.stats['pdus'] += 1
+        data = pdu_to_bytes(pdu)
+        if self.rng.random() < self.loss or (
+                self.drop is not None and any(self.drop(f) for f in self.frames(data))):
+            self.stats['dropped'] += 1
+            return
+        self.dst_block.handlers[pmt.intern('pdu_in')](pdu)
+
+
+class NodePair:
+    """Node 1 sends to node 2; collects node 2's deliveries and node 1's feedback."""
+
+    def __init__(self, block_class, loss=0.0, drop=None, seed=1, **kwargs):
+        rng = random.Random(seed)
+        self.a = block_class(node_id=1, **kwargs)
+        self.b = block_class(node_id=2, **kwargs)
+        self.forward = Channel(self.b, loss, drop, rng)
+        self.reverse = Channel(self.a, loss, None, rng)
+        self.a.connect_to(pmt.intern('pdu_out'), self.forward)
+        self.b.connect_to(pmt.intern('pdu_out'), self.reverse)
+        self.delivered = []
+        self.feedback = []
+        self.b.connect_to(pmt.intern('msg_out'), self.on_message)
+        self.a.connect_to(pmt.intern('feedback'), lambda msg: self.feedback.append(pmt.symbol_to_string(msg)))
+
+    def on_message(self, msg):
+        message = parse_message(msg)
+        self.delivered.append(message['body'].decode() if message else pmt.symbol_to_string(msg))
+
+    def send(self, count, prefix='msg'):
+        for i in range(count):
+            self.a.handlers[pmt.intern('msg_in')](pmt.intern(f"2:{prefix} {i}"))
+
+    def wait(self, count, timeout=60.0):
+        """Wait until 'count' feedback messages arrived; returns the elapsed time."""
+        start = time.monotonic()
+        while len(self.feedback) < count and time.monotonic() - start < timeout:
+            time.sleep(0.02)
+        return time.monotonic() - start
+
+    def stop(self):
+        self.a.stop()
+        self.b.stop()
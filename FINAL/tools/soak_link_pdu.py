@@ -0,0 +1,74 @@
+"""
+Soak test of the message PDU path: make_message()/parse_message() for many
+distinct messages, sampling the process RSS. With message PDUs the RSS must
+stay flat; the legacy "dst:body" symbols are run after them for comparison,
+since every interned symbol stays in the PMT symbol table.
+
+    python soak_link_pdu.py [messages] [legacy_messages]
+    LINK_TOOLS_REAL_PMT=1 python soak_link_pdu.py    (GNU Radio's pmt)
+"""
+
+import gc
+import resource
+import sys
+import time
+
+import sim_env  # noqa: F401
+import pmt
+from link_pdu import make_message, parse_message
+
+SAMPLES = 10
+
+
+def rss_kib():
+    """Current resident set size in KiB (peak RSS where /proc is not available)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def soak(name, count, one_message):
+    step = max(1, count // SAMPLES)
+    gc.collect()
+    samples = [rss_kib()]
+    start = time.perf_counter()
+    for i in range(count):
+        one_message(i)
+        if (i + 1) % step == 0:
+            gc.collect()
+            samples.append(rss_kib())
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {count} messages in {elapsed:.1f} s ({elapsed / count * 1e6:.1f} us each)")
+    print("  RSS [KiB]: " + " ".join(str(s) for s in samples))
+    print(f"  growth after the first {step} messages: {samples[-1] - samples[1]:+d} KiB")
+    return samples
+
+
+def pdu_message(i):
+    msg = make_message(f"Dr. Perera to ward {i % 40}, bed {i}", dst=2, src=1, msg_id=i, timestamp=time.time())
+    parsed = parse_message(msg)
+    assert parsed['msg_id'] == i and parsed['dst'] == 2
+
+
+def legacy_message(i):
+    parsed = parse_message(pmt.intern(f"2:Dr. Perera to ward {i % 40}, bed {i}"))
+    assert parsed['dst'] == 2
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 1000000
+    legacy = int(argv[2]) if len(argv) > 2 else 200000
+    samples = soak('message PDUs', count, pdu_message)
+    if legacy:
+        soak('legacy interned symbols', legacy, legacy_message)
+    # Allocator noise only: no per-message growth
+    return 0 if samples[-1] - samples[1] < 1024 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,57 @@
+"""crc16 (binascii.crc_hqx) must match the table-driven crc16_reference bit for bit."""
+
+import random
+
+import sim_env  # noqa: F401
+from link_crc import CRC16_TABLE, crc16, crc16_reference
+
+
+def test_check_value():
+    # CRC-16/CCITT-FALSE check value
+    assert crc16(b'123456789') == 0x29B1
+    assert crc16_reference(b'123456789') == 0x29B1
+
+
+def test_random_inputs_match_reference():
+    rng = random.Random(1)
+    for _ in range(2000):
+        data = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 300)))
+        assert crc16(data) == crc16_reference(data)
+
+
+def test_init_and_input_types():
+    rng = random.Random(2)
+    data = bytes(rng.getrandbits(8) for _ in range(64))
+    for init in (0x0000, 0xFFFF, 0x1D0F, rng.getrandbits(16)):
+        assert crc16(data, init) == crc16_reference(data, init)
+    expected = crc16(data)
+    buf = bytearray(b'xx' + data)
+    assert crc16(bytearray(data)) == expected
+    assert crc16(memoryview(buf)[2:]) == expected
+    assert crc16(b'') == 0xFFFF
+
+
+def test_incremental():
+    data = b'hospital paging system'
+    assert crc16(data[7:], crc16(data[:7])) == crc16(data)
+
+
+def test_single_bit_errors_detected():
+    data = bytearray(b'\x01\x02\x00\x01\x05hello')
+    good = crc16(bytes(data))
+    for i in range(len(data) * 8):
+        data[i // 8] ^= 1 << (i % 8)
+        assert crc16(bytes(data)) != good
+        data[i // 8] ^= 1 << (i % 8)
+
+
+def test_table():
+    assert len(CRC16_TABLE) == 256
+    assert CRC16_TABLE[1] == 0x1021
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f"{name}: ok")
@@ -0,0 +1,110 @@
+"""
+link_fec round trip: encode, corrupt, decode. A burst of up to
+depth * nsym / 2 consecutive coded bytes is spread over the interleaved
+codewords and must always be corrected; the same holds for whole frames
+through FecFrameExtractor.
+"""
+
+import random
+import struct
+
+import sim_env  # noqa: F401
+from link_crc import crc16
+from link_fec import (FEC_SYNC_WORD, FecFrameExtractor, _block_layout, fec_coded_size, fec_decode,
+                      fec_decode_header, fec_encode, fec_header_size)
+from link_framing import PKT_DATA
+
+
+def corrupt(data, start, length, rng):
+    """Flip every byte in data[start:start + length] to a different value"""
+    out = bytearray(data)
+    for i in range(start, start + length):
+        out[i] ^= rng.randint(1, 255)
+    return bytes(out)
+
+
+def max_burst(data_len, nsym, depth):
+    """Longest burst the block interleaver spreads to at most nsym // 2 errors per codeword"""
+    return len(_block_layout(data_len, nsym, depth)) * (nsym // 2)
+
+
+def test_clean_round_trip():
+    rng = random.Random(1)
+    for data_len in (7, 20, 100, 262):
+        for nsym, depth in ((8, 1), (16, 2), (16, 4), (32, 3)):
+            data = bytes(rng.getrandbits(8) for _ in range(data_len))
+            coded = fec_encode(data, nsym, depth)
+            hdr = fec_header_size()
+            assert len(coded) == hdr + fec_coded_size(data_len, nsym, depth)
+            assert fec_decode_header(coded[:hdr]) == (data_len, nsym, depth, 0)
+            assert fec_decode(coded[hdr:], data_len, nsym, depth) == (data, 0)
+
+
+def test_bursts_up_to_correctable_length():
+    rng = random.Random(2)
+    hdr = fec_header_size()
+    for data_len, nsym, depth in ((27, 16, 2), (100, 16, 2), (100, 8, 4), (262, 16, 2), (60, 32, 3)):
+        data = bytes(rng.getrandbits(8) for _ in range(data_len))
+        coded = fec_encode(data, nsym, depth)[hdr:]
+        burst = max_burst(data_len, nsym, depth)
+        for length in (1, burst // 2, burst):
+            for start in range(0, len(coded) - length + 1):
+                decoded, fixed = fec_decode(corrupt(coded, start, length, rng), data_len, nsym, depth)
+                assert decoded == data, (data_len, nsym, depth, length, start)
+                assert fixed == length
+
+
+def test_longer_burst_is_not_miscorrected_silently():
+    rng = random.Random(3)
+    hdr = fec_header_size()
+    data_len, nsym, depth = 100, 16, 2
+    data = bytes(rng.getrandbits(8) for _ in range(data_len))
+    coded = fec_encode(data, nsym, depth)[hdr:]
+    length = max_burst(data_len, nsym, depth) + 2 * len(_block_layout(data_len, nsym, depth))
+    for start in range(0, len(coded) - length + 1, 5):
+        decoded, _fixed = fec_decode(corrupt(coded, start, length, rng), data_len, nsym, depth)
+        # Either reported as uncorrectable or (rarely) miscorrected; the frame CRC catches the latter
+        assert decoded is None or decoded != data or crc16(decoded) == crc16(data)
+
+
+def test_header_errors_corrected():
+    rng = random.Random(4)
+    coded = fec_encode(b'x' * 30, 16, 2)
+    for positions in ((0,), (3, 9), (1, 5, 8)):
+        raw = bytearray(coded[:fec_header_size()])
+        for p in positions:
+            raw[p] ^= rng.randint(1, 255)
+        assert fec_decode_header(bytes(raw)) == (30, 16, 2, len(positions))
+
+
+def test_frames_through_extractor():
+    rng = random.Random(5)
+    fx = FecFrameExtractor(crc16, max_payload=255, valid_types={PKT_DATA})
+    nsym, depth = 16, 2
+    sent, stream, fixed = [], b'', 0
+    for seq in range(20):
+        payload = bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 120)))
+        body = bytes([1, 2, seq, PKT_DATA, len(payload)]) + payload
+        body += struct.pack('>H', crc16(body))
+        coded = fec_encode(body, nsym, depth)
+        hdr = fec_header_size()
+        length = rng.randint(1, max_burst(len(body), nsym, depth))
+        start = hdr + rng.randint(0, len(coded) - hdr - length)
+        stream += b'\xAA' * 4 + FEC_SYNC_WORD + corrupt(coded, start, length, rng)
+        sent.append(payload)
+        fixed += length
+    frames = []
+    for pos in range(0, len(stream), 97):
+        frames += fx.feed(stream[pos:pos + 97])
+    assert [f['payload'] for f in frames] == sent
+    assert fx.stats['fec_frames'] == 20
+    assert fx.stats['fec_corrected_frames'] == 20
+    assert fx.stats['fec_corrected_bytes'] == fixed
+    assert fx.stats['fec_failures'] == 0 and fx.stats['crc_errors'] == 0
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f"{name}: ok")
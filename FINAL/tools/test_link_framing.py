@@ -0,0 +1,131 @@
+"""
+FrameExtractor tests: frames split across PDUs, frames between noise bytes
+and corrupted frames, with the crc_errors and bytes_dropped counters.
+Every byte fed is either returned in a frame, counted in bytes_dropped or
+still buffered.
+"""
+
+import random
+
+import sim_env  # noqa: F401
+from framing_util import PREAMBLE, SYNC_WORD, garbage, make_frame, random_payload, split
+from link_crc import crc16
+from link_framing import PKT_ACK, PKT_DATA, FrameExtractor
+
+FRAMED = len(SYNC_WORD) + FrameExtractor.HEADER_SIZE + FrameExtractor.CRC_SIZE
+
+
+def extractor():
+    return FrameExtractor(SYNC_WORD, crc16, max_payload=64, valid_types={PKT_DATA, PKT_ACK}, capacity=256)
+
+
+def frame_bytes(frames):
+    """Bytes the returned frames account for (sync word onwards)"""
+    return sum(FRAMED + len(f['payload']) for f in frames)
+
+
+def feed_all(fx, chunks):
+    frames = []
+    for chunk in chunks:
+        frames += fx.feed(chunk)
+    return frames
+
+
+def test_split_frames():
+    rng = random.Random(1)
+    payloads = [random_payload(rng, rng.randint(0, 64)) for _ in range(50)]
+    stream = b''.join(make_frame(1, 2, seq, p) for seq, p in enumerate(payloads))
+    for max_chunk in (1, 3, 17, 100):
+        fx = extractor()
+        frames = feed_all(fx, split(rng, stream, max_chunk))
+        assert [f['payload'] for f in frames] == payloads
+        assert [f['seq'] for f in frames] == list(range(len(payloads)))
+        assert fx.stats['crc_errors'] == 0
+        # Only the preambles are dropped
+        assert fx.stats['bytes_dropped'] == len(PREAMBLE) * len(payloads)
+        assert len(fx) == 0
+
+
+def test_garbage_between_frames():
+    rng = random.Random(2)
+    stream, payloads, noise = b'', [], 0
+    for seq in range(50):
+        junk = garbage(rng, rng.randint(0, 40))
+        payload = random_payload(rng, rng.randint(1, 64))
+        stream += junk + make_frame(3, 4, seq, payload)
+        payloads.append(payload)
+        noise += len(junk)
+    stream += garbage(rng, 10)
+    fx = extractor()
+    frames = feed_all(fx, split(rng, stream, 50))
+    assert [f['payload'] for f in frames] == payloads
+    assert fx.stats['crc_errors'] == 0
+    assert fx.stats['bytes_dropped'] + len(fx) == noise + 10 + len(PREAMBLE) * len(payloads)
+    assert len(fx) <= len(SYNC_WORD) - 1
+
+
+def test_crc_errors_counted_and_skipped():
+    rng = random.Random(3)
+    good, stream, corrupted = [], b'', 0
+    for seq in range(30):
+        payload = random_payload(rng, 20)
+        frame = bytearray(make_frame(5, 6, seq, payload))
+        if seq % 5 == 2:
+            frame[-5] ^= 0x01  # one bit in the payload
+            corrupted += 1
+        else:
+            good.append(payload)
+        stream += garbage(rng, 7) + bytes(frame)
+    fx = extractor()
+    frames = feed_all(fx, split(rng, stream, 32))
+    assert [f['payload'] for f in frames] == good
+    assert fx.stats['crc_errors'] == corrupted
+    assert frame_bytes(frames) + fx.stats['bytes_dropped'] + len(fx) == len(stream)
+
+
+def test_false_sync_word_does_not_hide_frame():
+    # A sync word followed by a plausible header that never completes
+    bogus = SYNC_WORD + bytes([1, 2, 3, PKT_DATA, 60]) + b'\x00' * 10
+    real = make_frame(1, 2, 9, b'page')
+    fx = extractor()
+    frames = fx.feed(bogus) + fx.feed(real)
+    assert [f['payload'] for f in frames] == [b'page']
+    assert frame_bytes(frames) + fx.stats['bytes_dropped'] + len(fx) == len(bogus) + len(real)
+
+
+def test_bad_headers_rejected_before_crc():
+    fx = extractor()
+    too_long = make_frame(1, 2, 0, b'x' * 65)
+    bad_type = make_frame(1, 2, 1, b'y', pkt_type=0x7F)
+    frames = fx.feed(too_long + bad_type + make_frame(1, 2, 2, b'z'))
+    assert [f['seq'] for f in frames] == [2]
+    assert fx.stats['bad_headers'] == 2
+    assert fx.stats['crc_errors'] == 0
+
+
+def test_overflow_keeps_newest_bytes():
+    rng = random.Random(4)
+    fx = extractor()
+    junk = garbage(rng, 1000)
+    frames = fx.feed(junk + make_frame(1, 2, 0, b'after overflow'))
+    assert [f['payload'] for f in frames] == [b'after overflow']
+    assert fx.stats['overflows'] == 1
+
+
+def test_parse_delimited():
+    fx = extractor()
+    bare = make_frame(7, 8, 1, b'bare', preamble=b'')[len(SYNC_WORD):]
+    frame = fx.parse_delimited(bare)
+    assert frame['src'] == 7 and frame['payload'] == b'bare'
+    damaged = bytearray(bare)
+    damaged[6] ^= 0xFF
+    assert fx.parse_delimited(bytes(damaged)) is None
+    assert fx.stats['crc_errors'] == 1
+    assert fx.parse_delimited(bare[:-1]) is None
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f"{name}: ok")
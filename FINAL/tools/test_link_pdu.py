@@ -0,0 +1,75 @@
+"""link_pdu round trips: the PHY PDU byte codec and the message PDU schema."""
+
+import random
+
+import numpy as np
+
+import sim_env  # noqa: F401
+import pmt
+from link_pdu import (bytes_to_pdu, bytes_to_u8vector, make_message, make_queue_status, parse_message,
+                      parse_queue_status, pdu_to_bytes, u8vector_to_bytes, u8vector_to_numpy,
+                      uniform_vector_to_bytes)
+
+
+def test_byte_codec_round_trip():
+    rng = random.Random(1)
+    for n in (0, 1, 7, 255, 4096):
+        data = bytes(rng.getrandbits(8) for _ in range(n))
+        for form in (data, bytearray(data), memoryview(data), np.frombuffer(data, dtype=np.uint8)):
+            vec = bytes_to_u8vector(form)
+            assert pmt.is_u8vector(vec)
+            assert u8vector_to_bytes(vec) == data
+            assert u8vector_to_numpy(vec).tobytes() == data
+            assert pdu_to_bytes(bytes_to_pdu(form)) == data
+
+
+def test_numpy_views_and_slices():
+    frame = np.arange(64, dtype=np.uint8)
+    assert u8vector_to_bytes(bytes_to_u8vector(frame[::2])) == frame[::2].tobytes()
+    assert u8vector_to_bytes(bytes_to_u8vector(memoryview(bytes(frame))[10:20])) == bytes(range(10, 20))
+
+
+def test_uniform_vectors_keep_low_byte():
+    values = [0, 1, 255, 256, 511, -1]
+    vec = pmt.init_s32vector(len(values), values)
+    assert uniform_vector_to_bytes(vec) == bytes([0, 1, 255, 0, 255, 255])
+    assert pdu_to_bytes(pmt.cons(pmt.PMT_NIL, vec)) == bytes([0, 1, 255, 0, 255, 255])
+
+
+def test_pdu_to_bytes_rejects_non_pdus():
+    assert pdu_to_bytes(pmt.intern('x')) is None
+    assert pdu_to_bytes(pmt.cons(pmt.PMT_NIL, pmt.intern('x'))) is None
+
+
+def test_message_round_trip():
+    msg = make_message('Dr. Silva → ICU 3', dst=2, src=1, msg_id=42, timestamp=1700000000.5, priority=0, ttl=30.0)
+    parsed = parse_message(msg)
+    assert parsed == {'dst': 2, 'src': 1, 'msg_id': 42, 'timestamp': 1700000000.5, 'priority': 0,
+                      'ttl': 30.0, 'body': 'Dr. Silva → ICU 3'.encode('utf-8')}
+    assert parse_message(make_message(b'\x00\xffraw')) == {
+        'dst': None, 'src': None, 'msg_id': None, 'timestamp': None, 'priority': None, 'ttl': None,
+        'body': b'\x00\xffraw'}
+
+
+def test_legacy_formats():
+    assert parse_message(pmt.intern('3:call me: now'))['dst'] == 3
+    assert parse_message(pmt.intern('3:call me: now'))['body'] == b'call me: now'
+    assert parse_message(pmt.intern('no address')) is None
+    assert parse_message(pmt.intern('x:body')) is None
+    legacy = pmt.to_pmt({'dst': 4, 'data': 'hello'})
+    assert parse_message(legacy)['dst'] == 4
+    assert parse_message(legacy)['body'] == b'hello'
+    assert parse_message(pmt.to_pmt({'dst': 4})) is None
+
+
+def test_queue_status_round_trip():
+    status = {'depth': 5, 'limit': 32, 'high': 24, 'low': 8, 'dropped': 1, 'refused': 0,
+              'congested': False, 'full': True}
+    assert parse_queue_status(make_queue_status(7, status)) == dict(status, dst=7)
+
+
+if __name__ == '__main__':
+    for name, fn in list(globals().items()):
+        if name.startswith('test_'):
+            fn()
+            print(f"{name}: ok")
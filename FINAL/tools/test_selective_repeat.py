@@ -0,0 +1,63 @@
+"""
+ARQ give-up test: every transmission of one DATA frame is lost, so the sender
+gives up on it after max_retries. The receiver must skip that seq (PKT_SKIP)
+and still deliver everything sent after it; feedback is TRUE only for
+delivered messages and FALSE exactly once, for the lost one.
+"""
+
+import sim_env  # noqa: F401
+from combined_go_back_n_epy_block_1_0_0_0 import blk
+from link_framing import PKT_AGG, PKT_DATA, PKT_FLAG_ACK, PKT_FRAG
+from sim_link import NodePair
+
+MESSAGES = 8
+LOST_SEQ = 2
+PARAMS = dict(aloha_prob=1.0, timeout=0.2, max_retries=2, window_size=4,
+              aloha_backoff_min=0.01, aloha_backoff_max=0.02)
+
+
+def lost_frame(frame):
+    """Every DATA frame node 1 sends with seq LOST_SEQ."""
+    data_type = frame['type'] & ~PKT_FLAG_ACK in (PKT_DATA, PKT_AGG, PKT_FRAG)
+    return frame['src'] == 1 and data_type and frame['seq'] == LOST_SEQ
+
+
+def run_give_up(arq_mode):
+    pair = NodePair(blk, drop=lost_frame, arq_mode=arq_mode, **PARAMS)
+    try:
+        pair.send(MESSAGES)
+        pair.wait(MESSAGES, timeout=30.0)
+        # Frames sent after the give-up only get through once the SKIP is in
+        pair.send(2, prefix='late')
+        pair.wait(MESSAGES + 2, timeout=30.0)
+    finally:
+        pair.stop()
+    return pair
+
+
+def check_give_up(pair, arq_mode):
+    assert pair.feedback.count('FALSE') >= 1
+    assert pair.a.stats['skips_sent'] >= 1
+    assert 'late 0' in pair.delivered and 'late 1' in pair.delivered
+    assert pair.feedback.count('TRUE') == len(pair.delivered)
+    assert len(pair.feedback) == MESSAGES + 2
+    if arq_mode == 'sr':
+        # Only the lost frame fails; the frames buffered behind it are delivered
+        assert pair.feedback.count('FALSE') == 1
+        assert pair.delivered == [f"msg {i}" for i in range(MESSAGES) if i != LOST_SEQ] + ['late 0', 'late 1']
+
+
+def test_sr_skips_abandoned_frame():
+    check_give_up(run_give_up('sr'), 'sr')
+
+
+def test_gbn_skips_abandoned_window():
+    check_give_up(run_give_up('gbn'), 'gbn')
+
+
+if __name__ == '__main__':
+    for mode in ('sr', 'gbn'):
+        pair = run_give_up(mode)
+        check_give_up(pair, mode)
+        print(f"{mode}: delivered {len(pair.delivered)}, feedback TRUE {pair.feedback.count('TRUE')} "
+              f"FALSE {pair.feedback.count('FALSE')}, SKIPs {pair.a.stats['skips_sent']}")
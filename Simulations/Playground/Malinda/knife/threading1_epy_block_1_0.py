@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import collections
+import threading
+
 import numpy as np
 from gnuradio import gr
 import pmt
@@ -10,6 +13,9 @@ class pdu_to_bitstream(gr.sync_block):
     Converts PDU messages to a framed bitstream.
     Frame format: [SYNC_WORD (4 bytes)] [LENGTH (2 bytes)] [DATA (N bytes)]
     Each byte is unpacked into 8 bits (MSB first).
+
+    Each PDU is unpacked into one NumPy bit array; work() copies slices of
+    the queued frames straight into the output buffer.
     """
     def __init__(self, sync_word=0x1ACFFC1D):
         gr.sync_block.__init__(
@@ -18,65 +24,66 @@ class pdu_to_bitstream(gr.sync_block):
             in_sig=None,
             out_sig=[np.uint8]
         )
-        
-        self.message_port_register_in(pmt.intern('pdu_in'))
-        self.set_msg_handler(pmt.intern('pdu_in'), self.handle_pdu)
-        
+
+        self.port_pdu_in = pmt.intern('pdu_in')
+        self.message_port_register_in(self.port_pdu_in)
+        self.set_msg_handler(self.port_pdu_in, self.handle_pdu)
+
         self.sync_word = sync_word
-        self.bit_buffer = []
-        
+        # Sync word (4 bytes, big-endian), built once
+        self.sync_bytes = np.array([
+            (sync_word >> 24) & 0xFF,
+            (sync_word >> 16) & 0xFF,
+            (sync_word >> 8) & 0xFF,
+            sync_word & 0xFF
+        ], dtype=np.uint8)
+
+        # Queued frames as bit arrays; the first one is sent from frame_offset on
+        self.frames = collections.deque()
+        self.frame_offset = 0
+        self.lock = threading.Lock()
+
     def handle_pdu(self, pdu):
         """Handle incoming PDU messages"""
         # Extract data from PDU (ignore metadata for now)
         data = pmt.cdr(pdu)
-        
+
         # Convert PMT vector to numpy array
         if pmt.is_u8vector(data):
-            data_bytes = np.array(pmt.u8vector_elements(data), dtype=np.uint8)
+            data_bytes = np.frombuffer(bytes(pmt.u8vector_elements(data)), dtype=np.uint8)
         else:
             return
-        
-        # Build frame: [SYNC][LENGTH][DATA]
-        frame = []
-        
-        # Add sync word (4 bytes, big-endian)
-        sync_bytes = np.array([
-            (self.sync_word >> 24) & 0xFF,
-            (self.sync_word >> 16) & 0xFF,
-            (self.sync_word >> 8) & 0xFF,
-            self.sync_word & 0xFF
-        ], dtype=np.uint8)
-        frame.extend(sync_bytes)
-        
-        # Add length (2 bytes, big-endian)
+
         length = len(data_bytes)
-        length_bytes = np.array([
-            (length >> 8) & 0xFF,
-            length & 0xFF
-        ], dtype=np.uint8)
-        frame.extend(length_bytes)
-        
-        # Add data
-        frame.extend(data_bytes)
-        
-        # Convert frame to numpy array and unpack to bits
-        frame_array = np.array(frame, dtype=np.uint8)
-        bits = np.unpackbits(frame_array)
-        
-        # Add bits to buffer
-        self.bit_buffer.extend(bits.tolist())
-    
+        if length > 0xFFFF:
+            print(f"PDU to Bitstream: dropping {length}-byte PDU (length field is 16 bits)")
+            return
+
+        # Build frame: [SYNC][LENGTH (2 bytes, big-endian)][DATA] and unpack to bits
+        frame = np.empty(6 + length, dtype=np.uint8)
+        frame[:4] = self.sync_bytes
+        frame[4] = (length >> 8) & 0xFF
+        frame[5] = length & 0xFF
+        frame[6:] = data_bytes
+        bits = np.unpackbits(frame)
+
+        with self.lock:
+            self.frames.append(bits)
+
     def work(self, input_items, output_items):
         """Output buffered bits"""
         out = output_items[0]
-        
-        # Determine how many bits to output
-        n_output = min(len(self.bit_buffer), len(out))
-        
-        if n_output > 0:
-            # Copy bits to output
-            out[:n_output] = self.bit_buffer[:n_output]
-            # Remove outputted bits from buffer
-            self.bit_buffer = self.bit_buffer[n_output:]
-            
-        return n_output
\ No newline at end of file
+        n_output = 0
+
+        with self.lock:
+            while self.frames and n_output < len(out):
+                bits = self.frames[0]
+                n = min(len(bits) - self.frame_offset, len(out) - n_output)
+                out[n_output:n_output + n] = bits[self.frame_offset:self.frame_offset + n]
+                n_output += n
+                self.frame_offset += n
+                if self.frame_offset == len(bits):
+                    self.frames.popleft()
+                    self.frame_offset = 0
+
+        return n_output
@@ -1,99 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+
 import numpy as np
 from gnuradio import gr
 import pmt
 
-
-##################################################
-# BLOCK 1: PDU to Bitstream (Variable Length)
-##################################################
 class pdu_to_bitstream(gr.sync_block):
     """
-    Converts PDU bytes to bits with length header.
-    
-    Format:
-    - Length (16 bits): Number of payload bytes (0-65535)
-    - Payload (N bytes): Actual PDU data
-    
-    Input: PDU messages (variable length)
-    Output: Byte stream (unpacked bits, 1 bit per byte)
+    Converts PDU messages to a framed bitstream.
+    Frame format: [SYNC_WORD (4 bytes)] [LENGTH (2 bytes)] [DATA (N bytes)]
+    Each byte is unpacked into 8 bits (MSB first).
+
+    Each PDU is unpacked into one NumPy bit array; work() copies slices of
+    the queued frames straight into the output buffer.
     """
-    
-    def __init__(self, length_bits=16):
+    def __init__(self, sync_word=0x1ACFFC1D):
         gr.sync_block.__init__(
             self,
             name="PDU to Bitstream",
             in_sig=None,
             out_sig=[np.uint8]
         )
-        
-        self.length_bits = length_bits  # Bits used for length field
-        self.max_length = (1 << length_bits) - 1
-        
-        # Message port for PDU input
-        self.message_port_register_in(pmt.intern('pdus'))
-        self.set_msg_handler(pmt.intern('pdus'), self.handle_pdu)
-        
-        # Buffer to hold bits waiting to be output
-        self.bit_buffer = []
-        
-    def handle_pdu(self, msg):
-        """Handle incoming PDU and convert to bits with length header"""
-        try:
-            # Extract PDU data
-            meta = pmt.car(msg)
-            data = pmt.cdr(msg)
-            
-            if pmt.is_u8vector(data):
-                payload = bytes(pmt.u8vector_elements(data))
-            else:
-                print("Warning: PDU data is not u8vector")
-                return
-            
-            payload_len = len(payload)
-            
-            # Check length limits
-            if payload_len > self.max_length:
-                print(f"Error: PDU length {payload_len} exceeds maximum {self.max_length}")
-                return
-            
-            # Convert length to bits (MSB first)
-            for i in range(self.length_bits - 1, -1, -1):
-                bit = (payload_len >> i) & 1
-                self.bit_buffer.append(bit)
-            
-            # Convert payload bytes to bits (MSB first)
-            for byte in payload:
-                for i in range(7, -1, -1):
-                    bit = (byte >> i) & 1
-                    self.bit_buffer.append(bit)
-            
-            total_bits = self.length_bits + (payload_len * 8)
-            print(f"[PDU→Bitstream] Added {payload_len} bytes ({total_bits} bits total with length header)")
-            
-        except Exception as e:
-            print(f"Error handling PDU: {e}")
-            import traceback
-            traceback.print_exc()
-    
+
+        self.port_pdu_in = pmt.intern('pdu_in')
+        self.message_port_register_in(self.port_pdu_in)
+        self.set_msg_handler(self.port_pdu_in, self.handle_pdu)
+
+        self.sync_word = sync_word
+        # Sync word (4 bytes, big-endian), built once
+        self.sync_bytes = np.array([
+            (sync_word >> 24) & 0xFF,
+            (sync_word >> 16) & 0xFF,
+            (sync_word >> 8) & 0xFF,
+            sync_word & 0xFF
+        ], dtype=np.uint8)
+
+        # Queued frames as bit arrays; the first one is sent from frame_offset on
+        self.frames = collections.deque()
+        self.frame_offset = 0
+        self.lock = threading.Lock()
+
+    def handle_pdu(self, pdu):
+        """Handle incoming PDU messages"""
+        # Extract data from PDU (ignore metadata for now)
+        data = pmt.cdr(pdu)
+
+        # Convert PMT vector to numpy array
+        if pmt.is_u8vector(data):
+            data_bytes = np.frombuffer(bytes(pmt.u8vector_elements(data)), dtype=np.uint8)
+        else:
+            return
+
+        length = len(data_bytes)
+        if length > 0xFFFF:
+            print(f"PDU to Bitstream: dropping {length}-byte PDU (length field is 16 bits)")
+            return
+
+        # Build frame: [SYNC][LENGTH (2 bytes, big-endian)][DATA] and unpack to bits
+        frame = np.empty(6 + length, dtype=np.uint8)
+        frame[:4] = self.sync_bytes
+        frame[4] = (length >> 8) & 0xFF
+        frame[5] = length & 0xFF
+        frame[6:] = data_bytes
+        bits = np.unpackbits(frame)
+
+        with self.lock:
+            self.frames.append(bits)
+
     def work(self, input_items, output_items):
-        """Output bits from buffer"""
-        output = output_items[0]
-        n_output = len(output)
-        
-        if not self.bit_buffer:
-            # No data, output zeros
-            output[:] = 0
-            return n_output
-        
-        # Output available bits
-        n_bits = min(n_output, len(self.bit_buffer))
-        output[:n_bits] = self.bit_buffer[:n_bits]
-        
-        # Remove output bits from buffer
-        self.bit_buffer = self.bit_buffer[n_bits:]
-        
-        # Pad rest with zeros if needed
-        if n_bits < n_output:
-            output[n_bits:] = 0
-        
+        """Output buffered bits"""
+        out = output_items[0]
+        n_output = 0
+
+        with self.lock:
+            while self.frames and n_output < len(out):
+                bits = self.frames[0]
+                n = min(len(bits) - self.frame_offset, len(out) - n_output)
+                out[n_output:n_output + n] = bits[self.frame_offset:self.frame_offset + n]
+                n_output += n
+                self.frame_offset += n
+                if self.frame_offset == len(bits):
+                    self.frames.popleft()
+                    self.frame_offset = 0
+
         return n_output
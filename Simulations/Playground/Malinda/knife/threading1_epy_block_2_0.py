@@ -10,7 +10,14 @@ class bitstream_to_pdu(gr.sync_block):
     Converts a framed bitstream back to PDU messages.
     Searches for sync word and reconstructs PDUs based on length field.
     Frame format: [SYNC_WORD (4 bytes)] [LENGTH (2 bytes)] [DATA (N bytes)]
+
+    Bits are kept in a preallocated NumPy buffer. Each call to work()
+    correlates the whole new chunk against the sync word at once and
+    packs length/data fields with np.packbits.
     """
+    LENGTH_BITS = 16
+    MAX_FRAME_BITS = (4 + 2 + 0xFFFF) * 8
+
     def __init__(self, sync_word=0x1ACFFC1D, threshold=0):
         gr.sync_block.__init__(
             self,
@@ -18,12 +25,13 @@ class bitstream_to_pdu(gr.sync_block):
             in_sig=[np.uint8],
             out_sig=None
         )
-        
-        self.message_port_register_out(pmt.intern('pdu_out'))
-        
+
+        self.port_pdu_out = pmt.intern('pdu_out')
+        self.message_port_register_out(self.port_pdu_out)
+
         self.sync_word = sync_word
         self.threshold = threshold  # Number of bit errors allowed in sync
-        
+
         # Convert sync word to bit pattern
         sync_bytes = np.array([
             (sync_word >> 24) & 0xFF,
@@ -32,78 +40,101 @@ class bitstream_to_pdu(gr.sync_block):
             sync_word & 0xFF
         ], dtype=np.uint8)
         self.sync_bits = np.unpackbits(sync_bytes)
-        
-        self.bit_buffer = []
+        # Bipolar (+1/-1) sync pattern: correlation = len(sync) - 2 * bit errors
+        self.sync_bipolar = self.sync_bits.astype(np.int16) * 2 - 1
+
+        # Bit buffer: valid bits are bit_buffer[head:tail]
+        self.bit_buffer = np.zeros(2 * self.MAX_FRAME_BITS, dtype=np.uint8)
+        self.head = 0
+        self.tail = 0
+
         self.state = 'SEARCH'  # States: SEARCH, READ_LENGTH, READ_DATA
         self.pdu_length = 0
         self.bits_needed = 0
-        
-    def correlate_sync(self, bits):
-        """Check if bits match sync word (with threshold)"""
-        if len(bits) < len(self.sync_bits):
-            return False
-        
-        errors = np.sum(bits[:len(self.sync_bits)] != self.sync_bits)
-        return errors <= self.threshold
-    
+
+    def find_sync(self, start, stop):
+        """Indices of every sync word candidate starting in bit_buffer[start:stop]"""
+        n_sync = len(self.sync_bits)
+        if stop - start < n_sync:
+            return np.empty(0, dtype=np.int64)
+        bipolar = self.bit_buffer[start:stop].astype(np.int16) * 2 - 1
+        corr = np.correlate(bipolar, self.sync_bipolar, mode='valid')
+        # corr >= n_sync - 2 * threshold  <=>  bit errors <= threshold
+        return np.flatnonzero(corr >= n_sync - 2 * self.threshold) + start
+
+    def append_bits(self, bits):
+        """Copy new bits behind the buffered ones, compacting/growing as needed"""
+        n = len(bits)
+        if self.tail + n > len(self.bit_buffer):
+            pending = self.tail - self.head
+            if pending + n > len(self.bit_buffer):
+                grown = np.zeros(2 * (pending + n), dtype=np.uint8)
+                grown[:pending] = self.bit_buffer[self.head:self.tail]
+                self.bit_buffer = grown
+            else:
+                self.bit_buffer[:pending] = self.bit_buffer[self.head:self.tail]
+            self.head = 0
+            self.tail = pending
+        np.bitwise_and(bits, 1, out=self.bit_buffer[self.tail:self.tail + n])
+        self.tail += n
+
+    def publish_pdu(self, data_bytes):
+        """Send one decoded frame as a PDU (with empty metadata)"""
+        pdu_vector = pmt.init_u8vector(len(data_bytes), memoryview(data_bytes))
+        pdu = pmt.cons(pmt.make_dict(), pdu_vector)
+        self.message_port_pub(self.port_pdu_out, pdu)
+
     def work(self, input_items, output_items):
         """Process input bitstream and reconstruct PDUs"""
         in0 = input_items[0]
         n_input = len(in0)
-        
+        n_sync = len(self.sync_bits)
+
         # Add incoming bits to buffer
-        self.bit_buffer.extend(in0[:n_input].tolist())
-        
+        self.append_bits(in0[:n_input])
+
+        # Sync candidates are computed once per call, on first use
+        candidates = None
+
         # Process buffer based on current state
         while True:
             if self.state == 'SEARCH':
-                # Search for sync word
-                if len(self.bit_buffer) >= len(self.sync_bits):
-                    if self.correlate_sync(np.array(self.bit_buffer[:len(self.sync_bits)])):
-                        # Found sync word, remove it from buffer
-                        self.bit_buffer = self.bit_buffer[len(self.sync_bits):]
-                        self.state = 'READ_LENGTH'
-                    else:
-                        # Shift by one bit and continue searching
-                        self.bit_buffer.pop(0)
+                if candidates is None:
+                    candidates = self.find_sync(self.head, self.tail)
+                idx = np.searchsorted(candidates, self.head)
+                if idx < len(candidates):
+                    # Found sync word, remove it from buffer
+                    self.head = int(candidates[idx]) + n_sync
+                    self.state = 'READ_LENGTH'
                 else:
-                    break  # Not enough bits yet
-                    
+                    # Keep only the bits that could still start a sync word
+                    self.head = max(self.head, self.tail - n_sync + 1)
+                    break
+
             elif self.state == 'READ_LENGTH':
                 # Need 16 bits (2 bytes) for length
-                if len(self.bit_buffer) >= 16:
-                    # Extract length bits and convert to bytes
-                    length_bits = np.array(self.bit_buffer[:16], dtype=np.uint8)
-                    length_bytes = np.packbits(length_bits)
+                if self.tail - self.head >= self.LENGTH_BITS:
+                    length_bytes = np.packbits(self.bit_buffer[self.head:self.head + self.LENGTH_BITS])
                     self.pdu_length = (int(length_bytes[0]) << 8) | int(length_bytes[1])
-                    
-                    # Remove length bits from buffer
-                    self.bit_buffer = self.bit_buffer[16:]
-                    
+                    self.head += self.LENGTH_BITS
+
                     # Calculate bits needed for data
                     self.bits_needed = self.pdu_length * 8
                     self.state = 'READ_DATA'
                 else:
                     break  # Not enough bits yet
-                    
+
             elif self.state == 'READ_DATA':
                 # Check if we have all data bits
-                if len(self.bit_buffer) >= self.bits_needed:
-                    # Extract data bits
-                    data_bits = np.array(self.bit_buffer[:self.bits_needed], dtype=np.uint8)
-                    self.bit_buffer = self.bit_buffer[self.bits_needed:]
-                    
+                if self.tail - self.head >= self.bits_needed:
                     # Pack bits back into bytes
-                    data_bytes = np.packbits(data_bits)
-                    
-                    # Create and send PDU (with empty metadata)
-                    pdu_vector = pmt.init_u8vector(len(data_bytes), data_bytes.tolist())
-                    pdu = pmt.cons(pmt.make_dict(), pdu_vector)
-                    self.message_port_pub(pmt.intern('pdu_out'), pdu)
-                    
+                    data_bytes = np.packbits(self.bit_buffer[self.head:self.head + self.bits_needed])
+                    self.head += self.bits_needed
+                    self.publish_pdu(data_bytes)
+
                     # Go back to searching for next frame
                     self.state = 'SEARCH'
                 else:
                     break  # Not enough bits yet
-        
+
         return n_input